@@ -0,0 +1,131 @@
+# Math Quizzer adaptive
+# Part of Math Quizzer. Picks the numbers for Adaptive mode, which gets
+# harder or easier to match the player, anywhere from Easy to AAAAAAA.
+#
+# The player's skill is a rating from 0 (Easy) to MAX_RATING (AAAAAAA).
+# Each answer scores a performance from 0 to 1: 0 if it was wrong or
+# time ran out, and from 1 (answered instantly) down to 1 - SLOW_PENALTY
+# (answered just in time) if it was right. The rating then moves
+# LEARNING_RATE times how far the performance was from
+# TARGET_PERFORMANCE, so quick correct answers raise it and slow or
+# wrong ones lower it. That's a constant amount of work per answer, and
+# the rating is all that needs to be kept, so it's saved in the
+# profile's settings (AdaptiveSkill) and carries over between games.
+#
+# The questions come from a grid of difficulties made once from the
+# difficulties in use: GRID_STEPS steps from each level to the next,
+# with their weights and ranges blended in between. Each question just
+# uses the grid point nearest to the rating. The grid and the functions
+# here don't keep anything else, so one grid can be shared by any number
+# of players (like in a server with many games at once).
+
+import questions
+import recordings
+
+FIRST_LEVEL = 1 # Easy
+LAST_LEVEL = 6 # AAAAAAA
+GRID_STEPS = 4
+MAX_RATING = (LAST_LEVEL - FIRST_LEVEL) * GRID_STEPS
+TARGET_PERFORMANCE = 0.75
+SLOW_PENALTY = 0.5
+LEARNING_RATE = 2
+
+
+def blend_operation(low, high, fraction):
+    '''blend_operation(low, high, fraction) -> tuple
+    Returns the operation fraction of the way from low to high (both
+    from questions.parse_operation()). If only one of them has a weight,
+    its numbers are used.
+    '''
+    weight = round(low[0] + (high[0] - low[0]) * fraction)
+    if low[0] == 0:
+        return (weight,) + high[1:]
+    elif high[0] == 0:
+        return (weight,) + low[1:]
+    ranges = [round(lowEnd + (highEnd - lowEnd) * fraction)
+              for (lowEnd, highEnd) in zip(low[1:5], high[1:5])]
+    return (weight, *ranges, high[5] if fraction >= 0.5 else low[5])
+
+
+def blend_difficulty(low, high, fraction):
+    '''blend_difficulty(low, high, fraction) -> (list, list)
+    Returns the compiled difficulty fraction of the way from low to high
+    (both compiled). Operations that can't make questions when blended
+    (because rounding left no pairs of numbers) come from whichever of
+    low and high is nearer.
+    '''
+    operations = []
+    for (operation, (lowOperation, highOperation)) in enumerate(
+        zip(low[1], high[1])):
+        blended = blend_operation(lowOperation[:6], highOperation[:6],
+                                  fraction)
+        alone = [(0, 0, 0, 0, 0, '')] * 4
+        alone[operation] = blended
+        try:
+            questions.compile_difficulty(alone)
+        except ValueError:
+            blended = (highOperation if fraction >= 0.5
+                       else lowOperation)[:6]
+        operations.append(blended)
+    return questions.compile_difficulty(operations)
+
+
+def build_grid(specs):
+    '''build_grid(specs) -> tuple
+    Returns the grid of (COMPILED DIFFICULTY, TIME LIMIT) for every
+    rating from 0 to MAX_RATING, made from specs (every compiled
+    difficulty, like questions.compiledDifficultyData).
+    '''
+    grid = []
+    for rating in range(MAX_RATING + 1):
+        (level, step) = divmod(rating, GRID_STEPS)
+        level += FIRST_LEVEL
+        if step == 0:
+            grid.append((specs[level], recordings.TIME_LIMITS[level]))
+            continue
+        fraction = step / GRID_STEPS
+        timeLimit = (recordings.TIME_LIMITS[level]
+                     + (recordings.TIME_LIMITS[level + 1]
+                        - recordings.TIME_LIMITS[level]) * fraction)
+        grid.append((blend_difficulty(specs[level], specs[level + 1],
+                                      fraction), round(timeLimit)))
+    return tuple(grid)
+
+
+def new_skill(rating = 0.0):
+    '''new_skill(rating = 0.0) -> dict
+    Returns a player's skill, starting at rating.
+    '''
+    return {'rating': float(min(max(rating, 0), MAX_RATING))}
+
+
+def pick_spec(grid, skill):
+    '''pick_spec(grid, skill) -> (tuple, int)
+    Returns (COMPILED DIFFICULTY, TIME LIMIT) from grid (from
+    build_grid()) for the next question of a player with skill.
+    '''
+    return grid[int(skill['rating'] + 0.5)]
+
+
+def update_skill(skill, correct, timeOnQuestion, timeLimit):
+    '''update_skill(skill, correct, timeOnQuestion, timeLimit) -> float
+    Updates skill after a question with a time limit of timeLimit that
+    took timeOnQuestion seconds and was answered correctly or not, and
+    returns the new rating.
+    '''
+    if correct:
+        performance = 1 - SLOW_PENALTY * min(timeOnQuestion / timeLimit, 1)
+    else:
+        performance = 0
+    skill['rating'] = float(min(max(
+        skill['rating'] + LEARNING_RATE * (performance - TARGET_PERFORMANCE),
+        0), MAX_RATING))
+    return skill['rating']
+
+
+def level_name(skill):
+    '''level_name(skill) -> str
+    Returns the level skill is at, like '3.5' for halfway between Hard
+    and Harder.
+    '''
+    return format(FIRST_LEVEL + skill['rating'] / GRID_STEPS, '.1f')
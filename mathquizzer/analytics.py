@@ -0,0 +1,205 @@
+# Math Quizzer analytics
+# Part of Math Quizzer. Summarizes the telemetry logs recorded by the
+# game (see telemetry.py): accuracy and median/90th percentile response
+# times by operator, number size, difficulty and hour of the day, and
+# the slowest facts.
+#
+# Needs NumPy. The columns are memory-mapped and processed CHUNK_SIZE
+# questions at a time, and response times are counted in fixed-width
+# bins instead of being kept, so memory use doesn't grow with the size
+# of the logs.
+#
+# Usage:
+#   python analytics.py [TELEMETRY DIRECTORY ...]
+# Each directory is one player's MATHQUIZZER-telemetry directory. With
+# no directories, MATHQUIZZER-telemetry is used.
+
+import os
+import sys
+import time
+
+import numpy
+
+import telemetry
+
+CHUNK_SIZE = 1 << 22
+BIN_WIDTH = 0.05 # Seconds
+NUM_BINS = 1200 # Response times of 60 seconds or more share the last bin
+OPERATORS = '+−×÷'
+MAGNITUDE_EDGES = (10, 20, 50, 100)
+MAGNITUDE_NAMES = ('0-9', '10-19', '20-49', '50-99', '100+')
+NUM_DIFFICULTIES = 16
+MIN_FACT_ATTEMPTS = 5
+NUM_SLOWEST_FACTS = 15
+
+# Each grouping is (title, number of groups, group names)
+GROUPINGS = (('Operator', len(OPERATORS), OPERATORS),
+             ('Larger number', len(MAGNITUDE_NAMES), MAGNITUDE_NAMES),
+             ('Difficulty', NUM_DIFFICULTIES,
+              [str(i) for i in range(NUM_DIFFICULTIES)]),
+             ('Hour', 24, [str(i).rjust(2, '0') + ':00' for i in range(24)]))
+
+
+def map_log(directory):
+    '''map_log(directory) -> dict OR None
+    Memory-maps every column of the telemetry log in directory, or
+    returns None if the log is empty. Questions that weren't written to
+    every column are left out.
+    '''
+    paths = {name: os.path.join(directory, name)
+             for (name, typecode) in telemetry.COLUMNS}
+    try:
+        length = min(os.path.getsize(paths[name])
+                     // numpy.dtype(typecode).itemsize
+                     for (name, typecode) in telemetry.COLUMNS)
+    except FileNotFoundError:
+        return None
+    if length == 0:
+        return None
+    return {name: numpy.memmap(paths[name], dtype = typecode, mode = 'r',
+                               shape = (length,))
+            for (name, typecode) in telemetry.COLUMNS}
+
+
+def new_totals():
+    '''new_totals() -> dict
+    Returns empty totals for summarize_chunk() to add to.
+    '''
+    return {'groups': [(numpy.zeros(size, numpy.int64),
+                        numpy.zeros(size, numpy.int64),
+                        numpy.zeros((size, NUM_BINS), numpy.int64))
+                       for (title, size, names) in GROUPINGS],
+            'facts': {}}
+
+
+def summarize_chunk(totals, columns, start, stop):
+    '''Adds questions start to stop of columns to totals.'''
+    timeAnswered = numpy.asarray(columns['time'][start:stop])
+    operator = numpy.asarray(columns['operator'][start:stop], numpy.int64)
+    first = numpy.asarray(columns['first'][start:stop], numpy.int64)
+    second = numpy.asarray(columns['second'][start:stop], numpy.int64)
+    result = numpy.asarray(columns['result'][start:stop])
+    responseTime = numpy.asarray(columns['responseTime'][start:stop])
+
+    correct = (result == 1).astype(numpy.int64)
+    answered = result >= 0
+    bins = numpy.minimum(responseTime / BIN_WIDTH,
+                         NUM_BINS - 1).astype(numpy.int64)
+    # The time zone's offset from UTC (which changes with daylight
+    # saving time) is found once for each hour that has answers
+    (hours, inverse) = numpy.unique(timeAnswered // 3600,
+                                    return_inverse = True)
+    utcOffsets = numpy.array([time.localtime(hour * 3600).tm_gmtoff
+                              for hour in hours.tolist()], numpy.float64)
+    groupColumns = (numpy.minimum(operator, len(OPERATORS) - 1),
+                    numpy.searchsorted(MAGNITUDE_EDGES,
+                                       numpy.maximum(abs(first), abs(second)),
+                                       side = 'right'),
+                    numpy.minimum(columns['difficulty'][start:stop],
+                                  NUM_DIFFICULTIES - 1).astype(numpy.int64),
+                    ((timeAnswered + utcOffsets[inverse]) // 3600 % 24)
+                    .astype(numpy.int64))
+    for ((title, size, names), (counts, corrects, histogram), group) \
+        in zip(GROUPINGS, totals['groups'], groupColumns):
+        counts += numpy.bincount(group, minlength = size)
+        corrects += numpy.bincount(group, weights = correct,
+                                   minlength = size).astype(numpy.int64)
+        histogram += numpy.bincount(
+            group[answered] * NUM_BINS + bins[answered],
+            minlength = size * NUM_BINS).reshape(size, NUM_BINS)
+
+    # Facts are grouped by a single number: operator, then first, then
+    # second, 21 bits each
+    factKeys = ((operator << 42) | ((first & 0x1FFFFF) << 21)
+                | (second & 0x1FFFFF))
+    (uniqueKeys, inverse) = numpy.unique(factKeys, return_inverse = True)
+    factCounts = numpy.bincount(inverse)
+    factCorrects = numpy.bincount(inverse, weights = correct)
+    factTimes = numpy.bincount(inverse, weights = responseTime)
+    facts = totals['facts']
+    for (key, count, numCorrect, totalTime) in zip(
+        uniqueKeys.tolist(), factCounts.tolist(), factCorrects.tolist(),
+        factTimes.tolist()):
+        fact = facts.get(key)
+        if fact is None:
+            facts[key] = [count, numCorrect, totalTime]
+        else:
+            fact[0] += count
+            fact[1] += numCorrect
+            fact[2] += totalTime
+
+
+def histogram_quantile(histogram, fraction):
+    '''histogram_quantile(histogram, fraction) -> float OR None
+    Returns the response time (in seconds, rounded up to the end of its
+    bin) that fraction of the counts in histogram are at or below.
+    '''
+    cumulative = numpy.cumsum(histogram)
+    if cumulative[-1] == 0:
+        return None
+    return (int(numpy.searchsorted(cumulative, fraction * cumulative[-1]))
+            + 1) * BIN_WIDTH
+
+
+def format_seconds(seconds):
+    '''format_seconds(seconds) -> str
+    Returns seconds to 2 decimal places, or "N/A" if it's None.
+    '''
+    return 'N/A' if seconds is None else format(seconds, '.2f') + 's'
+
+
+def print_report(totals):
+    '''Prints the tables for totals.'''
+    for ((title, size, names), (counts, corrects, histogram)) in zip(
+        GROUPINGS, totals['groups']):
+        print(title.ljust(14) + 'Questions'.rjust(12) + 'Accuracy'.rjust(10)
+              + 'Median'.rjust(9) + '90th'.rjust(9))
+        for group in range(size):
+            if counts[group] == 0:
+                continue
+            print(names[group].ljust(14) + str(counts[group]).rjust(12)
+                  + format(corrects[group] / counts[group], '.1%').rjust(10)
+                  + format_seconds(histogram_quantile(histogram[group], 0.5))
+                  .rjust(9)
+                  + format_seconds(histogram_quantile(histogram[group], 0.9))
+                  .rjust(9))
+        print()
+
+    print('Slowest facts (at least ' + str(MIN_FACT_ATTEMPTS)
+          + ' attempts)')
+    print('Fact'.ljust(14) + 'Questions'.rjust(12) + 'Accuracy'.rjust(10)
+          + 'Mean'.rjust(9))
+    slowest = sorted([(fact[2] / fact[0], key, fact)
+                      for (key, fact) in totals['facts'].items()
+                      if fact[0] >= MIN_FACT_ATTEMPTS], reverse = True)
+    for (meanTime, key, fact) in slowest[:NUM_SLOWEST_FACTS]:
+        operator = min(key >> 42, len(OPERATORS) - 1)
+        first = (key >> 21) & 0x1FFFFF
+        second = key & 0x1FFFFF
+        print((str(first) + ' ' + OPERATORS[operator] + ' '
+               + str(second)).ljust(14) + str(fact[0]).rjust(12)
+              + format(fact[1] / fact[0], '.1%').rjust(10)
+              + format_seconds(meanTime).rjust(9))
+
+
+if __name__ == '__main__':
+    directories = sys.argv[1:] or ['MATHQUIZZER-telemetry']
+    totals = new_totals()
+    numQuestions = 0
+    timeStarted = time.perf_counter()
+    for directory in directories:
+        columns = map_log(directory)
+        if columns is None:
+            continue
+        length = len(columns['time'])
+        for start in range(0, length, CHUNK_SIZE):
+            summarize_chunk(totals, columns, start,
+                            min(start + CHUNK_SIZE, length))
+        numQuestions += length
+    if numQuestions == 0:
+        sys.exit('No telemetry found. (Add a line saying TelemetryEnabled '
+                 + 'true to MATHQUIZZER-other.txt to start recording it.)')
+    print_report(totals)
+    print()
+    print('Summarized ' + str(numQuestions) + ' questions in '
+          + format(time.perf_counter() - timeStarted, '.2f') + 's.')
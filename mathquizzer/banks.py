@@ -0,0 +1,198 @@
+# Math Quizzer banks
+# Part of Math Quizzer. Builds banks of questions made ahead of time, so
+# that questions can be handed out without making them, and reads them
+# back.
+#
+# The bank for difficulty N (a number in questions.difficultyData) is
+# MATHQUIZZER-bank-N.dat: a HEADER followed by one fixed-width RECORD per
+# question. Banks are memory-mapped when read, so only the pages that
+# questions are read from are loaded, and any number of sessions (like
+# the ones on a server) can share one bank.
+#
+# Each session walks the bank with its own cursor, which starts at an
+# offset and moves by a step that has no factors in common with the
+# number of questions, both picked from the session's seed. So a
+# session sees every question once before any repeat, and two sessions
+# don't follow each other through the bank.
+#
+# Usage:
+#   python banks.py build DIFFICULTY COUNT
+#   python banks.py worksheet DIFFICULTY COUNT [SEED]
+# build makes a bank of COUNT questions with the difficulty's current
+# numbers (including custom difficulties), and worksheet prints COUNT
+# questions from the bank, then the answers.
+
+import hashlib
+import json
+import math
+import mmap
+import os
+import random
+import struct
+import sys
+
+import difficulties
+import questions
+
+# Magic, difficulty number, fingerprint of the compiled difficulty
+HEADER = struct.Struct('<8sI8s')
+MAGIC = b'MQBANK01'
+# Operation, correct letter (0-3), first number, second number, the
+# four possible answers
+RECORD = struct.Struct('<BBiiiiii')
+BLOCK_SIZE = 4096
+
+
+def bank_path(level):
+    '''bank_path(level) -> str
+    Returns the path of the bank for difficulty level.
+    '''
+    return 'MATHQUIZZER-bank-' + str(level) + '.dat'
+
+
+def spec_fingerprint(spec):
+    '''spec_fingerprint(spec) -> bytes
+    Returns 8 bytes that change whenever spec (a compiled difficulty)
+    changes, so that a bank made with different numbers isn't used.
+    '''
+    return hashlib.sha256(json.dumps(spec).encode()).digest()[:8]
+
+
+def build_bank(path, level, spec, count):
+    '''Writes a bank of count questions made from spec (the compiled
+    difficulty level) to path, replacing it all at once so that a crash
+    can't leave half a file behind.
+    '''
+    with open(path + '.tmp', 'wb') as bankFile:
+        bankFile.write(HEADER.pack(MAGIC, level, spec_fingerprint(spec)))
+        written = 0
+        while written < count:
+            block = []
+            while len(block) < min(BLOCK_SIZE, count - written):
+                question = questions.make_question(spec)
+                if len(question) != 10:
+                    continue # Not enough wrong answers; make another
+                block.append(RECORD.pack(question[8],
+                                         'ABCD'.index(question[5]),
+                                         question[7], question[9],
+                                         *question[1:5]))
+            bankFile.write(b''.join(block))
+            written += len(block)
+    os.replace(path + '.tmp', path)
+
+
+def open_bank(path):
+    '''open_bank(path) -> dict OR None
+    Memory-maps the bank in path, or returns None if path doesn't exist
+    or has no questions. The bank is {'level', 'fingerprint', 'count',
+    'map'}.
+    '''
+    try:
+        with open(path, 'rb') as bankFile:
+            size = os.fstat(bankFile.fileno()).st_size
+            if size < HEADER.size + RECORD.size:
+                return None
+            bankMap = mmap.mmap(bankFile.fileno(), 0,
+                                access = mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return None
+    (magic, level, fingerprint) = HEADER.unpack_from(bankMap, 0)
+    if magic != MAGIC:
+        bankMap.close()
+        raise ValueError('File ' + path + ' is not formed properly. '
+                         + 'Please rename the file, then try again.')
+    return {'level': level, 'fingerprint': fingerprint,
+            'count': (len(bankMap) - HEADER.size) // RECORD.size,
+            'map': bankMap}
+
+
+def read_question(bank, index, typed = False):
+    '''read_question(bank, index, typed = False)
+        -> (str, int, int, int, int, str, int, int, int, int)
+    Returns question number index in bank, in the same format as
+    questions.make_question().
+    '''
+    (operation, letter, firstNumber, secondNumber, *potentialAnswers) = \
+        RECORD.unpack_from(bank['map'], HEADER.size + index * RECORD.size)
+    prompt = ('What is ' + str(firstNumber) + ' ' + '+−×÷'[operation] + ' '
+              + str(secondNumber) + '?')
+    trueAnswer = potentialAnswers[letter]
+    if typed:
+        return (prompt, trueAnswer, None, None, None, 'A', trueAnswer,
+                firstNumber, operation, secondNumber)
+    return (prompt, *potentialAnswers, 'ABCD'[letter], trueAnswer,
+            firstNumber, operation, secondNumber)
+
+
+def open_cursor(bank, seed):
+    '''open_cursor(bank, seed) -> list
+    Returns a cursor for walking through bank in an order picked by
+    seed. The cursor is [bank, next index, step].
+    '''
+    count = bank['count']
+    seededRandom = random.Random(seed)
+    step = seededRandom.randrange(1, count) if count > 1 else 1
+    while math.gcd(step, count) != 1:
+        step -= 1
+    return [bank, seededRandom.randrange(count), step]
+
+
+def next_question(cursor, typed = False):
+    '''next_question(cursor, typed = False)
+        -> (str, int, int, int, int, str, int, int, int, int)
+    Returns the next question for cursor, in the same format as
+    questions.make_question().
+    '''
+    (bank, index, step) = cursor
+    cursor[1] = (index + step) % bank['count']
+    return read_question(bank, index, typed)
+
+
+def open_level_cursor(level, spec, seed):
+    '''open_level_cursor(level, spec, seed) -> list OR None
+    Returns a cursor (from open_cursor()) for the bank of difficulty
+    level, or None if there isn't one or it was made with numbers other
+    than spec.
+    '''
+    bank = open_bank(bank_path(level))
+    if bank is None:
+        return None
+    if bank['level'] != level or bank['fingerprint'] != spec_fingerprint(spec):
+        bank['map'].close()
+        return None
+    return open_cursor(bank, seed)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 4 or sys.argv[1] not in ('build', 'worksheet'):
+        sys.exit('Usage: python banks.py build DIFFICULTY COUNT\n'
+                 + '       python banks.py worksheet DIFFICULTY COUNT [SEED]')
+    level = int(sys.argv[2])
+    count = int(sys.argv[3])
+    specs = questions.compiledDifficultyData
+    difficultyFile = difficulties.find_difficulty_file()
+    if difficultyFile is not None:
+        specs = difficulties.load_difficulties(difficultyFile)
+    if not 1 <= level < len(specs):
+        sys.exit('There is no difficulty number ' + str(level) + '.')
+
+    if sys.argv[1] == 'build':
+        build_bank(bank_path(level), level, specs[level], count)
+        print('Wrote ' + str(count) + ' questions to ' + bank_path(level)
+              + '.')
+    else:
+        seed = sys.argv[4] if len(sys.argv) > 4 else None
+        cursor = open_level_cursor(level, specs[level], seed)
+        if cursor is None:
+            sys.exit('There is no bank for difficulty ' + str(level)
+                     + ' with its current numbers. Make one with: '
+                     + 'python banks.py build ' + str(level) + ' COUNT')
+        worksheet = [next_question(cursor) for i in range(count)]
+        for (number, question) in enumerate(worksheet, 1):
+            print(str(number) + '. ' + question[0])
+            print('   A) ' + str(question[1]) + '   B) ' + str(question[2])
+                  + '   C) ' + str(question[3]) + '   D) ' + str(question[4]))
+        print()
+        print('Answers: ' + ', '.join([str(number) + '. ' + question[5]
+                                       for (number, question)
+                                       in enumerate(worksheet, 1)]))
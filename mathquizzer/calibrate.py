@@ -0,0 +1,386 @@
+# Math Quizzer calibrate
+# Part of Math Quizzer. Samples millions of questions on each level of
+# difficultyData (or custom difficulties in the current folder) at once
+# with NumPy, to help tune the tables, and reports for each level:
+#   - how often each operator comes up
+#   - how big the answers are
+#   - how many questions are "hard" facts: + with a carry, − with a
+#     borrow, × with a two-digit multiplier, or ÷ outside the 10 × 10
+#     times table
+#   - how close the wrong answers are to the correct one
+#   - the points a player gets on each difficulty using the level, under
+#     the simple response-time model below
+# Levels whose questions overlap a lot (like Hard and Timed, which share
+# most of their ranges) are flagged too.
+#
+# Needs NumPy. The operations and numbers are picked from the same alias
+# tables as questions.pick_operands(), just many at a time, so they come
+# out with exactly the same chances. Wrong answers depend on a shuffle
+# of a set for each question, so they're measured on DISTRACTOR_COUNT
+# questions from questions.make_question() instead. Expressions (see
+# questions.EXPRESSION_LEVELS) are left out; their answers are in the
+# same range as the operation they're expanded from.
+#
+# Usage:
+#   python calibrate.py [COUNT] [--seed SEED] [--games GAMES]
+# COUNT is how many questions to sample on each level (1000000 by
+# default), and GAMES is how many games to play on each difficulty for
+# the points (20000 by default).
+
+import random
+import sys
+import time
+
+import numpy
+
+import questions
+import recordings
+import scoring
+import verify
+
+OPERATORS = '+−×÷'
+LEVEL_NAMES = (None, 'Easy', 'Medium', 'Hard', 'Harder', 'Insane',
+               'AAAAAAA', 'Timed')
+MAGNITUDE_EDGES = (10, 20, 50, 100, 200, 1000)
+MAGNITUDE_NAMES = ('0-9', '10-19', '20-49', '50-99', '100-199', '200-999',
+                   '1000+')
+NEAR_DISTANCE = 3 # Wrong answers at most this far away count as close
+DISTRACTOR_COUNT = 20000
+OVERLAP_LIMIT = 0.25 # Levels sharing more of their questions are flagged
+MAX_STREAK = 10000 # Streaks are capped here when looking up the points
+
+# The response-time model: a question takes BASE_TIME seconds, plus
+# OPERATOR_TIMES for its operator, DIGIT_TIME for each digit of the
+# answer and HARD_TIME if it's a hard fact, times a log-normal amount
+# with a spread of TIME_SPREAD. It's answered wrongly WRONG_CHANCE of the
+# time (HARD_WRONG_CHANCE for hard facts).
+BASE_TIME = 1.2
+OPERATOR_TIMES = (0, 0.3, 0.5, 0.8)
+DIGIT_TIME = 0.6
+HARD_TIME = 1.5
+TIME_SPREAD = 0.35
+WRONG_CHANCE = 0.02
+HARD_WRONG_CHANCE = 0.06
+
+
+def sample_alias(generator, table, count):
+    '''sample_alias(generator, table, count) -> numpy.ndarray
+    Picks count indexes from table (from questions.make_alias_table())
+    in the same way as questions.sample_alias().
+    '''
+    (totalWeight, probabilities, aliases) = table
+    indexes = generator.integers(len(probabilities), size = count)
+    keep = (generator.integers(totalWeight, size = count)
+            < numpy.array(probabilities)[indexes])
+    return numpy.where(keep, indexes, numpy.array(aliases)[indexes])
+
+
+def sample_questions(generator, spec, count):
+    '''sample_questions(generator, spec, count)
+        -> (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+    Picks count operations and pairs of numbers from spec (a compiled
+    difficulty) like questions.pick_operands(), and returns (OPERATIONS,
+    FIRST NUMBERS, SECOND NUMBERS).
+    '''
+    (operationTable, operations) = spec
+    picked = sample_alias(generator, operationTable, count)
+    firstNumbers = numpy.zeros(count, numpy.int64)
+    secondNumbers = numpy.zeros(count, numpy.int64)
+    for (operation, (weight, firstLow, firstHigh, secondLow, secondHigh,
+                     parameter, numberTable)) in enumerate(operations):
+        chosen = picked == operation
+        size = int(numpy.count_nonzero(chosen))
+        if size == 0:
+            continue
+        if parameter == 'g1':
+            first = firstLow + sample_alias(generator, numberTable, size)
+            second = generator.integers(
+                secondLow, numpy.minimum(secondHigh, first - 1) + 1)
+        elif parameter == 'g2':
+            second = secondLow + sample_alias(generator, numberTable, size)
+            first = generator.integers(
+                firstLow, numpy.minimum(firstHigh, second - 1) + 1)
+        elif parameter == 'w1':
+            second = secondLow + sample_alias(generator, numberTable, size)
+            first = second * generator.integers((firstLow - 1) // second + 1,
+                                                firstHigh // second + 1)
+        else:
+            first = generator.integers(firstLow, firstHigh + 1, size)
+            second = generator.integers(secondLow, secondHigh + 1, size)
+            if parameter == 'r':
+                (first, second) = (second, first)
+        firstNumbers[chosen] = first
+        secondNumbers[chosen] = second
+    return (picked, firstNumbers, secondNumbers)
+
+
+def calculate_all(operations, firstNumbers, secondNumbers):
+    '''calculate_all(operations, firstNumbers, secondNumbers)
+        -> numpy.ndarray
+    Returns the answer of every question, like questions.calculate()
+    (÷ always comes out whole).
+    '''
+    divisors = numpy.where(secondNumbers == 0, 1, secondNumbers)
+    return numpy.choose(operations, (firstNumbers + secondNumbers,
+                                     firstNumbers - secondNumbers,
+                                     firstNumbers * secondNumbers,
+                                     firstNumbers // divisors))
+
+
+def hard_facts(operations, firstNumbers, secondNumbers, answers):
+    '''hard_facts(operations, firstNumbers, secondNumbers, answers)
+        -> numpy.ndarray
+    Returns whether each question is a hard fact (see the top of this
+    file).
+    '''
+    firstOnes = numpy.abs(firstNumbers) % 10
+    secondOnes = numpy.abs(secondNumbers) % 10
+    return numpy.choose(operations, (
+        firstOnes + secondOnes >= 10,
+        firstOnes < secondOnes,
+        numpy.minimum(numpy.abs(firstNumbers), numpy.abs(secondNumbers)) >= 10,
+        (secondNumbers > 10) | (answers > 10)))
+
+
+def response_times(generator, operations, answers, hard):
+    '''response_times(generator, operations, answers, hard)
+        -> (numpy.ndarray, numpy.ndarray)
+    Returns (SECONDS, CORRECT) for a player answering each question,
+    under the response-time model.
+    '''
+    digits = numpy.floor(numpy.log10(numpy.abs(answers) + 1)) + 1
+    seconds = ((BASE_TIME + numpy.array(OPERATOR_TIMES)[operations]
+                + DIGIT_TIME * digits + HARD_TIME * hard)
+               * generator.lognormal(0, TIME_SPREAD, len(answers)))
+    correct = (generator.random(len(answers))
+               >= numpy.where(hard, HARD_WRONG_CHANCE, WRONG_CHANCE))
+    return (seconds, correct)
+
+
+def expected_points(generator, spec, difficulty, games):
+    '''expected_points(generator, spec, difficulty, games)
+        -> (float, float, float)
+    Plays games games on difficulty (using spec) under the
+    response-time model, all at once, and returns (MEAN POINTS, MEDIAN
+    POINTS, MEAN QUESTIONS ANSWERED CORRECTLY).
+    '''
+    streakPoints = numpy.array([0] + [scoring.streak_points(difficulty, i)
+                                      for i in range(1, MAX_STREAK + 1)])
+    totalTime = recordings.TIME_LIMITS[difficulty]
+    timed = difficulty >= 7
+    points = numpy.zeros(games, numpy.int64)
+    streaks = numpy.zeros(games, numpy.int64)
+    answered = numpy.zeros(games, numpy.int64)
+    timesUsed = numpy.zeros(games)
+    playing = numpy.arange(games)
+    while len(playing) > 0:
+        (operations, firstNumbers, secondNumbers) = sample_questions(
+            generator, spec, len(playing))
+        answers = calculate_all(operations, firstNumbers, secondNumbers)
+        (seconds, correct) = response_times(
+            generator, operations, answers,
+            hard_facts(operations, firstNumbers, secondNumbers, answers))
+        if timed:
+            timesUsed[playing] += seconds
+            correct &= timesUsed[playing] <= totalTime
+        else:
+            correct &= seconds <= totalTime
+
+        # Same as scoring.score_answer()
+        fast = seconds <= scoring.STREAK_TIME
+        newStreaks = numpy.where(fast, numpy.minimum(streaks[playing] + 1,
+                                                     MAX_STREAK), 0)
+        gained = numpy.where(fast, streakPoints[newStreaks], 1)
+        points[playing] += numpy.where(correct, gained, 0)
+        streaks[playing] = newStreaks
+        answered[playing] += correct
+        playing = playing[correct]
+    return (float(points.mean()), float(numpy.median(points)),
+            float(answered.mean()))
+
+
+def distractor_closeness(spec, typed, count):
+    '''distractor_closeness(spec, typed, count) -> (float, float) OR None
+    Makes count questions from spec with questions.make_question() and
+    returns (MEAN DISTANCE, CLOSE SHARE) of their wrong answers: the
+    mean distance from the correct answer as a share of it, and the
+    share at most NEAR_DISTANCE away. Returns None if typed (there are
+    no wrong answers to pick from).
+    '''
+    if typed:
+        return None
+    distances = []
+    relatives = []
+    for i in range(count):
+        question = questions.make_question(spec)
+        trueAnswer = question[6]
+        for wrongAnswer in question[1:5]:
+            if wrongAnswer != trueAnswer:
+                distances.append(abs(wrongAnswer - trueAnswer))
+                relatives.append(distances[-1] / max(abs(trueAnswer), 1))
+    distances = numpy.array(distances)
+    return (float(numpy.mean(relatives)),
+            float(numpy.mean(distances <= NEAR_DISTANCE)))
+
+
+def fact_counts(operations, firstNumbers, secondNumbers):
+    '''fact_counts(operations, firstNumbers, secondNumbers) -> dict
+    Returns how often each question came up, with questions as keys
+    made of their operation and numbers.
+    '''
+    keys = ((operations.astype(numpy.int64) << 42)
+            | ((firstNumbers & 0x1FFFFF) << 21) | (secondNumbers & 0x1FFFFF))
+    (facts, counts) = numpy.unique(keys, return_counts = True)
+    return dict(zip(facts.tolist(), (counts / len(keys)).tolist()))
+
+
+def overlap(firstCounts, secondCounts):
+    '''overlap(firstCounts, secondCounts) -> float
+    Returns the share of questions two levels have in common (from
+    fact_counts()): 0 if they never ask the same thing, 1 if they ask
+    everything equally often.
+    '''
+    return sum(min(share, secondCounts[fact])
+               for (fact, share) in firstCounts.items()
+               if fact in secondCounts)
+
+
+def calibrate_level(generator, spec, level, count):
+    '''calibrate_level(generator, spec, level, count) -> dict
+    Samples count questions from spec and returns what's reported about
+    level.
+    '''
+    timeStarted = time.perf_counter()
+    (operations, firstNumbers, secondNumbers) = sample_questions(
+        generator, spec, count)
+    answers = calculate_all(operations, firstNumbers, secondNumbers)
+    hard = hard_facts(operations, firstNumbers, secondNumbers, answers)
+    seconds = time.perf_counter() - timeStarted
+    operatorCounts = numpy.bincount(operations, minlength = len(OPERATORS))
+    return {'count': count,
+            'seconds': seconds,
+            'operators': operatorCounts / count,
+            'hard': [float(hard[operations == operation].mean())
+                     if operatorCounts[operation] else None
+                     for operation in range(len(OPERATORS))],
+            'allHard': float(hard.mean()),
+            'magnitudes': numpy.bincount(
+                numpy.searchsorted(MAGNITUDE_EDGES, numpy.abs(answers),
+                                   side = 'right'),
+                minlength = len(MAGNITUDE_NAMES)) / count,
+            'median': float(numpy.median(answers)),
+            'percentile90': float(numpy.percentile(answers, 90)),
+            'distractors': distractor_closeness(spec, level == 6,
+                                                DISTRACTOR_COUNT),
+            'facts': fact_counts(operations, firstNumbers, secondNumbers)}
+
+
+def format_share(share):
+    '''format_share(share) -> str
+    Returns share as a percentage, or "-" if it's None.
+    '''
+    return '-' if share is None else format(share, '.1%')
+
+
+def print_report(results, points):
+    '''Prints the tables for results (from calibrate_level(), one for
+    each level) and points (from expected_points(), one for each
+    difficulty).
+    '''
+    levels = range(1, len(LEVEL_NAMES))
+    print('Level'.ljust(9) + ''.join(operator.rjust(8) + 'hard'.rjust(7)
+                                     for operator in OPERATORS)
+          + 'All hard'.rjust(10))
+    for level in levels:
+        result = results[level]
+        print(LEVEL_NAMES[level].ljust(9)
+              + ''.join(format_share(result['operators'][operation]).rjust(8)
+                        + format_share(result['hard'][operation]).rjust(7)
+                        for operation in range(len(OPERATORS)))
+              + format_share(result['allHard']).rjust(10))
+    print()
+
+    print('Answer'.ljust(9) + ''.join(name.rjust(9)
+                                      for name in MAGNITUDE_NAMES)
+          + 'Median'.rjust(8) + '90th'.rjust(7))
+    for level in levels:
+        result = results[level]
+        print(LEVEL_NAMES[level].ljust(9)
+              + ''.join(format_share(share).rjust(9)
+                        for share in result['magnitudes'])
+              + format(result['median'], 'g').rjust(8)
+              + format(result['percentile90'], 'g').rjust(7))
+    print()
+
+    print('Wrong answers'.ljust(14) + 'Mean distance'.rjust(15)
+          + ('Within ' + str(NEAR_DISTANCE)).rjust(11))
+    for level in levels:
+        closeness = results[level]['distractors']
+        if closeness is None:
+            print(LEVEL_NAMES[level].ljust(14) + 'typed'.rjust(15))
+        else:
+            print(LEVEL_NAMES[level].ljust(14)
+                  + format_share(closeness[0]).rjust(15)
+                  + format_share(closeness[1]).rjust(11))
+    print()
+
+    print('Difficulty'.ljust(14) + 'Mean points'.rjust(13)
+          + 'Median'.rjust(9) + 'Correct'.rjust(9))
+    for difficulty in range(1, len(recordings.LEVELS)):
+        (mean, median, answered) = points[difficulty]
+        print((str(difficulty) + ' ('
+               + LEVEL_NAMES[recordings.LEVELS[difficulty]] + ')').ljust(14)
+              + format(mean, '.1f').rjust(13) + format(median, 'g').rjust(9)
+              + format(answered, '.1f').rjust(9))
+    print()
+
+    print('Overlap'.ljust(9) + ''.join(LEVEL_NAMES[level][:7].rjust(9)
+                                       for level in levels))
+    flagged = []
+    for first in levels:
+        line = LEVEL_NAMES[first].ljust(9)
+        for second in levels:
+            shared = overlap(results[first]['facts'],
+                             results[second]['facts'])
+            line += format_share(shared).rjust(9)
+            if first < second and shared > OVERLAP_LIMIT:
+                flagged.append((first, second, shared))
+        print(line)
+    print()
+    for (first, second, shared) in flagged:
+        print('Warning: ' + LEVEL_NAMES[first] + ' and ' + LEVEL_NAMES[second]
+              + ' share ' + format_share(shared) + ' of their questions.')
+
+
+if __name__ == '__main__':
+    arguments = sys.argv[1:]
+    seed = None
+    games = 20000
+    for option in ('--seed', '--games'):
+        if option in arguments:
+            index = arguments.index(option)
+            if option == '--seed':
+                seed = int(arguments[index + 1])
+            else:
+                games = int(arguments[index + 1])
+            del arguments[index:index + 2]
+    count = int(arguments[0]) if arguments else 1000000
+
+    generator = numpy.random.default_rng(seed)
+    random.seed(seed)
+    specs = verify.load_specs()
+    results = [None]
+    for level in range(1, len(LEVEL_NAMES)):
+        results.append(calibrate_level(generator, specs[level], level, count))
+    points = [None]
+    for difficulty in range(1, len(recordings.LEVELS)):
+        points.append(expected_points(
+            generator, specs[recordings.LEVELS[difficulty]], difficulty,
+            games))
+    print_report(results, points)
+    sampleTime = sum(result['seconds'] for result in results[1:])
+    print()
+    print('Sampled ' + format(count * (len(LEVEL_NAMES) - 1), ',')
+          + ' questions in ' + format(sampleTime, '.2f') + 's ('
+          + format(count * (len(LEVEL_NAMES) - 1) / sampleTime, ',.0f')
+          + ' questions/s).')
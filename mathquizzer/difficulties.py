@@ -0,0 +1,190 @@
+# Math Quizzer difficulties
+# Part of Math Quizzer. Loads custom difficulties from
+# MATHQUIZZER-difficulties.toml (or MATHQUIZZER-difficulties.json), so
+# that the numbers in each difficulty can be changed without editing
+# the game. Difficulties that aren't in the file keep their usual
+# numbers.
+#
+# In TOML, each difficulty lists its four operations (+, −, × and ÷)
+# either in the same form as questions.difficultyData or as tables:
+#
+# [levels]
+# 1 = ['3;3-7;3-10;r', '2;6-15;3-10;g1', '0;0-0;0-0;', '0;0-0;0-0;']
+#
+# [[levels.3]]
+# weight = 3
+# first = [7, 18]
+# second = [10, 25]
+# parameter = 'r'
+# ...
+#
+# The numbers are 1 = Easy, 2 = Medium, 3 = Hard (and practice),
+# 4 = Harder, 5 = Insane, 6 = AAAAAAA, 7 = Timed. JSON files use the
+# same layout: {"levels": {"1": [...], ...}}.
+#
+# Every difficulty is checked when the file is loaded, and the checked
+# difficulties are saved in MATHQUIZZER-difficulties.cache along with
+# the file's size, modification time and SHA-256 hash. If the file
+# hasn't changed, the next launch uses the cache instead of checking
+# everything again.
+#
+# Usage:
+#   python difficulties.py [FILE]
+# Checks FILE (MATHQUIZZER-difficulties.toml or .json by default) and
+# prints any problems.
+
+import hashlib
+import json
+import os
+import sys
+import tomllib
+
+import questions
+
+PATHS = ('MATHQUIZZER-difficulties.toml', 'MATHQUIZZER-difficulties.json')
+CACHE_PATH = 'MATHQUIZZER-difficulties.cache'
+CACHE_VERSION = 2
+
+
+def find_difficulty_file():
+    '''find_difficulty_file() -> str OR None
+    Returns the path of the custom difficulty file, or None if there
+    isn't one.
+    '''
+    for path in PATHS:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def file_stamp(path):
+    '''file_stamp(path) -> (int, int) OR None
+    Returns the size and modification time (in nanoseconds) of path, or
+    None if it doesn't exist.
+    '''
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def read_operation(operation):
+    '''read_operation(operation) -> str OR tuple
+    Returns operation (from a difficulty file) in a form
+    questions.compile_difficulty() accepts.
+    '''
+    if isinstance(operation, str):
+        return operation
+    if not isinstance(operation, dict):
+        raise ValueError('Each operation should be a string or a table, not '
+                         + repr(operation) + '.')
+    unknownKeys = set(operation) - {'weight', 'first', 'second', 'parameter'}
+    if unknownKeys:
+        raise ValueError('Unknown key ' + repr(sorted(unknownKeys)[0])
+                         + ' in an operation.')
+    try:
+        (firstLow, firstHigh) = operation.get('first', (0, 0))
+        (secondLow, secondHigh) = operation.get('second', (0, 0))
+        parsed = (operation.get('weight', 0), firstLow, firstHigh,
+                  secondLow, secondHigh, operation.get('parameter', ''))
+    except (TypeError, ValueError):
+        raise ValueError('first and second should each be [LOW, HIGH].') \
+              from None
+    if not all(isinstance(i, int) and not isinstance(i, bool)
+               for i in parsed[:5]):
+        raise ValueError('weight, first and second should be whole numbers.')
+    if not isinstance(parsed[5], str):
+        raise ValueError('parameter should be a string.')
+    return parsed
+
+
+def compile_file(source, path):
+    '''compile_file(source, path) -> dict
+    Checks the difficulty file source (the bytes of path) and returns
+    {difficulty number: compiled difficulty}. Raises ValueError if
+    anything is wrong.
+    '''
+    try:
+        if path.endswith('.json'):
+            contents = json.loads(source)
+        else:
+            contents = tomllib.loads(source.decode())
+    except (UnicodeDecodeError, json.JSONDecodeError,
+            tomllib.TOMLDecodeError) as error:
+        raise ValueError(path + ' could not be read: ' + str(error)) from None
+    if not isinstance(contents, dict) or not isinstance(
+        contents.get('levels'), dict):
+        raise ValueError(path + ' needs a levels table.')
+    specs = {}
+    for (level, operations) in contents['levels'].items():
+        if (not level.isdigit()
+            or not 1 <= int(level) < len(questions.difficultyData)):
+            raise ValueError(path + ': there is no difficulty number '
+                             + level + '.')
+        if not isinstance(operations, list):
+            raise ValueError(path + ': difficulty ' + level
+                             + ' should be a list of 4 operations.')
+        try:
+            specs[int(level)] = questions.compile_difficulty(
+                [read_operation(i) for i in operations])
+        except ValueError as error:
+            raise ValueError(path + ': difficulty ' + level + ': '
+                             + str(error)) from None
+    return specs
+
+
+def load_difficulties(path):
+    '''load_difficulties(path) -> tuple
+    Returns every difficulty, compiled, with the ones in path replacing
+    the usual ones. Uses the cache if path hasn't changed since it was
+    checked. Raises ValueError if path has a problem, or
+    FileNotFoundError if it's gone.
+    '''
+    stamp = file_stamp(path)
+    if stamp is None: # Deleted since it was found
+        raise FileNotFoundError(path + ' could not be found.')
+    try:
+        with open(CACHE_PATH) as cacheFile:
+            cache = json.load(cacheFile)
+        if cache['version'] != CACHE_VERSION or cache['path'] != path:
+            cache = None
+    except (OSError, ValueError, KeyError, TypeError):
+        cache = None
+
+    if cache is not None and cache['stamp'] == list(stamp):
+        specs = cache['specs']
+    else:
+        with open(path, 'rb') as difficultyFile:
+            source = difficultyFile.read()
+        sourceHash = hashlib.sha256(source).hexdigest()
+        if cache is not None and cache['hash'] == sourceHash:
+            specs = cache['specs'] # Only the modification time changed
+        else:
+            specs = {str(level): spec for (level, spec)
+                     in compile_file(source, path).items()}
+        cache = {'version': CACHE_VERSION, 'path': path, 'stamp': stamp,
+                 'hash': sourceHash, 'specs': specs}
+        with open(CACHE_PATH + '.tmp', 'w') as cacheFile:
+            json.dump(cache, cacheFile)
+        os.replace(CACHE_PATH + '.tmp', CACHE_PATH)
+
+    compiled = list(questions.compiledDifficultyData)
+    for (level, (operationTable, operations)) in specs.items():
+        compiled[int(level)] = (operationTable,
+                                [tuple(i) for i in operations])
+    return tuple(compiled)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else find_difficulty_file()
+    if path is None:
+        sys.exit('No difficulty file found.')
+    with open(path, 'rb') as difficultyFile:
+        source = difficultyFile.read()
+    try:
+        levels = sorted(compile_file(source, path))
+    except ValueError as error:
+        sys.exit(str(error))
+    print(path + ' is OK. Custom difficulties: '
+          + ', '.join([str(i) for i in levels]))
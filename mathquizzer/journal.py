@@ -0,0 +1,133 @@
+# Math Quizzer journal
+# Part of Math Quizzer. Keeps track of the game being played, so that if
+# the window is closed or the game crashes before the game ends, the
+# player can resume it (or record it as finished) the next time.
+#
+# The journal is MATHQUIZZER-journal.txt in the player's profile (see
+# profiles.py). It's started when a game starts and deleted when the
+# game's score is saved, so it only exists while a game is unfinished:
+#
+# # Belongs to the game Math Quizzer.
+# start 1706745600 7            When the game started (seconds since
+#                                 the epoch) and its difficulty
+# question 1706745613 5 3 11.90 12 14 15 13 C 15 7 0 8 What is 7 + 8?
+#                               When the line was written, the points
+#                                 and streak before the question, the
+#                                 seconds used so far (of the game in
+#                                 timed difficulties, or of the question
+#                                 in the others), and the question (its
+#                                 answers, with - for none, then the
+#                                 rest of it, as in questions.py, with
+#                                 the prompt last)
+#
+# Each question shown adds one short line with one write, so keeping the
+# journal doesn't slow the game down. A correct answer doesn't need its
+# own line, since the next question's line has the points and streak
+# after it. When the window is closed, the question being asked is
+# written again with the time used on it. The file isn't synced to the
+# disk, so it's safe if the game is closed or crashes (though a crash
+# gives back the time used since the question was shown), but not if
+# the computer loses power. Only the last line matters: the game resumes
+# with that question and that much time used. A line cut off by a crash
+# is ignored.
+
+import os
+
+HEADER = '# Belongs to the game Math Quizzer.'
+PATH = 'MATHQUIZZER-journal.txt'
+
+
+def start_journal(path, timeStarted, difficulty):
+    '''start_journal(path, timeStarted, difficulty) -> file
+    Starts a new journal at path for a game on difficulty that started
+    at timeStarted (seconds since the epoch), replacing any old one, and
+    returns it.
+    '''
+    journalFile = open(path, 'w')
+    journalFile.write(HEADER + '\nstart ' + str(timeStarted) + ' '
+                      + str(difficulty) + '\n')
+    journalFile.flush()
+    return journalFile
+
+
+def record_question(journalFile, timeWritten, points, streak, elapsed,
+                    question):
+    '''Adds the question being asked at timeWritten to journalFile: the
+    game had points and streak before it, elapsed seconds of its time
+    were used, and question is from questions.make_question().
+    '''
+    answers = ['-' if i is None else str(i) for i in question[1:5]]
+    journalFile.write(' '.join(['question', str(timeWritten), str(points),
+                                str(streak), format(elapsed, '.3f')]
+                               + answers
+                               + [str(i) for i in question[5:]]
+                               + [question[0]]) + '\n')
+    journalFile.flush()
+
+
+def read_question(parts):
+    '''read_question(parts) -> tuple
+    Returns the question in parts (the fields of a question line after
+    the elapsed seconds). Raises ValueError if it isn't formed properly.
+    '''
+    if len(parts) != 10:
+        raise ValueError('a question has 10 parts')
+    answers = [None if i == '-' else int(i) for i in parts[:4]]
+    return (parts[9], *answers, parts[4],
+            *[int(i) for i in parts[5:9]])
+
+
+def finish_journal(journalFile):
+    '''Closes and deletes journalFile, once its game has been saved.'''
+    journalFile.close()
+    remove_journal(journalFile.name)
+
+
+def remove_journal(path):
+    '''Deletes the journal at path, if there is one.'''
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def read_journal(path):
+    '''read_journal(path) -> dict OR None
+    Returns the unfinished game in the journal at path, or None if
+    there isn't one. The dict has the game's difficulty, timeStarted,
+    and (from its last line) timeAnswered, points, streak, elapsed and
+    question (the question being asked, or None if none had been shown
+    yet).
+    '''
+    try:
+        with open(path) as journalFile:
+            lines = journalFile.read().split('\n')
+    except FileNotFoundError:
+        return None
+    if lines[0] != HEADER or len(lines) < 3:
+        return None
+    try:
+        (key, timeStarted, difficulty) = lines[1].split(' ')
+        game = {'difficulty': int(difficulty),
+                'timeStarted': int(timeStarted),
+                'timeAnswered': int(timeStarted),
+                'points': 0,
+                'streak': 0,
+                'elapsed': 0,
+                'question': None}
+    except ValueError:
+        return None
+    for line in lines[2:-1]: # The last one is cut off or empty
+        parts = line.split(' ', 14)
+        try:
+            if parts[0] != 'question':
+                continue
+            question = read_question(parts[5:])
+            game.update(timeAnswered = int(parts[1]),
+                        points = int(parts[2]),
+                        streak = int(parts[3]),
+                        elapsed = float(parts[4]),
+                        question = question)
+        except (ValueError, IndexError):
+            continue
+    return game
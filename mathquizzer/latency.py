@@ -0,0 +1,54 @@
+# Math Quizzer latency
+# Part of Math Quizzer. Measures the time from a click or key press that
+# answers a question to the frame that shows whether it was right, for
+# the game and terminal.py when they're run with --measure-latency.
+#
+# Clicks and key presses are stamped with time.perf_counter() as soon as
+# they're received, and the same stamps are used to time answers, so a
+# slow frame between receiving an answer and handling it doesn't count
+# against the player. The latency measured here is how long that gap
+# (plus drawing the feedback) really is.
+
+import math
+
+FLAG = '--measure-latency'
+
+
+def new_latency_log():
+    '''new_latency_log() -> list
+    Returns an empty list of latencies, in seconds.
+    '''
+    return []
+
+
+def add_latency(log, eventTime, shownTime):
+    '''add_latency(log, eventTime, shownTime) -> float
+    Adds the latency of an answer received at eventTime whose feedback
+    was shown at shownTime (both from time.perf_counter()) to log, and
+    returns it.
+    '''
+    log.append(shownTime - eventTime)
+    return log[-1]
+
+
+def format_milliseconds(seconds):
+    '''format_milliseconds(seconds) -> str
+    Returns seconds as milliseconds, like '12.3 ms'.
+    '''
+    return format(seconds * 1000, '.1f') + ' ms'
+
+
+def latency_summary(log):
+    '''latency_summary(log) -> str
+    Returns the number of latencies in log, their median, 95th
+    percentile and worst one.
+    '''
+    if not log:
+        return 'No answers were measured.'
+    latencies = sorted(log)
+    median = latencies[(len(latencies) - 1) // 2]
+    percentile95 = latencies[math.ceil(0.95 * len(latencies)) - 1]
+    return (str(len(latencies)) + ' answers: median '
+            + format_milliseconds(median) + ', 95th percentile '
+            + format_milliseconds(percentile95) + ', worst '
+            + format_milliseconds(latencies[-1]))
@@ -47,11 +47,29 @@
 #
 # Earlier changes are located at aops.com/community/h3235279.
 
+import collections
 import math
 import random
+import sys
 import time
 import turtle
 
+import adaptive
+import banks
+import difficulties
+import journal
+import latency
+import memory
+import metrics
+import practice
+import profiles
+import questions
+import recordings
+import rollups
+import scoring
+import settings
+import telemetry
+
 VERSION = 'v1.3'
 BACKGROUND_COLOR = '#8070BF'
 TEXT_COLOR = '#FFFFFF'
@@ -64,9 +82,41 @@ window.bgcolor(BACKGROUND_COLOR)
 turtle.tracer(0)
 
 t = turtle.Turtle()
+canvas = window.getcanvas()
+timeLabels = turtle.Turtle() # Only used for the "Xm Ys ago" labels in
+timeLabels.hideturtle()      # statistics, so they can be redrawn alone
+timeLabels.penup()
 
 mode = 'menu'
 data = None
+expressionLevel = (0, 0) # How often questions are expressions like
+                         # (a + b) × c, and how long they are
+bankCursor = None # Where the game is in MATHQUIZZER-bank-N.dat, if the
+                  # difficulty being played has a question bank
+gameJournal = None # MATHQUIZZER-journal.txt of the game being played
+unfinishedGame = None # The game in the journal when the game was opened,
+                      # if it didn't end (see journal.py)
+gameRecording = None # The game being played, so that its score can be
+                     # checked later (see recordings.py)
+
+# Clicks waiting to be handled, as (TIME, X, Y), where TIME is from
+# time.perf_counter() when the click was received. Question times are
+# also from time.perf_counter().
+inputEvents = collections.deque()
+answerEventTime = 0 # When the current question was answered
+feedbackEventTime = None # When the answer that the next frame shows
+                         # whether it was right was clicked
+latencyLog = None # Only used with --measure-latency (see latency.py)
+memoryMonitor = None # Only used with --monitor-memory or --soak-test
+                     # (see memory.py)
+soakCycles = 0 # Only used with --soak-test; how many cycles it runs
+soakCyclesDone = 0 # Only used with --soak-test
+soakStage = 'play' # Only used with --soak-test; 'play', 'statistics', or
+                   # 'menu', whichever the cycle goes to next
+soakBaseline = None # Only used with --soak-test; the memory after the
+                    # first cycles
+gameMetrics = None # Only used if metrics are turned on (see metrics.py)
+metricsWriteTime = 0 # Last time the metrics were written
 
 points = 0
 question = None
@@ -74,7 +124,7 @@ questionAnswer = ''
 questionMakeTime = 0
 questionCorrect = 0 # 0 = unanswered, 1 = correct, -1 = incorrect,
                     # -2 = out of time
-AAAAAAAUnlocked = False
+AAAAAAAUnlocked = False # Kept the same as the setting (see settings.py)
 difficulty = 0 # 0 = not playing, 1+ = difficulty of round
 answerTime = 0
 pointsGained = 0
@@ -94,44 +144,158 @@ difficultyStatistics = 0 # Only used in statistics
 tabStatistics = 0 # Only used in statistics
 sortBy = 0 # Only used in statistics
 pageStatistics = 0 # Only used in statistics
+viewStatistics = 0 # Only used in statistics; 0 = table, 1 = trend chart
 allAttempts = [] # Only used in statistics
-
-# DATA:
-#
-# 3;3-7;3-10;r
-# 3;            Weight (how often this operator is picked)
-#   3-7;        First number range
-#       3-10;   Second number range
-#            r  Random order
+statisticsView = None # Only used in statistics
+statisticsDrawn = None # Only used in statistics
+statisticsRefreshTime = 0 # Only used in statistics
+
+highscoresVersion = 0 # Goes up by 1 every time a score is saved
+scoresCheckTime = 0 # Last time the scores file was checked for scores
+                    # saved by other games
+scoreSummary = (None, None, None) # Median, 90th percentile, and fraction
+                                  # of attempts beaten, for the last game
+
+adaptiveSkill = None # Only used in adaptive mode
+adaptiveGrid = None # Only used in adaptive mode; made the first time it's
+adaptiveGridSpecs = None # played, and again if the difficulties change
+practiceDeck = None # Only used in practice; loaded the first time
+                    # practice mode is played
+profileName = None # Name of the player's profile; '' is the shared one
+gameSettings = None # Settings of the player's profile (see settings.py)
+sharedSettings = None # Settings of the shared profile
+frameTime = 0 # Shortest time a frame takes (from the FrameRate setting)
+
+difficultySpecs = questions.compiledDifficultyData # Replaced by the
+difficultyFile = None                              # custom difficulties
+difficultyStamp = None                             # if there are any
+difficultyCheckTime = 0
+
+# WIDGETS:
 #
-# 2;6-15;3-10;g1
-# 2;              Weight
-#   6-15;         First number range
-#        3-10;    Second number range
-#             g1  First number is always greater than second number
+# ('easy', 'rectangle', (-153, 63, -7, 17), 3, (...))
+#  'easy'                                               Name
+#          'rectangle'                                  Shape
+#                       (-153, 63, -7, 17)              Geometry
+#                                           3           Margin
+#                                              (...)    Style
 #
-# 2;10-25;3-6;w1
-# 2;              Weight
-#   10-25;        First number range
-#         3-6;    Second number range
-#             w1  Change w1 to nearest integer to make sure result is an
-#                   integer
-
-difficultyData = (None,
-                  ['3;3-7;3-10;r', '2;6-15;3-10;g1', # Easy
-                   '0;0-0;0-0;', '0;0-0;0-0;'],
-                  ['2;5-11;5-13;r', '3;10-20;5-15;g1', # Medium
-                   '3;2-8;4-10;r', '0;0-0;0-0;'],
-                  ['3;7-18;10-25;r', '3;20-35;8-28;g1', # Hard
-                   '6;3-10;7-12;r', '2;10-25;3-6;w1'],
-                  ['2;10-25;15-40;r', '2;25-55;12-40;g1', # Harder
-                   '5;4-12;8-16;r', '2;18-50;5-9;w1'],
-                  ['2;17-40;25-75;r', '2;30-85;15-60;g1', # Insane
-                   '7;5-15;10-20;r', '3;30-90;7-12;w1'],
-                  ['2;30-100;50-150;r', '2;100-200;50-125;g1', # AAAAAAA
-                   '7;8-20;15-25;r', '4;60-175;9-16;w1'],
-                  ['4;7-18;10-25;r', '4;20-35;8-28;g1', # Timed
-                   '7;3-10;7-12;r', '3;15-45;3-9;w1'])
+# The geometry is what gets drawn: (leftX, topY, rightX, bottomY) for
+# rectangles and (x, y, radius) for circles. The margin is how far past
+# the geometry a click still counts, so that clicking on the border of a
+# button works. The style holds whatever else the drawing function needs
+# (colors, labels, the difficulty a button starts, etc.).
+
+BACK_BUTTON = ('back', 'circle', (-160, -160, 30), 2, None)
+GAMEMODE_BUTTON = ('gamemode', 'rectangle', (-65, 123, 65, 87), 3)
+DIFFICULTY_BUTTONS = (('difficulty', 'rectangle', (-153, 63, -7, 17), 3),
+                      ('difficulty', 'rectangle', (7, 63, 153, 17), 3),
+                      ('difficulty', 'rectangle', (-153, 3, -7, -43), 3),
+                      ('difficulty', 'rectangle', (7, 3, 153, -43), 3),
+                      ('difficulty', 'rectangle', (-153, -57, -7, -103), 3),
+                      ('difficulty', 'rectangle', (7, -57, 153, -103), 3))
+STATISTICS_TAB_BUTTON = ('tab', 'rectangle', (-180, 185, -70, 150), 2)
+STATISTICS_HEADER_X = (-35, 5, 45, 85, 125, 165)
+
+layouts = {
+    'menu': [('play', 'circle', (-115, -50, 50), 2, None),
+             ('help', 'circle', (0, -50, 50), 2, None),
+             ('quit', 'circle', (115, -50, 50), 2, None),
+             ('profile', 'rectangle', (-110, -125, 110, -165), 2, None)],
+    'help': [BACK_BUTTON],
+    'resume': [('resume', 'rectangle', (-153, -47, -7, -93), 3,
+                ('#00DF00', '#000000', 'Resume')),
+               ('finish', 'rectangle', (7, -47, 153, -93), 3,
+                ('#FFFFFF', '#000000', 'Record as finished'))],
+    'difficulty regular': (
+        [GAMEMODE_BUTTON + ('Regular',)]
+        + [button + (style,) for (button, style) in zip(
+            DIFFICULTY_BUTTONS,
+            [('#009FFF', '#000000', '1', 'Easy', 1, 10, 1),
+             ('#00BF00', '#000000', '2', 'Normal', 2, 10, 2),
+             ('#FFCF00', '#000000', '3', 'Hard', 3, 10, 3),
+             ('#FF3000', '#FFFFFF', '4', 'Harder', 4, 8, 4),
+             ('#FF00FF', '#000000', '5', 'Insane', 5, 8, 5),
+             ('#8020BF', '#FFFFFF', '6', 'AAAAAAA', 6, 8, 6)])]
+        + [BACK_BUTTON,
+           ('statistics', 'circle', (160, -160, 30), 2, None)]),
+    'difficulty timed': (
+        [GAMEMODE_BUTTON + ('Timed',)]
+        + [button + (style,) for (button, style) in zip(
+            DIFFICULTY_BUTTONS,
+            [('#EF8F10', '#000000', ' 30', '  seconds', 7, 30, 7),
+             ('#90DF00', '#000000', '1', 'minute', 8, 60, 7),
+             ('#00AF8F', '#000000', '2', 'minutes', 9, 120, 7)])]
+        + [BACK_BUTTON,
+           ('statistics', 'circle', (160, -160, 30), 2, None)]),
+    'difficulty other': (
+        [GAMEMODE_BUTTON + ('Other',)]
+        + [button + (style,) for (button, style) in zip(
+            DIFFICULTY_BUTTONS,
+            [('#40CFAF', '#000000', 'P', 'Practice', 10, 10, 3),
+             ('#FF8FCF', '#000000', 'A', 'Adaptive', 11, 10, 1)])]
+        + [BACK_BUTTON,
+           ('statistics', 'circle', (160, -160, 30), 2, None)]),
+    'play': [('answer', 'rectangle', (-153, 43, -7, -3), 3,
+              ('#FF0040', '#FFFFFF', 'A')),
+             ('answer', 'rectangle', (7, 43, 153, -3), 3,
+              ('#FFCF00', '#000000', 'B')),
+             ('answer', 'rectangle', (-153, -17, -7, -63), 3,
+              ('#00DF00', '#000000', 'C')),
+             ('answer', 'rectangle', (7, -17, 153, -63), 3,
+              ('#009FFF', '#000000', 'D'))],
+    'play typed': ([('key', 'rectangle', (x, -7, x + 35, -53), 2, (digit,))
+                    for (x, digit) in zip(range(-193, 194, 39), '1234567890')]
+                   + [('key', 'rectangle', (-193, -57, -41, -103), 2,
+                       ('Delete',)),
+                      ('key', 'rectangle', (-37, -57, 115, -103), 2,
+                       ('Clear',)),
+                      ('key', 'rectangle', (119, -57, 193, -103), 2,
+                       ('Go',))]),
+    'statistics regular': (
+        [STATISTICS_TAB_BUTTON + ('Regular',)]
+        + [('header', 'circle', (x, 169, 18), 2, style)
+           for (x, style) in zip(STATISTICS_HEADER_X,
+                                 [('1', '#009FFF', '#000000', 1),
+                                  ('2', '#00BF00', '#000000', 2),
+                                  ('3', '#FFCF00', '#000000', 3),
+                                  ('4', '#FF3000', '#FFFFFF', 4),
+                                  ('5', '#FF00FF', '#000000', 5),
+                                  ('6', '#8020BF', '#FFFFFF', 6)])]),
+    'statistics timed': (
+        [STATISTICS_TAB_BUTTON + ('Timed',)]
+        + [('header', 'circle', (x, 169, 18), 2, style)
+           for (x, style) in zip(STATISTICS_HEADER_X,
+                                 [('30s', '#EF8F10', '#000000', 7),
+                                  ('1m', '#90DF00', '#000000', 8),
+                                  ('2m', '#00AF8F', '#000000', 9)])]),
+    'statistics other': (
+        [STATISTICS_TAB_BUTTON + ('Other',)]
+        + [('header', 'circle', (x, 169, 18), 2, style)
+           for (x, style) in zip(STATISTICS_HEADER_X,
+                                 [('P', '#40CFAF', '#000000', 10),
+                                  ('A', '#FF8FCF', '#000000', 11)])])}
+for layout in ['statistics regular', 'statistics timed', 'statistics other']:
+    layouts[layout] += [BACK_BUTTON,
+                        ('view', 'rectangle', (-185, -92, -75, -120), 2, None),
+                        ('sort', 'rectangle', (-70, -160, 30, -190), 2, None),
+                        ('page up', 'circle', (90, -160, 30), 2, None),
+                        ('page down', 'circle', (160, -160, 30), 2, None)]
+# The style of the button that starts each difficulty, for resuming games
+difficultyStyles = {widget[4][4]: widget[4] for layout in
+                    ['difficulty regular', 'difficulty timed',
+                     'difficulty other']
+                    for widget in layouts[layout] if widget[0] == 'difficulty'}
+# Without AAAAAAA unlocked, the statistics screen has no sixth header
+# button (but the difficulty screen still has the hidden AAAAAAA button)
+layouts['statistics regular locked'] = [
+    widget for widget in layouts['statistics regular']
+    if widget[0] != 'header' or widget[4][3] != 6]
+
+# The hit-testing grid. Each cell is HIT_CELL_SIZE pixels wide and tall,
+# and stores the widgets whose clickable area overlaps it.
+HIT_CELL_SIZE = 20
+
 
 def in_circle(x, y, targetX, targetY, radius):
     '''in_circle(x, y, targetX, targetY, radius) -> bool
@@ -150,97 +314,90 @@ def in_rectangle(x, y, leftX, topY, rightX, bottomY):
     return leftX <= x <= rightX and bottomY <= y <= topY
 
 
-def calculate(first, operation, second):
-    '''calculate(first, operation, second) -> float OR int
-    Calculates first operation second, according to the following table:
-    0: +      1: -      2: *      3: /'''
-    return [first + second, first - second,
-            first * second, first / second][operation]
+def widget_bounds(widget):
+    '''widget_bounds(widget) -> (int, int, int, int)
+    Returns the clickable area of widget as (leftX, topY, rightX,
+    bottomY), including its margin.
+    '''
+    margin = widget[3]
+    if widget[1] == 'circle':
+        (x, y, radius) = widget[2]
+        return (x - radius - margin, y + radius + margin,
+                x + radius + margin, y - radius - margin)
+    else:
+        (leftX, topY, rightX, bottomY) = widget[2]
+        return (leftX - margin, topY + margin,
+                rightX + margin, bottomY - margin)
 
 
-def make_question(data):
-    '''make_question(data) -> (str, int, int, int, int, str, int)
-    Makes a Math Quizzer question based off of data. The tuple is in the
-    format (PROMPT, POSSIBLE ANSWERS, CORRECT LETTER, CORRECT NUMBER),
-    where POSSIBLE ANSWERS takes up four elements.
+def in_widget(x, y, widget):
+    '''in_widget(x, y, widget) -> bool
+    Returns a bool corresponding to whether (x, y) is inside the
+    clickable area of widget.
     '''
-    # Get the operation
-    data = [i.split(';') for i in data]
-    weights = [int(i[0]) for i in data]
-    pickedNumber = random.randrange(0, sum(weights))
-    pickedOperation = None
-    for operation in range(4):
-        if pickedNumber < sum(weights[0:operation + 1]):
-            pickedOperation = operation
-            break
-    pickedOperationStr = '+−×÷'[operation]
-
-    # Generate the numbers
-    pickedData = data[operation][1:]
-    firstNumberRange = pickedData[0].split('-')
-    firstNumber = random.randrange(int(firstNumberRange[0]),
-                                   int(firstNumberRange[1]) + 1)
-    secondNumberRange = pickedData[1].split('-')
-    secondNumber = random.randrange(int(secondNumberRange[0]),
-                                    int(secondNumberRange[1]) + 1)
-
-    # Edit the numbers according to the parameters
-    parameter = pickedData[2]
-    if parameter == '':
-        pass
-    elif parameter == 'r':
-        (firstNumber, secondNumber) = (secondNumber, firstNumber)
-    elif parameter == 'g1':
-        if secondNumber >= firstNumber:
-            secondNumber = random.randrange(int(secondNumberRange[0]),
-                                            firstNumber)
-    elif parameter == 'g2':
-        if firstNumber >= secondNumber:
-            firstNumber = random.randrange(int(firstNumberRange[0]),
-                                           secondNumber)
-    elif parameter == 'w1':
-        firstNumber = round(firstNumber / secondNumber) * secondNumber
+    if widget[1] == 'circle':
+        return in_circle(x, y, widget[2][0], widget[2][1],
+                         widget[2][2] + widget[3])
     else:
-        raise ValueError("I don't know the parameter " + parameter
-                         + ' yet, sorry.')
-
-    if difficulty == 6:
-        prompt = ('What is ' + str(firstNumber) + ' ' + pickedOperationStr
-                  + ' ' + str(secondNumber) + '?')
-        trueAnswer = calculate(firstNumber, pickedOperation, secondNumber)
-        potentialAnswers = [trueAnswer, None, None, None]
-        answerLetter = 'A'
-
-    else: # Generate the question and possible answers (and true answer)
-        prompt = ('What is ' + str(firstNumber) + ' ' + pickedOperationStr + ' '
-                  + str(secondNumber) + '?')
-        trueAnswer = calculate(firstNumber, pickedOperation, secondNumber)
-        wrongAnswers = ([trueAnswer + i for i in (-10, -5, -3, -2, -1,
-                                                  1, 2, 3, 5, 10)
-                         if abs(i) <= 1.5 * (trueAnswer + 0.5) ** (1 / 3) + 1]
-                        + [round(trueAnswer * random.uniform(0.75, 1.25))])
-        if operation == 0:
-            wrongAnswers.extend([abs(firstNumber - secondNumber)])
-        elif operation == 1:
-            wrongAnswers.extend([firstNumber + secondNumber])
-        elif operation == 2:
-            wrongAnswers.extend([trueAnswer - firstNumber,
-                                 trueAnswer + firstNumber,
-                                 trueAnswer - secondNumber,
-                                 trueAnswer + secondNumber])
-        elif operation == 3:
-            wrongAnswers.extend([int(i) for i in
-                                 [firstNumber / (secondNumber + 1),
-                                  firstNumber / (secondNumber - 1)]
-                                 if i % 1 == 0])
-        wrongAnswers = list(set([int(i) for i in wrongAnswers
-                                 if i != trueAnswer]))
-        random.shuffle(wrongAnswers)
-        potentialAnswers = wrongAnswers[:3] + [int(trueAnswer)]
-        random.shuffle(potentialAnswers)
-        answerLetter = 'ABCD'[potentialAnswers.index(trueAnswer)]
-    
-    return (prompt, *potentialAnswers, answerLetter, int(trueAnswer))
+        return in_rectangle(x, y, *widget_bounds(widget))
+
+
+def build_hit_index(widgets):
+    '''build_hit_index(widgets) -> dict
+    Returns a dict mapping each grid cell (column, row) to the widgets
+    whose clickable areas overlap it, in the same order as widgets.
+    '''
+    hitIndex = {}
+    for widget in widgets:
+        (leftX, topY, rightX, bottomY) = widget_bounds(widget)
+        for column in range(leftX // HIT_CELL_SIZE,
+                            rightX // HIT_CELL_SIZE + 1):
+            for row in range(bottomY // HIT_CELL_SIZE,
+                             topY // HIT_CELL_SIZE + 1):
+                hitIndex.setdefault((column, row), []).append(widget)
+    return hitIndex
+
+
+hitIndexes = {layout: build_hit_index(layouts[layout]) for layout in layouts}
+
+
+def hit_test(layout, x, y):
+    '''hit_test(layout, x, y) -> tuple OR None
+    Returns the first widget in layout that (x, y) is inside, or None if
+    there isn't one. Only the widgets in the grid cell containing (x, y)
+    are checked, so this doesn't slow down as layouts grow.
+    '''
+    if layout is None:
+        return None
+    for widget in hitIndexes[layout].get((int(x // HIT_CELL_SIZE),
+                                          int(y // HIT_CELL_SIZE)), ()):
+        if in_widget(x, y, widget):
+            return widget
+    return None
+
+
+def current_layout():
+    '''current_layout() -> str OR None
+    Returns the name of the widget layout on the screen right now, or
+    None if the screen has no widgets.
+    '''
+    if mode in ['menu', 'help', 'resume']:
+        return mode
+    elif mode == 'difficulty':
+        return ['difficulty regular', 'difficulty timed',
+                'difficulty other'][tabDifficulty]
+    elif mode == 'play 1':
+        return 'play typed' if difficulty == 6 else 'play'
+    elif mode == 'statistics':
+        if tabStatistics == 1:
+            return 'statistics timed'
+        elif tabStatistics == 2:
+            return 'statistics other'
+        elif AAAAAAAUnlocked:
+            return 'statistics regular'
+        else:
+            return 'statistics regular locked'
+    return None
 
 
 def red_green_gradient(num):
@@ -254,6 +411,28 @@ def red_green_gradient(num):
     else:
         return '#FF' + hex(int(510 * num) + 256)[-2:].upper() + '00'
 
+
+
+def draw_back_button():
+    '''Draws the back button in the bottom-left corner.'''
+    (x, y, radius) = BACK_BUTTON[2]
+    t.goto(x, y - radius)
+    t.pensize(4)
+    t.color('#AF8E00')
+    t.fillcolor('#FFCF00')
+    t.pendown()
+    t.begin_fill()
+    t.circle(radius)
+    t.end_fill()
+    t.penup()
+    t.pensize(5)
+    t.color('#805B00')
+    t.goto(x + 5, y + 17)
+    t.pendown()
+    t.goto(x - 12, y)
+    t.goto(x + 5, y - 17)
+    t.penup()
+
     
 def draw_menu():
     '''Draws the Math Quizzer main menu.'''
@@ -269,61 +448,89 @@ def draw_menu():
     t.goto(0, 55)
     t.write(VERSION, align = 'center', font = ('Arial', 16, 'normal'))
     
+    widgets = {widget[0]: widget for widget in layouts['menu']}
+
     # Play button
-    t.goto(-115, -100)
+    (x, y, radius) = widgets['play'][2]
+    t.goto(x, y - radius)
     t.pensize(4)
     t.color('#00BF00')
     t.fillcolor('#00EF00')
     t.pendown()
     t.begin_fill()
-    t.circle(50)
+    t.circle(radius)
     t.end_fill()
     t.penup()
-    t.goto(-90, -50)
+    t.goto(x + 25, y)
     t.color('#CF9F00')
     t.fillcolor('#EFCF00')
     t.pendown()
     t.begin_fill()
-    t.goto(-130, -20)
-    t.goto(-130, -80)
-    t.goto(-90, -50)
+    t.goto(x - 15, y + 30)
+    t.goto(x - 15, y - 30)
+    t.goto(x + 25, y)
     t.end_fill()
     t.penup()
 
     # Help button
-    t.goto(0, -100)
+    (x, y, radius) = widgets['help'][2]
+    t.goto(x, y - radius)
     t.pensize(4)
     t.color('#AFAFAF')
     t.fillcolor('#FFFFFF')
     t.pendown()
     t.begin_fill()
-    t.circle(50)
+    t.circle(radius)
     t.end_fill()
     t.penup()
     t.color('#606060')
-    t.goto(0, -97)
+    t.goto(x, y - 47)
     t.write('?', align = 'center', font = ('Arial', 60, 'bold'))
     t.penup()
     
     # Quit button
-    t.goto(115, -100)
+    (x, y, radius) = widgets['quit'][2]
+    t.goto(x, y - radius)
     t.color('#AF0000')
     t.fillcolor('#FF0000')
     t.pendown()
     t.begin_fill()
-    t.circle(50)
+    t.circle(radius)
     t.end_fill()
     t.penup()
     t.pensize(9)
     t.color('#8F0000')
-    t.goto(90, -25)
+    t.goto(x - 25, y + 25)
     t.pendown()
-    t.goto(140, -75)
+    t.goto(x + 25, y - 25)
     t.penup()
-    t.goto(140, -25)
+    t.goto(x + 25, y + 25)
     t.pendown()
-    t.goto(90, -75)
+    t.goto(x - 25, y - 25)
+    t.penup()
+
+    # Profile button
+    (leftX, topY, rightX, bottomY) = widgets['profile'][2]
+    t.goto(leftX, topY)
+    t.pensize(3)
+    t.color('#AFAFAF')
+    t.fillcolor('#FFFFFF')
+    t.pendown()
+    t.begin_fill()
+    t.goto(rightX, topY)
+    t.goto(rightX, bottomY)
+    t.goto(leftX, bottomY)
+    t.goto(leftX, topY)
+    t.end_fill()
     t.penup()
+    t.goto(0, topY - 22)
+    t.color('#000000')
+    t.write('Player: ' + (profileName or 'Shared'), align = 'center',
+            font = ('Arial', 14, 'normal'))
+    t.goto(0, bottomY + 3)
+    t.color('#606060')
+    t.write('Click to switch', align = 'center',
+            font = ('Arial', 9, 'normal'))
     
     t.hideturtle()
     window.update()
@@ -357,26 +564,63 @@ def draw_help():
         startingY -= 22
     
     # Back button
-    t.goto(-160, -190)
-    t.pensize(4)
-    t.color('#AF8E00')
-    t.fillcolor('#FFCF00')
-    t.pendown()
-    t.begin_fill()
-    t.circle(30)
-    t.end_fill()
-    t.penup()
-    t.pensize(5)
-    t.color('#805B00')
-    t.goto(-155, -143)
-    t.pendown()
-    t.goto(-172, -160)
-    t.goto(-155, -177)
-    t.penup()
+    draw_back_button()
     
     t.hideturtle()
     window.update()
 
+
+def draw_resume():
+    '''Draws the screen offering to resume a game that didn't end.'''
+    t.reset()
+    t.penup()
+
+    # Subtitle
+    t.goto(0, 140)
+    t.color(TEXT_COLOR)
+    t.write("Your last game didn't end.", align = 'center',
+            font = ('Arial', 24, 'italic'))
+
+    # The game
+    style = difficultyStyles[unfinishedGame['difficulty']]
+    if 7 <= style[4] <= 9:
+        lines = [' '.join([style[2].strip(), style[3].strip()]),
+                 str(max(math.ceil(style[5] - unfinishedGame['elapsed']), 0))
+                 + ' seconds left']
+    else:
+        lines = [style[3]]
+    lines += [str(unfinishedGame['points']) + ' point'
+              + 's' * (unfinishedGame['points'] != 1),
+              'Streak: ' + str(unfinishedGame['streak'])]
+    startingY = 90
+    for line in lines:
+        t.goto(0, startingY)
+        t.write(line, align = 'center', font = ('Arial', 16, 'normal'))
+        startingY -= 26
+
+    # Buttons
+    for button in layouts['resume']:
+        (leftX, topY, rightX, bottomY) = button[2]
+        t.goto(leftX, topY)
+        t.pensize(3)
+        t.color('#60548F')
+        t.fillcolor(button[4][0])
+        t.pendown()
+        t.begin_fill()
+        t.goto(rightX, topY)
+        t.goto(rightX, bottomY)
+        t.goto(leftX, bottomY)
+        t.goto(leftX, topY)
+        t.end_fill()
+        t.penup()
+        t.goto((leftX + rightX) / 2, bottomY + 13)
+        t.color(button[4][1])
+        t.write(button[4][2], align = 'center',
+                font = ('Arial', 14, 'normal'))
+
+    t.hideturtle()
+    window.update()
+
     
 def draw_difficulty():
     '''Draws the difficulty-selecting screen in Math Quizzer.'''
@@ -389,109 +633,89 @@ def draw_difficulty():
     t.write('Select your difficulty:', align = 'center',
             font = ('Arial', 24, 'italic'))
 
+    widgets = layouts[current_layout()]
+
     # Page button
-    t.goto(-65, 87)
+    (leftX, topY, rightX, bottomY) = widgets[0][2]
+    t.goto(leftX, bottomY)
     t.pensize(4)
     t.color('#0040BF')
     t.fillcolor('#0055FF')
     t.pendown()
     t.begin_fill()
-    t.goto(65, 87)
-    t.goto(65, 123)
-    t.goto(-65, 123)
-    t.goto(-65, 87)
+    t.goto(rightX, bottomY)
+    t.goto(rightX, topY)
+    t.goto(leftX, topY)
+    t.goto(leftX, bottomY)
     t.end_fill()
     t.penup()
     t.color('#FFFFFF')
-    if tabDifficulty == 0:
-        t.goto(1, 91)
-        t.write('Regular', align = 'center', font = ('Arial', 18, 'normal'))
-    else:
-        t.goto(1, 91)
-        t.write('Timed', align = 'center', font = ('Arial', 18, 'normal'))
+    t.goto((leftX + rightX) // 2 + 1, bottomY + 4)
+    t.write(widgets[0][4], align = 'center', font = ('Arial', 18, 'normal'))
 
     # Buttons
-    buttons = [[(-80, 40, '#009FFF', '#000000', '1', 'Easy'),
-                (80, 40, '#00BF00', '#000000', '2', 'Normal'),
-                (-80, -20, '#FFCF00', '#000000', '3', 'Hard'),
-                (80, -20, '#FF3000', '#FFFFFF', '4', 'Harder'),
-                (-80, -80, '#FF00FF', '#000000', '5', 'Insane'),
-                (80, -80, '#8020BF', '#FFFFFF', '6', 'AAAAAAA')]
-               [:5 + int(AAAAAAAUnlocked)],
-               [(-80, 40, '#EF8F10', '#000000', ' 30', '  seconds'),
-                (80, 40, '#90DF00', '#000000', '1', 'minute'),
-                (-80, -20, '#00AF8F', '#000000', '2', 'minutes')]]
-    for button in buttons[tabDifficulty]:
-        t.goto(button[0] - 73, button[1] + 23)
+    buttons = [widget for widget in widgets if widget[0] == 'difficulty']
+    if tabDifficulty == 0:
+        buttons = buttons[:5 + int(AAAAAAAUnlocked)]
+    for button in buttons:
+        (leftX, topY, rightX, bottomY) = button[2]
+        style = button[4]
+        t.goto(leftX, topY)
         t.pensize(5)
         t.color('#60548F')
-        t.fillcolor(button[2])
+        t.fillcolor(style[0])
         t.pendown()
         t.begin_fill()
-        t.goto(button[0] + 73, button[1] + 23)
-        t.goto(button[0] + 73, button[1] - 23)
-        t.goto(button[0] - 73, button[1] - 23)
-        t.goto(button[0] - 73, button[1] + 23)
+        t.goto(rightX, topY)
+        t.goto(rightX, bottomY)
+        t.goto(leftX, bottomY)
+        t.goto(leftX, topY)
         t.end_fill()
         t.penup()
-        t.color(button[3])
+        t.color(style[1])
         if tabDifficulty == 0:
-            t.goto(button[0] - 52, button[1] - 24)
-            t.write(button[4], align = 'center',
+            t.goto(leftX + 21, bottomY - 1)
+            t.write(style[2], align = 'center',
                     font = ('Arial', 30, 'italic'))
-            t.goto(button[0] - 30, button[1] - 14)
-            t.write(button[5], align = 'left', font = ('Arial', 18, 'normal'))
+            t.goto(leftX + 43, bottomY + 9)
+            t.write(style[3], align = 'left', font = ('Arial', 18, 'normal'))
         else:
-            t.goto(button[0] - 52, button[1] - 19)
-            t.write(button[4], align = 'center',
+            t.goto(leftX + 21, bottomY + 4)
+            t.write(style[2], align = 'center',
                     font = ('Arial', 24, 'normal'))
-            t.goto(button[0] - 36, button[1] - 14)
-            t.write(button[5], align = 'left', font = ('Arial', 18, 'normal'))
-        t.goto(button[0] + 73, button[1] + 23)
+            t.goto(leftX + 37, bottomY + 9)
+            t.write(style[3], align = 'left', font = ('Arial', 18, 'normal'))
+        t.goto(rightX, topY)
         t.color('#60548F')
         t.pendown()
-        t.goto(button[0] + 73, button[1] - 23)
+        t.goto(rightX, bottomY)
         t.penup()
 
     # Back button
-    t.goto(-160, -190)
-    t.pensize(4)
-    t.color('#AF8E00')
-    t.fillcolor('#FFCF00')
-    t.pendown()
-    t.begin_fill()
-    t.circle(30)
-    t.end_fill()
-    t.penup()
-    t.pensize(5)
-    t.color('#805B00')
-    t.goto(-155, -143)
-    t.pendown()
-    t.goto(-172, -160)
-    t.goto(-155, -177)
-    t.penup()
+    draw_back_button()
 
     # Statistics button
-    t.goto(160, -190)
+    (x, y, radius) = widgets[-1][2]
+    t.goto(x, y - radius)
     t.pensize(4)
     t.color('#00BF00')
     t.fillcolor('#00EF00')
     t.pendown()
     t.begin_fill()
-    t.circle(30)
+    t.circle(radius)
     t.end_fill()
     t.penup()
     t.pensize(3)
     t.color('#CF9F00')
     t.fillcolor('#EFCF00')
-    for bar in [(141, 16), (155, 25), (169, 34)]:
-        t.goto(bar[0], -177)
+    for bar in [(-19, 16), (-5, 25), (9, 34)]:
+        t.goto(x + bar[0], y - 17)
         t.pendown()
         t.begin_fill()
-        t.goto(bar[0] + 10, -177)
-        t.goto(bar[0] + 10, bar[1] - 177)
-        t.goto(bar[0], bar[1] - 177)
-        t.goto(bar[0], -177)
+        t.goto(x + bar[0] + 10, y - 17)
+        t.goto(x + bar[0] + 10, y + bar[1] - 17)
+        t.goto(x + bar[0], y + bar[1] - 17)
+        t.goto(x + bar[0], y - 17)
         t.end_fill()
         t.penup()
     
@@ -499,14 +723,34 @@ def draw_difficulty():
     window.update()
 
 
+def draw_score_summary(y):
+    '''Draws the median and 90th percentile of the difficulty that was
+    just played, and how many earlier attempts the final score beat,
+    starting at height y.
+    '''
+    (median, percentile90, beaten) = scoreSummary
+    t.color(TEXT_COLOR)
+    t.goto(0, y)
+    if median is None:
+        t.write('This was your first attempt!', align = 'center',
+                font = ('Arial', 14, 'normal'))
+    else:
+        t.write('Median: ' + str(median) + '    90th percentile: '
+                + str(percentile90), align = 'center',
+                font = ('Arial', 14, 'normal'))
+        t.goto(0, y - 27)
+        t.write('You beat ' + str(round(beaten * 100)) + '% of your attempts.',
+                align = 'center', font = ('Arial', 14, 'normal'))
+
+
 def draw_play():
     '''Draws the play screen in Math Quizzer.'''
     if not timedDifficulty:
-        timeOnQuestion = time.time() - questionMakeTime
+        timeOnQuestion = time.perf_counter() - questionMakeTime
         if questionMakeTime == 0:
             timeOnQuestion = 0
     else:
-        timeOnQuestion = time.time() - timeStarted
+        timeOnQuestion = time.perf_counter() - timeStarted
         if timeStarted == 0:
             timeOnQuestion = 0
     timeLeftFloat = totalTime - timeOnQuestion
@@ -525,7 +769,7 @@ def draw_play():
             t.write(str(points) + ' points', align = 'right',
                     font = ('Arial', 16, 'normal'))
         
-        timeSinceAnswered = time.time() - answerTime
+        timeSinceAnswered = time.perf_counter() - answerTime
         if timeSinceAnswered < 0.5:
             t.goto(123 - 6 * (len(str(points)) - 1)
                    + 11 * int(points == 1), 70 * timeSinceAnswered - 170)
@@ -541,12 +785,21 @@ def draw_play():
         t.color(TEXT_COLOR)
         t.write('Streak: ' + str(streak), align = 'left',
                 font = ('Arial', 16, 'normal'))
+
+    # Level (adaptive mode)
+    if difficulty == 11 and questionCorrect >= 0:
+        t.goto(190, -150)
+        t.color(TEXT_COLOR)
+        t.write('Level ' + adaptive.level_name(adaptiveSkill),
+                align = 'right', font = ('Arial', 12, 'normal'))
     
     if question != None and questionCorrect == 0:
         # Prompt
         t.goto(0, 140)
         t.color(TEXT_COLOR)
-        t.write(question[0], align = 'center', font = ('Arial', 24, 'normal'))
+        t.write(question[0], align = 'center',
+                font = ('Arial', 24 if len(question[0]) <= 25 else 18,
+                        'normal'))
 
         # Time left
         t.goto(-188, -179)
@@ -585,37 +838,26 @@ def draw_play():
                 align = 'left', font = ('Arial', 16, 'normal'))
 
         if difficulty == 6: # Type the answer
-            for button in [(-193, -158, -30, '1'),
-                           (-154, -119, -30, '2'),
-                           (-115, -80, -30, '3'),
-                           (-76, -41, -30, '4'),
-                           (-37, -2, -30, '5'),
-                           (2, 37, -30, '6'),
-                           (41, 76, -30, '7'),
-                           (80, 115, -30, '8'),
-                           (119, 154, -30, '9'),
-                           (158, 193, -30, '0'),
-                           (-193, -41, -80, 'Delete'),
-                           (-37, 115, -80, 'Clear'),
-                           (119, 193, -80, 'Go')]:
-                t.goto(button[0], button[2] + 23)
+            for button in layouts['play typed']:
+                (leftX, topY, rightX, bottomY) = button[2]
+                t.goto(leftX, topY)
                 t.pensize(3)
                 t.color('#60548F')
-                if button[3] != 'Go':
+                if button[4][0] != 'Go':
                     t.fillcolor('#CFCFCF')
                 else:
                     t.fillcolor('#00FF00')
                 t.pendown()
                 t.begin_fill()
-                t.goto(button[1], button[2] + 23)
-                t.goto(button[1], button[2] - 23)
-                t.goto(button[0], button[2] - 23)
-                t.goto(button[0], button[2] + 23)
+                t.goto(rightX, topY)
+                t.goto(rightX, bottomY)
+                t.goto(leftX, bottomY)
+                t.goto(leftX, topY)
                 t.end_fill()
                 t.penup()
-                t.goto((button[0] + button[1]) / 2, button[2] - 19)
+                t.goto((leftX + rightX) / 2, bottomY + 4)
                 t.color('#000000')
-                t.write(button[3], align = 'center',
+                t.write(button[4][0], align = 'center',
                         font = ('Arial', 24, 'normal'))
             t.goto(-193, 43)
             t.pensize(3)
@@ -638,28 +880,27 @@ def draw_play():
             t.write(typingMessage, align = 'center',
                     font = ('Arial', 13, 'bold'))
         else: # Buttons
-            for button in [(-80, 20, '#FF0040', '#FFFFFF', 'A)', question[1]),
-                           (80, 20, '#FFCF00', '#000000', 'B)', question[2]),
-                           (-80, -40, '#00DF00', '#000000', 'C)', question[3]),
-                           (80, -40, '#009FFF', '#000000', 'D)', question[4])]:
-                t.goto(button[0] - 73, button[1] + 23)
+            for button in layouts['play']:
+                (leftX, topY, rightX, bottomY) = button[2]
+                style = button[4]
+                t.goto(leftX, topY)
                 t.pensize(5)
                 t.color('#60548F')
-                t.fillcolor(button[2])
+                t.fillcolor(style[0])
                 t.pendown()
                 t.begin_fill()
-                t.goto(button[0] + 73, button[1] + 23)
-                t.goto(button[0] + 73, button[1] - 23)
-                t.goto(button[0] - 73, button[1] - 23)
-                t.goto(button[0] - 73, button[1] + 23)
+                t.goto(rightX, topY)
+                t.goto(rightX, bottomY)
+                t.goto(leftX, bottomY)
+                t.goto(leftX, topY)
                 t.end_fill()
                 t.penup()
-                t.goto(button[0] - 45, button[1] - 22)
-                t.color(button[3])
-                t.write(button[4], align = 'center',
+                t.goto(leftX + 28, bottomY + 1)
+                t.color(style[1])
+                t.write(style[2] + ')', align = 'center',
                         font = ('Arial', 28, 'italic'))
-                t.goto(button[0] - 21, button[1] - 14)
-                t.write(button[5], align = 'left',
+                t.goto(leftX + 52, bottomY + 9)
+                t.write(question['ABCD'.index(style[2]) + 1], align = 'left',
                         font = ('Arial', 18, 'normal'))
     else:
         if questionCorrect == 1:
@@ -684,8 +925,9 @@ def draw_play():
             t.goto(0, -55)
             t.write('You finished with ' + str(points) + ' points.',
                     align = 'center', font = ('Arial', 18, 'normal'))
+            draw_score_summary(-82)
             t.color(TEXT_COLOR)
-            t.goto(0, -82)
+            t.goto(0, -136)
             t.write('(Click to return to the main menu.)', align = 'center',
                     font = ('Arial', 14, 'normal'))
         elif questionCorrect == -2 and not timedDifficulty:
@@ -701,8 +943,9 @@ def draw_play():
             t.goto(0, -55)
             t.write('You finished with ' + str(points) + ' points.',
                     align = 'center', font = ('Arial', 18, 'normal'))
+            draw_score_summary(-82)
             t.color(TEXT_COLOR)
-            t.goto(0, -82)
+            t.goto(0, -136)
             t.write('(Click to return to the main menu.)', align = 'center',
                     font = ('Arial', 14, 'normal'))
         elif questionCorrect == -2 and timedDifficulty:
@@ -714,8 +957,9 @@ def draw_play():
             t.goto(0, -28)
             t.write('You finished with ' + str(points) + ' points.',
                     align = 'center', font = ('Arial', 18, 'normal'))
+            draw_score_summary(-55)
             t.color(TEXT_COLOR)
-            t.goto(0, -55)
+            t.goto(0, -109)
             t.write('(Click to return to the main menu.)', align = 'center',
                     font = ('Arial', 14, 'normal'))
     
@@ -723,97 +967,257 @@ def draw_play():
     window.update()
 
 
+def format_time_ago(timeAgo):
+    '''format_time_ago(timeAgo) -> str
+    Returns how long ago something happened, where timeAgo is in
+    seconds, like "5m 12s ago" or "3d ago".
+    '''
+    if timeAgo < 60:
+        return str(timeAgo) + 's ago'
+    elif timeAgo < 3600:
+        if timeAgo % 60 == 0:
+            return str(timeAgo // 60) + 'm ago'
+        else:
+            return (str(timeAgo // 60) + 'm ' + str(timeAgo % 60)
+                    + 's ago')
+    elif timeAgo < 86400:
+        if timeAgo % 3600 < 60:
+            return str(timeAgo // 3600) + 'h ago'
+        else:
+            return (str(timeAgo // 3600) + 'h '
+                    + str((timeAgo // 60) % 60) + 'm ago')
+    elif timeAgo < 8640000: # 100 days
+        if timeAgo % 86400 < 3600:
+            return str(timeAgo // 86400) + 'd ago'
+        else:
+            return (str(timeAgo // 86400) + 'd '
+                    + str((timeAgo // 3600) % 24) + 'h ago')
+    else:
+        return str(timeAgo // 86400) + 'd ago'
+
+
+def time_ago_granularity(timeAgo):
+    '''time_ago_granularity(timeAgo) -> int
+    Returns the number of seconds between changes of
+    format_time_ago(timeAgo).
+    '''
+    if timeAgo < 3600:
+        return 1
+    elif timeAgo < 86400:
+        return 60
+    elif timeAgo < 8640000: # 100 days
+        return 3600
+    else:
+        return 86400
+
+
+def make_statistics_view():
+    '''make_statistics_view() -> (int, int OR float OR str,
+                                  int OR str, list, tuple OR None)
+    Scans the scores for difficultyStatistics and returns the number of
+    attempts, the average and max points, the (timeFinished, points) of
+    each attempt on pageStatistics, sorted according to sortBy, and the
+    trend chart from make_trend() if viewStatistics is 1.
+    '''
+    global allAttempts
+    allAttempts = [score for score
+                   in profiles.load_scores(loadedProfiles[profileName])
+                   if score[1] == difficultyStatistics]
+    pointTotals = [score[2] for score in allAttempts]
+    numAttempts = len(allAttempts)
+    if numAttempts == 0:
+        averagePoints = 'N/A'
+        maxPoints = 'N/A'
+    else:
+        averagePoints = sum(pointTotals) / numAttempts
+        if averagePoints % 1 == 0:
+            averagePoints = int(averagePoints)
+        elif averagePoints < 9.9995:
+            averagePoints = round(averagePoints, 3)
+        elif averagePoints < 99.995:
+            averagePoints = round(averagePoints, 2)
+        else:
+            averagePoints = round(averagePoints, 1)
+        maxPoints = max(pointTotals)
+    if sortBy == 0: # Newest
+        sortKey = lambda n: n[0]
+    else: # High Scores
+        sortKey = lambda n: n[2]
+    allAttempts = sorted(allAttempts, key = sortKey, reverse = True)
+    if viewStatistics == 0:
+        pageAttempts = [(score[0], score[2]) for score in
+                        allAttempts[8*pageStatistics : 8*pageStatistics + 8]]
+        trend = None
+    else:
+        pageAttempts = []
+        trend = make_trend()
+    return (numAttempts, averagePoints, maxPoints, pageAttempts, trend)
+
+
+def make_trend():
+    '''make_trend() -> (str, list)
+    Returns the period name and (number, attempts, average, best) of
+    the last 16 weeks that difficultyStatistics was played, or of the
+    last 16 days if it was played in fewer than 2 different weeks. Only
+    the rollups are read, never the scores.
+    '''
+    series = rollups.rollup_series(scoreRollups, 'w', difficultyStatistics)
+    if len(series) >= 2:
+        return ('Weekly', [(rollups.first_day_of_week(bucket[0]),)
+                           + bucket[1:] for bucket in series[-16:]])
+    series = rollups.rollup_series(scoreRollups, 'd', difficultyStatistics)
+    return ('Daily', series[-16:])
+
+
+def draw_trend_chart(trend):
+    '''Draws the trend chart on the right side of the statistics
+    screen. Each line is drawn as a single polyline on the canvas.
+    '''
+    (periodName, series) = trend
+    (leftX, topY, rightX, bottomY) = (5, 85, 185, -115)
+    t.goto(95, 105)
+    t.color(TEXT_COLOR)
+    t.write(periodName + ' trend', align = 'center',
+            font = ('Arial', 18, 'bold'))
+    t.goto(leftX, topY)
+    t.pensize(2)
+    t.pendown()
+    t.goto(leftX, bottomY)
+    t.goto(rightX, bottomY)
+    t.penup()
+    topPoints = max(bucket[3] for bucket in series) or 1
+    t.goto(leftX - 3, topY - 10)
+    t.write(str(topPoints), align = 'right', font = ('Arial', 10, 'normal'))
+    t.goto(leftX - 3, bottomY - 4)
+    t.write('0', align = 'right', font = ('Arial', 10, 'normal'))
+    t.goto(leftX, bottomY - 18)
+    t.write(rollups.day_label(series[0][0]), align = 'left',
+            font = ('Arial', 10, 'normal'))
+    t.goto(rightX, bottomY - 18)
+    t.write(rollups.day_label(series[-1][0]), align = 'right',
+            font = ('Arial', 10, 'normal'))
+    for (column, color, label) in [(3, '#00FF00', 'Best'),
+                                   (2, '#FFFF00', 'Average')]:
+        coordinates = [(leftX + (rightX - leftX) * i
+                        / max(len(series) - 1, 1),
+                        bottomY + (topY - bottomY) * bucket[column]
+                        / topPoints)
+                       for (i, bucket) in enumerate(series)]
+        if len(coordinates) == 1:
+            t.goto(coordinates[0])
+            t.dot(8, color)
+        else:
+            # The canvas has its y-axis flipped compared to the turtle's
+            canvas.create_line(*[coordinate for (x, y) in coordinates
+                                 for coordinate in (x, -y)],
+                               fill = color, width = 3, tags = 'trend')
+        t.goto(rightX - 70 * (column - 2), topY + 2)
+        t.color(color)
+        t.write(label, align = 'right', font = ('Arial', 10, 'normal'))
+
+
+def draw_time_labels():
+    '''Draws the "Time Done" column of the statistics screen, and sets
+    statisticsRefreshTime to when the first of its labels will change.
+    '''
+    global statisticsRefreshTime
+    timeLabels.clear()
+    timeLabels.color(TEXT_COLOR)
+    currentTime = time.time()
+    statisticsRefreshTime = math.inf
+    tableAttemptsY = 75
+    for attempt in statisticsView[4]:
+        timeAgo = int(currentTime - attempt[0])
+        granularity = time_ago_granularity(timeAgo)
+        statisticsRefreshTime = min(statisticsRefreshTime,
+                                    attempt[0] + (timeAgo // granularity + 1)
+                                    * granularity)
+        timeLabels.goto(15, tableAttemptsY)
+        timeLabels.write(format_time_ago(timeAgo), align = 'center',
+                         font = ('Arial', 18, 'normal'))
+        tableAttemptsY -= 28
+
+
 def draw_statistics():
-    '''Draws the statistics screen.'''    
+    '''Draws the statistics screen. Nothing is redrawn unless the
+    difficulty, tab, sorting, page or scores have changed, or one of the
+    "Time Done" labels is out of date.
+    '''
+    global statisticsView, statisticsDrawn
+    viewKey = (difficultyStatistics, tabStatistics, sortBy, pageStatistics,
+               viewStatistics, highscoresVersion)
+    if statisticsDrawn == viewKey:
+        if time.time() >= statisticsRefreshTime:
+            draw_time_labels()
+        else:
+            time.sleep(0.01) # Nothing changed, so let the CPU rest
+        window.update()
+        return None
+    if statisticsView is None or statisticsView[0] != viewKey:
+        statisticsView = (viewKey, *make_statistics_view())
+    statisticsDrawn = viewKey
+
     t.reset()
     t.penup()
+    canvas.delete('trend')
+
+    widgets = layouts[current_layout()]
 
     # 'Stats for:' header
-    t.goto(-180, 150)
+    (leftX, topY, rightX, bottomY) = widgets[0][2]
+    t.goto(leftX, bottomY)
     t.pensize(4)
     t.color('#0040BF')
     t.fillcolor('#0055FF')
     t.pendown()
     t.begin_fill()
-    t.goto(-70, 150)
-    t.goto(-70, 185)
-    t.goto(-180, 185)
-    t.goto(-180, 150)
+    t.goto(rightX, bottomY)
+    t.goto(rightX, topY)
+    t.goto(leftX, topY)
+    t.goto(leftX, bottomY)
     t.end_fill()
     t.penup()
     t.color('#FFFFFF')
-    t.goto(-124, 153)
-    if tabStatistics == 0:
-        t.write('Regular', align = 'center', font = ('Arial', 18, 'normal'))
-    else:
-        t.write('Timed', align = 'center', font = ('Arial', 18, 'normal'))
+    t.goto((leftX + rightX) // 2 + 1, bottomY + 3)
+    t.write(widgets[0][4], align = 'center', font = ('Arial', 18, 'normal'))
         
-    headerButtons = [[(-35, '1', '#009FFF', '#000000', 1),
-                      (5, '2', '#00BF00', '#000000', 2),
-                      (45, '3', '#FFCF00', '#000000', 3),
-                      (85, '4', '#FF3000', '#FFFFFF', 4),
-                      (125, '5', '#FF00FF', '#000000', 5),
-                      (165, '6', '#8020BF', '#FFFFFF', 6)]
-                     if AAAAAAAUnlocked else
-                     [(-35, '1', '#009FFF', '#000000', 1),
-                      (5, '2', '#00BF00', '#000000', 2),
-                      (45, '3', '#FFCF00', '#000000', 3),
-                      (85, '4', '#FF3000', '#FFFFFF', 4),
-                      (125, '5', '#FF00FF', '#000000', 5)],
-                     [(-35, '30s', '#EF8F10', '#000000', 7),
-                      (5, '1m', '#90DF00', '#000000', 8),
-                      (45, '2m', '#00AF8F', '#000000', 9)]]
     t.pensize(3)
-    for headerButton in headerButtons[tabStatistics]:
+    for headerButton in [widget for widget in widgets
+                         if widget[0] == 'header']:
+        (x, y, radius) = headerButton[2]
+        style = headerButton[4]
         t.color('#60548F')
-        if difficultyStatistics == headerButton[4]:
-            t.fillcolor(headerButton[2])
+        if difficultyStatistics == style[3]:
+            t.fillcolor(style[1])
         else:
             t.fillcolor('#FFFFFF')
-        t.goto(headerButton[0], 151)
+        t.goto(x, y - radius)
         t.pendown()
         t.begin_fill()
-        t.circle(18)
+        t.circle(radius)
         t.end_fill()
         t.penup()
-        if difficultyStatistics == headerButton[4]:
-            t.color(headerButton[3])
+        if difficultyStatistics == style[3]:
+            t.color(style[2])
         else:
             t.color('#000000')
-        if len(headerButton[1]) == 1:
-            t.goto(headerButton[0] + 1, 155)
-            t.write(headerButton[1], align = 'center',
+        if len(style[0]) == 1:
+            t.goto(x + 1, y - 14)
+            t.write(style[0], align = 'center',
                     font = ('Arial', 19, 'normal'))
-        elif len(headerButton[1]) == 2:
-            t.goto(headerButton[0] + 1, 158)
-            t.write(headerButton[1], align = 'center',
+        elif len(style[0]) == 2:
+            t.goto(x + 1, y - 11)
+            t.write(style[0], align = 'center',
                     font = ('Arial', 15, 'normal'))
         else:
             for pos in [(0.5, 0.5), (0.5, 1), (1, 0.5), (1, 1)]:
-                t.goto(headerButton[0] + pos[0], 159 + pos[1])
-                t.write(headerButton[1], align = 'center',
+                t.goto(x + pos[0], y - 10 + pos[1])
+                t.write(style[0], align = 'center',
                         font = ('Arial', 13, 'normal'))
 
     # Quick statistics (left side)
-    allAttempts = [i for i in highscoresList[1:] if i != ''
-                   and int(i.split(' ')[1]) == difficultyStatistics]
-    pointTotals = [int(i.split(' ')[2]) for i in allAttempts]
-    numAttempts = len(allAttempts)
-    if numAttempts == 0:
-        averagePoints = 'N/A'
-        maxPoints = 'N/A'
-    else:
-        averagePoints = sum(pointTotals) / numAttempts
-        if averagePoints % 1 == 0:
-            averagePoints = int(averagePoints)
-        elif averagePoints < 9.9995:
-            averagePoints = round(averagePoints, 3)
-        elif averagePoints < 99.995:
-            averagePoints = round(averagePoints, 2)
-        else:
-            averagePoints = round(averagePoints, 1)
-        maxPoints = max(pointTotals)
-
+    (viewKey, numAttempts, averagePoints, maxPoints, pageAttempts,
+     trend) = statisticsView
     t.color(TEXT_COLOR)
     overallStatsY = 105
     for line in [('Attempts:', str(numAttempts)),
@@ -826,140 +1230,100 @@ def draw_statistics():
         overallStatsY -= 75
     
     # Table of attempts (right side)
-    if len(allAttempts) == 0:
+    if numAttempts == 0:
         t.goto(57, 40)
         t.write("You haven't attempted", align = 'center',
                 font = ('Arial', 14, 'italic'))
         t.goto(57, 18)
         t.write('this difficulty yet.', align = 'center',
                 font = ('Arial', 14, 'italic'))
+    elif trend is not None:
+        draw_trend_chart(trend)
     else:
         t.goto(15, 105)
         t.write('Time Done', align = 'center', font = ('Arial', 18, 'bold'))
         t.goto(130, 105)
         t.write('Points', align = 'center', font = ('Arial', 18, 'bold'))
         tableAttemptsY = 75
-        if sortBy == 0: # Newest
-            sortKey = lambda n: int(n.split(' ')[0])
-        else: # High Scores
-            sortKey = lambda n: int(n.split(' ')[2])
-        sortedAttempts = sorted(allAttempts, key = sortKey, reverse = True)
-        
-        for attempt in sortedAttempts[8*pageStatistics : 8*pageStatistics + 8]:
-            t.goto(15, tableAttemptsY)
-            timeAgo = int(time.time() - int(attempt.split(' ')[0]))
-            if timeAgo < 60:
-                timeStr = str(timeAgo) + 's ago'
-            elif timeAgo < 3600:
-                if timeAgo % 60 == 0:
-                    timeStr = str(timeAgo // 60) + 'm ago'
-                else:
-                    timeStr = (str(timeAgo // 60) + 'm ' + str(timeAgo % 60)
-                               + 's ago')
-            elif timeAgo < 86400:
-                if timeAgo % 3600 < 60:
-                    timeStr = str(timeAgo // 3600) + 'h ago'
-                else:
-                    timeStr = (str(timeAgo // 3600) + 'h '
-                               + str((timeAgo // 60) % 60) + 'm ago')
-            elif timeAgo < 8640000: # 100 days
-                if timeAgo % 86400 < 3600:
-                    timeStr = str(timeAgo // 86400) + 'd ago'
-                else:
-                    timeStr = (str(timeAgo // 86400) + 'd '
-                               + str((timeAgo // 3600) % 24) + 'h ago')
-            else:
-                timeStr = str(timeAgo // 86400) + 'd ago'
-            t.write(timeStr, align = 'center', font = ('Arial', 18, 'normal'))
+        for attempt in pageAttempts:
             t.goto(130, tableAttemptsY)
-            t.write(attempt.split(' ')[2], align = 'center',
+            t.write(str(attempt[1]), align = 'center',
                     font = ('Arial', 18, 'normal'))
             tableAttemptsY -= 28
+    draw_time_labels()
     
     # Back button
-    t.goto(-160, -190)
+    draw_back_button()
+
+    widgets = {widget[0]: widget for widget in widgets}
+
+    # Table/trend button
+    (leftX, topY, rightX, bottomY) = widgets['view'][2]
+    t.goto(leftX, bottomY)
     t.pensize(4)
-    t.color('#AF8E00')
-    t.fillcolor('#FFCF00')
+    t.color('#0040BF')
+    t.fillcolor('#0055FF')
     t.pendown()
     t.begin_fill()
-    t.circle(30)
+    t.goto(rightX, bottomY)
+    t.goto(rightX, topY)
+    t.goto(leftX, topY)
+    t.goto(leftX, bottomY)
     t.end_fill()
     t.penup()
-    t.pensize(5)
-    t.color('#805B00')
-    t.goto(-155, -143)
-    t.pendown()
-    t.goto(-172, -160)
-    t.goto(-155, -177)
-    t.penup()
+    t.color('#FFFFFF')
+    t.goto((leftX + rightX) // 2 + 1, bottomY + 4)
+    t.write(['Show trend', 'Show table'][viewStatistics], align = 'center',
+            font = ('Arial', 14, 'normal'))
 
     # Sort button
-    t.goto(-70, -190)
+    (leftX, topY, rightX, bottomY) = widgets['sort'][2]
+    t.goto(leftX, bottomY)
     t.pensize(4)
     t.color('#0040BF')
     t.fillcolor('#0055FF')
     t.pendown()
     t.begin_fill()
-    t.goto(30, -190)
-    t.goto(30, -160)
-    t.goto(-70, -160)
-    t.goto(-70, -190)
+    t.goto(rightX, bottomY)
+    t.goto(rightX, topY)
+    t.goto(leftX, topY)
+    t.goto(leftX, bottomY)
     t.end_fill()
     t.penup()
     t.color('#FFFFFF')
     if sortBy == 0:
-        t.goto(-19, -187)
+        t.goto((leftX + rightX) // 2 + 1, bottomY + 3)
         t.write('Newest', align = 'center', font = ('Arial', 16, 'normal'))
     else:
-        t.goto(-19, -184)
+        t.goto((leftX + rightX) // 2 + 1, bottomY + 6)
         t.write('High Scores', align = 'center',
                 font = ('Arial', 12, 'normal'))
-    t.goto(-19, -157)
+    t.goto((leftX + rightX) // 2 + 1, topY + 3)
     t.write('Sort by:', align = 'center', font = ('Arial', 16, 'normal'))
 
     # Page up/down buttons
-    t.goto(90, -190)
-    t.pensize(4)
-    t.color('#0040BF')
-    t.fillcolor('#0055FF')
-    t.pendown()
-    t.begin_fill()
-    t.circle(30)
-    t.end_fill()
-    t.penup()
-    t.pensize(5)
-    t.color('#FFFFFF')
-    t.fillcolor('#FFFFFF')
-    t.goto(103, -168)
-    t.pendown()
-    t.begin_fill()
-    t.goto(90, -148)
-    t.goto(77, -168)
-    t.goto(103, -168)
-    t.end_fill()
-    t.penup()
-    
-    t.goto(160, -190)
-    t.pensize(4)
-    t.color('#0040BF')
-    t.fillcolor('#0055FF')
-    t.pendown()
-    t.begin_fill()
-    t.circle(30)
-    t.end_fill()
-    t.penup()
-    t.pensize(5)
-    t.color('#FFFFFF')
-    t.fillcolor('#FFFFFF')
-    t.goto(173, -152)
-    t.pendown()
-    t.begin_fill()
-    t.goto(160, -172)
-    t.goto(147, -152)
-    t.goto(173, -152)
-    t.end_fill()
-    t.penup()
+    for (name, direction) in [('page up', 1), ('page down', -1)]:
+        (x, y, radius) = widgets[name][2]
+        t.goto(x, y - radius)
+        t.pensize(4)
+        t.color('#0040BF')
+        t.fillcolor('#0055FF')
+        t.pendown()
+        t.begin_fill()
+        t.circle(radius)
+        t.end_fill()
+        t.penup()
+        t.pensize(5)
+        t.color('#FFFFFF')
+        t.fillcolor('#FFFFFF')
+        t.goto(x + 13, y - 8 * direction)
+        t.pendown()
+        t.begin_fill()
+        t.goto(x, y + 12 * direction)
+        t.goto(x - 13, y - 8 * direction)
+        t.goto(x + 13, y - 8 * direction)
+        t.end_fill()
+        t.penup()
     
     t.hideturtle()
     window.update()
@@ -983,41 +1347,103 @@ def draw_error(message = 'Unknown error occurred.'):
     window.update()
 
 
+def record_practice(correct, responseTime):
+    '''Updates the current question's fact in the practice deck, if
+    practice mode is being played.
+    '''
+    if difficulty == 10:
+        practice.answer_fact(practiceDeck,
+                             (question[8], question[7], question[9]),
+                             correct, responseTime, time.time())
+
+
+def record_adaptive(correct, timeOnQuestion):
+    '''Updates the player's skill, if adaptive mode is being played.'''
+    if difficulty == 11:
+        adaptive.update_skill(adaptiveSkill, correct, timeOnQuestion,
+                              totalTime)
+
+
+def record_telemetry(result, responseTime):
+    '''Adds the current question to the telemetry log, if telemetry is
+    turned on. result is 1 if it was answered correctly, 0 if it was
+    answered incorrectly, or -1 if time ran out.
+    '''
+    if telemetryLog is not None:
+        telemetry.record_answer(telemetryLog, time.time(), difficulty,
+                                question[8], question[7], question[9],
+                                result, responseTime)
+
+
+def record_game_answer(currentTime, timeOnQuestion, outOfTime = False):
+    '''Adds the answer to the current question, given at currentTime
+    (from time.perf_counter()), to the recording of the game, if it's
+    being recorded.
+    '''
+    if gameRecording is None:
+        return None
+    if outOfTime:
+        answer = None
+    elif difficulty == 6:
+        answer = answerInProgress
+    else:
+        answer = questionAnswer
+    recordings.record_answer(gameRecording, currentTime, timeOnQuestion,
+                             answer)
+
+
 def question_handler():
     '''Handles questions during play.'''
     global mode, data, question, questionAnswer, questionCorrect, \
            questionMakeTime, points, answerInProgress, answerTime, \
-           pointsGained, streak, timeStarted, timeGameEnded
-    timeOnQuestion = time.time() - questionMakeTime
+           pointsGained, streak, timeStarted, timeGameEnded, \
+           feedbackEventTime, totalTime
+    currentTime = time.perf_counter()
+    if mode == 'play 1' and questionAnswer != '':
+        # Answers are timed from when they were clicked, not from when
+        # they're handled here, so a slow frame can't break a streak or
+        # run out the time
+        currentTime = answerEventTime
+        feedbackEventTime = answerEventTime
+        if [currentTime - questionMakeTime,
+            currentTime - timeStarted][int(timedDifficulty)] >= totalTime:
+            questionAnswer = '' # Clicked after time ran out
+    timeOnQuestion = currentTime - questionMakeTime
     if questionMakeTime == 0:
         timeOnQuestion = 0
     if mode not in ['play 1', 'play 2', 'play 3']:
         return None
     if mode == 'play 3':
-        question = make_question(data)
-        questionMakeTime = time.time()
+        questionStarted = time.perf_counter()
+        if difficulty == 11: # The numbers and time depend on the skill
+            (data, totalTime) = adaptive.pick_spec(adaptiveGrid,
+                                                   adaptiveSkill)
+        if difficulty == 10:
+            question = questions.build_question(*practice.next_fact(
+                practiceDeck, time.time(),
+                lambda: questions.pick_operands(data)))
+        else:
+            question = recordings.make_game_question(
+                data, expressionLevel, difficulty == 6, bankCursor)
+        questionMakeTime = time.perf_counter()
+        if gameMetrics is not None:
+            metrics.observe(gameMetrics['makeQuestionSeconds'],
+                            questionMakeTime - questionStarted)
+            gameMetrics['questionsMade'][0] += 1
         questionAnswer = ''
         questionCorrect = 0
         mode = 'play 1'
         answerInProgress = ''
+        if gameJournal is not None: # So the game resumes with this question
+            journal_question()
     elif mode == 'play 1' and questionAnswer == question[5]: # Correct answer
-        answerTime = time.time()
-        if timeOnQuestion <= 5:
-            streak += 1
-            pointsGained = [None,
-                            max(streak - 2, 1) ** 0.35,
-                            max(streak - 1, 1) ** 0.43,
-                            streak ** 0.5,
-                            streak ** 0.6,
-                            streak ** 0.7,
-                            streak ** 0.8,
-                            streak ** 0.6,
-                            streak ** 0.53,
-                            streak ** 0.45][difficulty]
-            pointsGained = math.ceil(pointsGained)
-        else:
-            streak = 0
-            pointsGained = 1
+        answerTime = time.perf_counter()
+        record_telemetry(1, timeOnQuestion)
+        record_practice(True, timeOnQuestion)
+        record_adaptive(True, timeOnQuestion)
+        record_game_answer(currentTime, timeOnQuestion)
+        (pointsGained, streak) = scoring.score_answer(difficulty, streak,
+                                                      timeOnQuestion)
         points += pointsGained
         questionCorrect = 1
         if not timedDifficulty:
@@ -1029,23 +1455,43 @@ def question_handler():
         # Wrong answer
         mode = 'play 2'
         questionCorrect = -1
-        timeGameEnded = time.time()
-        save_score(int(timeGameEnded), difficulty, points)
+        timeGameEnded = time.perf_counter()
+        if gameMetrics is not None:
+            gameMetrics['wrongAnswers'][difficulty] += 1
+        record_telemetry(0, timeOnQuestion)
+        record_practice(False, timeOnQuestion)
+        record_adaptive(False, timeOnQuestion)
+        record_game_answer(currentTime, timeOnQuestion)
+        save_score(int(time.time()), difficulty, points)
     elif (mode == 'play 1' and questionAnswer == ''
-          and [timeOnQuestion, time.time() - timeStarted][int(timedDifficulty)]
+          and [timeOnQuestion, currentTime - timeStarted][int(timedDifficulty)]
           >= totalTime):
         # Ran out of time
         mode = 'play 2'
         questionCorrect = -2
+        timeGameEnded = time.perf_counter()
+        if gameMetrics is not None:
+            gameMetrics['timeouts'][difficulty] += 1
+        record_telemetry(-1, timeOnQuestion)
+        record_practice(False, timeOnQuestion)
+        record_adaptive(False, timeOnQuestion)
+        record_game_answer(currentTime, timeOnQuestion, True)
         save_score(int(time.time()), difficulty, points)
 
     
 def draw_screen():
     '''Draws the screen for Math Quizzer.'''
+    global statisticsDrawn
+    if mode != 'statistics' and statisticsDrawn is not None:
+        timeLabels.clear()
+        canvas.delete('trend')
+        statisticsDrawn = None
     if mode == 'menu':
         draw_menu()
     elif mode == 'help':
         draw_help()
+    elif mode == 'resume':
+        draw_resume()
     elif mode == 'difficulty':
         draw_difficulty()
     elif mode in ['play 1', 'play 2', 'play 3']:
@@ -1056,145 +1502,265 @@ def draw_screen():
         draw_error('Unknown mode: ' + repr(mode))
 
 
-def click_handler(x, y):
-    '''Handles clicks from the screen.'''
-    global mode, data, questionAnswer, questionCorrect, questionMakeTime, \
-           AAAAAAAUnlocked, difficulty, answerInProgress, typingMessage, \
+def queue_click(x, y):
+    '''Adds a click to inputEvents, stamped with the time it was
+    received. It's handled by click_handler() on the next frame.
+    '''
+    inputEvents.append((time.perf_counter(), x, y))
+
+
+def queue_soak_click():
+    '''Adds the soak test's next click to inputEvents, if it has one:
+    from the menu to a game (with a few correct answers before a wrong
+    one), then to the statistics, and back to the menu.
+    '''
+    global soakStage, soakCyclesDone, soakBaseline
+    clickTime = time.perf_counter()
+    target = None
+    if mode == 'menu':
+        if soakCyclesDone == max(int(soakCycles * memory.SOAK_WARMUP), 1):
+            soakBaseline = memory.measure()
+        if soakCyclesDone == soakCycles:
+            finish_soak_test()
+        target = ('play',)
+    elif mode == 'difficulty':
+        if soakStage == 'play': # Easy to Insane, one after another
+            target = ('difficulty', 4, soakCyclesDone % 5 + 1)
+        elif soakStage == 'statistics':
+            target = ('statistics',)
+        else:
+            target = ('back',)
+            soakStage = 'play'
+    elif mode == 'play 1' and questionAnswer == '':
+        letters = ['A', 'B', 'C', 'D']
+        if streak >= memory.SOAK_ANSWERS: # Answer wrong to end the game
+            letters.remove(question[5])
+            target = ('answer', 2, letters[0])
+        else:
+            target = ('answer', 2, question[5])
+    elif mode == 'play 2':
+        if questionCorrect < 0: # Don't wait for the end of the game
+            clickTime = max(clickTime, timeGameEnded + 0.5)
+            soakStage = 'statistics'
+        inputEvents.append((clickTime, 0, 0))
+    elif mode == 'statistics':
+        if viewStatistics == 0: # Draw the trend chart too
+            target = ('view',)
+        else:
+            target = ('back',)
+            soakStage = 'menu'
+            soakCyclesDone += 1
+    if target is None:
+        return None
+    for widget in layouts[current_layout()]:
+        if widget[0] == target[0] and (
+            len(target) == 1 or widget[4][target[1]] == target[2]):
+            (leftX, topY, rightX, bottomY) = widget_bounds(widget)
+            inputEvents.append((clickTime, (leftX + rightX) / 2,
+                                (topY + bottomY) / 2))
+            return None
+
+
+def finish_soak_test():
+    '''Ends the soak test, printing the memory report and whether the
+    memory stayed flat.
+    '''
+    measured = soakCycles - max(int(soakCycles * memory.SOAK_WARMUP), 1)
+    (summary, passed) = memory.soak_result(soakBaseline, memory.measure(),
+                                           max(measured, 1))
+    quit_game()
+    print(summary)
+    sys.exit(0 if passed else 1)
+
+
+def start_game(style):
+    '''Starts a game on the difficulty whose button has style.'''
+    global mode, data, difficulty, expressionLevel, totalTime, \
+           timedDifficulty, timeStarted, bankCursor, gameRecording, \
+           practiceDeck, gameJournal, adaptiveSkill, adaptiveGrid, \
+           adaptiveGridSpecs
+    mode = 'play 3'
+    difficulty = style[4]
+    data = difficultySpecs[style[6]]
+    expressionLevel = questions.EXPRESSION_LEVELS[style[6]]
+    totalTime = style[5]
+    timedDifficulty = 7 <= difficulty <= 9
+    if timedDifficulty:
+        timeStarted = time.perf_counter()
+    if gameMetrics is not None:
+        gameMetrics['gamesStarted'][difficulty] += 1
+    bankCursor = None
+    gameRecording = None
+    if difficulty < 10: # Practice and adaptive mode pick their own
+                        # questions
+        gameSeed = time.time_ns()
+        random.seed(gameSeed)
+        bankCursor = banks.open_level_cursor(style[6], data, gameSeed)
+        gameRecording = recordings.new_recording(
+            gameSeed, difficulty, data, bankCursor is not None,
+            timeStarted if timedDifficulty else time.perf_counter())
+    if difficulty == 10 and practiceDeck is None:
+        practiceDeck = practice.load_deck(profiles.profile_path(
+            profileName, 'MATHQUIZZER-practice.dat'))
+    if difficulty == 11:
+        if adaptiveGridSpecs is not difficultySpecs:
+            adaptiveGrid = adaptive.build_grid(difficultySpecs)
+            adaptiveGridSpecs = difficultySpecs
+        adaptiveSkill = adaptive.new_skill(
+            settings.get_setting(gameSettings, 'AdaptiveSkill'))
+    gameJournal = journal.start_journal(
+        profiles.profile_path(profileName, journal.PATH), int(time.time()),
+        difficulty)
+
+
+def check_journal():
+    '''Offers to resume the player's last game if it didn't end (if the
+    window was closed or the game crashed during it).
+    '''
+    global mode, unfinishedGame
+    unfinishedGame = journal.read_journal(
+        profiles.profile_path(profileName, journal.PATH))
+    if (unfinishedGame is not None
+        and unfinishedGame['difficulty'] in difficultyStyles):
+        mode = 'resume'
+    else:
+        unfinishedGame = None
+
+
+def journal_question():
+    '''Adds the question being asked to the journal, with the points and
+    streak before it and the time used so far: of the game in timed
+    difficulties, or of the question in the others.
+    '''
+    journal.record_question(
+        gameJournal, int(time.time()), points, streak,
+        time.perf_counter() - (timeStarted if timedDifficulty
+                               else questionMakeTime),
+        question)
+
+
+def resume_game():
+    '''Starts the unfinished game again where it stopped: with the
+    question that was being asked and as much time used as the journal
+    says, or with a new question if none had been shown yet. It isn't
+    recorded, since its first questions weren't.
+    '''
+    global mode, points, streak, timeStarted, gameRecording, \
+           unfinishedGame, question, questionMakeTime, questionAnswer, \
+           questionCorrect, answerInProgress, data, totalTime
+    start_game(difficultyStyles[unfinishedGame['difficulty']])
+    points = unfinishedGame['points']
+    streak = unfinishedGame['streak']
+    if timedDifficulty:
+        timeStarted = time.perf_counter() - unfinishedGame['elapsed']
+    gameRecording = None
+    if unfinishedGame['question'] is not None: # Ask it again
+        if difficulty == 11:
+            (data, totalTime) = adaptive.pick_spec(adaptiveGrid,
+                                                   adaptiveSkill)
+        question = unfinishedGame['question']
+        questionMakeTime = time.perf_counter()
+        if not timedDifficulty:
+            questionMakeTime -= unfinishedGame['elapsed']
+        questionAnswer = ''
+        questionCorrect = 0
+        answerInProgress = ''
+        mode = 'play 1'
+        journal_question()
+    unfinishedGame = None
+
+
+def finish_unfinished_game():
+    '''Saves the score of the unfinished game as it was when it stopped.
+    '''
+    global highscoresVersion, unfinishedGame
+    profiles.save_score(loadedProfiles[profileName],
+                        unfinishedGame['timeAnswered'],
+                        unfinishedGame['difficulty'],
+                        unfinishedGame['points'])
+    highscoresVersion += 1
+    journal.remove_journal(profiles.profile_path(profileName, journal.PATH))
+    unfinishedGame = None
+
+
+def click_handler(x, y, clickTime):
+    '''Handles a click from the screen, received at clickTime (from
+    time.perf_counter()).
+    '''
+    global mode, questionAnswer, questionCorrect, questionMakeTime, \
+           difficulty, answerInProgress, typingMessage, \
            question, points, difficultyStatistics, sortBy, pageStatistics, \
-           tabDifficulty, tabStatistics, timeStarted, totalTime, \
-           timedDifficulty, streak
+           tabDifficulty, tabStatistics, streak, viewStatistics, \
+           answerEventTime
+    widget = hit_test(current_layout(), x, y)
+    name = None if widget is None else widget[0]
     if mode == 'menu':
-        if in_circle(x, y, -115, -50, 52): # Play button
+        if name == 'play':
             mode = 'difficulty'
-        elif in_circle(x, y, 0, -50, 52): # Help button
+        elif name == 'help':
             mode = 'help'
-        elif in_circle(x, y, 115, -50, 52): # Quit button
+        elif name == 'quit':
             quit_game()
+        elif name == 'profile':
+            newName = window.textinput(
+                'Math Quizzer', 'Player name (leave blank for the shared '
+                + 'profile):')
+            if newName is not None:
+                use_profile(profiles.get_profile(
+                    loadedProfiles, profiles.clean_name(newName)))
+                check_journal()
+                # Open this profile next time
+                settings.set_setting(sharedSettings, 'Profile',
+                                     profileName or None)
+                settings.save_settings(sharedSettings)
     elif mode == 'help':
-        if in_circle(x, y, -160, -160, 32): # Back button
+        if name == 'back':
+            mode = 'menu'
+    elif mode == 'resume':
+        if name == 'resume':
+            resume_game()
+        elif name == 'finish':
+            finish_unfinished_game()
             mode = 'menu'
     elif mode == 'difficulty':
-        if tabDifficulty == 0:
-            if in_rectangle(x, y, -156, 66, -4, 14): # Easy button
-                mode = 'play 3'
-                data = difficultyData[1]
-                difficulty = 1
-                totalTime = 10
-            elif in_rectangle(x, y, 4, 66, 156, 14): # Normal button
-                mode = 'play 3'
-                data = difficultyData[2]
-                difficulty = 2
-                totalTime = 10
-            elif in_rectangle(x, y, -156, 6, -4, -46): # Hard button
-                mode = 'play 3'
-                data = difficultyData[3]
-                difficulty = 3
-                totalTime = 10
-            elif in_rectangle(x, y, 4, 6, 156, -46): # Harder button
-                mode = 'play 3'
-                data = difficultyData[4]
-                difficulty = 4
-                totalTime = 8
-            elif in_rectangle(x, y, -156, -54, -4, -106): # Insane button
-                mode = 'play 3'
-                data = difficultyData[5]
-                difficulty = 5
-                totalTime = 8
-            elif in_rectangle(x, y, 4, -54, 156, -106): # AAAAAAA button
-                if AAAAAAAUnlocked:
-                    mode = 'play 3'
-                    data = difficultyData[6]
-                    difficulty = 6
-                    totalTime = 8
-                else:
-                    AAAAAAAUnlocked = True
-        elif tabDifficulty == 1:
-            if in_rectangle(x, y, -156, 66, -4, 14): # 30 seconds button
-                mode = 'play 3'
-                data = difficultyData[7]
-                difficulty = 7
-                timeStarted = time.time()
-                totalTime = 30
-                timedDifficulty = True
-            elif in_rectangle(x, y, 4, 66, 156, 14): # 1 minute button
-                mode = 'play 3'
-                data = difficultyData[7]
-                difficulty = 8
-                timeStarted = time.time()
-                totalTime = 60
-                timedDifficulty = True
-            elif in_rectangle(x, y, -156, 6, -4, -46): # 2 minutes button
-                mode = 'play 3'
-                data = difficultyData[7]
-                difficulty = 9
-                timeStarted = time.time()
-                totalTime = 120
-                timedDifficulty = True
-        if in_rectangle(x, y, -68, 126, 68, 84): # Gamemode type button
-            tabDifficulty = 1 - tabDifficulty
-        elif in_circle(x, y, -160, -160, 32): # Back button
+        if name == 'difficulty':
+            # Easy, Normal, Hard, Harder, Insane, AAAAAAA, timed, or practice
+            style = widget[4]
+            if style[4] == 6 and not AAAAAAAUnlocked:
+                settings.set_setting(gameSettings, 'AAAAAAAUnlocked', True)
+                settings.save_settings(gameSettings)
+            else:
+                start_game(style)
+        elif name == 'gamemode':
+            tabDifficulty = (tabDifficulty + 1) % 3
+        elif name == 'back':
             mode = 'menu'
             tabDifficulty = 0
-        elif in_circle(x, y, 160, -160, 32): # Statistics button
+        elif name == 'statistics':
             mode = 'statistics'
             tabDifficulty = 0
             difficultyStatistics = 1
-    elif mode == 'play 1':
-        if difficulty == 6:
-            for button in [(-193, -158, -30, '1'),
-                           (-154, -119, -30, '2'),
-                           (-115, -80, -30, '3'),
-                           (-76, -41, -30, '4'),
-                           (-37, -2, -30, '5'),
-                           (2, 37, -30, '6'),
-                           (41, 76, -30, '7'),
-                           (80, 115, -30, '8'),
-                           (119, 154, -30, '9'),
-                           (158, 193, -30, '0'),
-                           (-193, -41, -80, 'Delete'),
-                           (-37, 115, -80, 'Clear'),
-                           (119, 193, -80, 'Go')]:
-                if in_rectangle(x, y, button[0] - 2, button[2] + 25,
-                                button[1] + 2, button[2] - 25):
-                    typingMessage = ''
-                    if len(button[3]) == 1: # Digit
-                        if len(answerInProgress) == 20:
-                            typingMessage = ("The answer's obviously"
-                                             + 'smaller than that.')
-                        elif answerInProgress == '0':
-                            answerInProgress = button[3]
-                        else:
-                            answerInProgress += button[3]
-                    elif button[3] == 'Delete': # Delete
-                        if len(answerInProgress) > 0:
-                            answerInProgress = answerInProgress[:-1]
-                    elif button[3] == 'Clear': # Clear
-                        answerInProgress = '0'
-                    elif button[3] == 'Go': # Go
-                        if answerInProgress == '':
-                        # Tried to enter a blank answer
-                            typingMessage = 'Please enter a number.'
-                        else:
-                            answerInProgress = int(answerInProgress)
-                            if answerInProgress == question[6]:
-                                questionAnswer = 'A'
-                            else:
-                                questionAnswer = 'B'
-        else:
-            if in_rectangle(x, y, -156, 46, -4, -6): # A) button
-                questionAnswer = 'A'
-            elif in_rectangle(x, y, 4, 46, 156, -6): # B) button
-                questionAnswer = 'B'
-            elif in_rectangle(x, y, -156, -14, -4, -66): # C) button
-                questionAnswer = 'C'
-            elif in_rectangle(x, y, 4, -14, 156, -66): # D) button
-                questionAnswer = 'D'
+    elif mode == 'play 1' and questionAnswer == '': # Only the first answer
+                                                    # counts
+        if name == 'key': # Difficulty 6
+            key = widget[4][0]
+            (answerInProgress, typingMessage) = questions.type_key(
+                answerInProgress, key)
+            if key == 'Go' and answerInProgress != '':
+                answerInProgress = int(answerInProgress)
+                if answerInProgress == question[6]:
+                    questionAnswer = 'A'
+                else:
+                    questionAnswer = 'B'
+        elif name == 'answer': # A), B), C), or D) button
+            questionAnswer = widget[4][2]
+        answerEventTime = clickTime
     elif mode == 'play 2' and questionCorrect == 1:
     # Click after a correct answer
         mode = 'play 3'
     elif mode == 'play 2' and questionCorrect < 0:
     # Click after a wrong answer
-        if time.time() - timeGameEnded >= 0.5:
+        if clickTime - timeGameEnded >= 0.5:
             question = None
             questionCorrect = 0
             questionMakeTime = 0
@@ -1204,103 +1770,267 @@ def click_handler(x, y):
             answerInProgress = ''
             streak = 0
     elif mode == 'statistics': # Statistics screen
-        if in_rectangle(x, y, -182, 187, -68, 148): # Tab button, part 1
-            tabStatistics = 1 - tabStatistics
-        headerButtons = [[(-35, 1), (5, 2), (45, 3), (85, 4),
-                          (125, 5), (165, 6)] if AAAAAAAUnlocked else
-                         [(-35, 1), (5, 2), (45, 3), (85, 4),
-                          (125, 5)],
-                         [(-35, 7), (5, 8), (45, 9)]][tabStatistics]
-        if in_circle(x, y, -160, -160, 32): # Back button
+        if name == 'back':
             mode = 'difficulty'
             difficultyStatistics = 0
             tabStatistics = 0
-        elif in_circle(x, y, 90, -160, 32): # Page up button
+            viewStatistics = 0
+        elif name == 'page up':
             if pageStatistics != 0:
                 pageStatistics -= 1
-        elif in_circle(x, y, 160, -160, 32): # Page down button
-            if pageStatistics != -(len(allAttempts) // -8) - 1:
+        elif name == 'page down':
+            if pageStatistics < -(len(allAttempts) // -8) - 1:
                 pageStatistics += 1
-        elif in_rectangle(x, y, -182, 187, -68, 148): # Tab button, part 2
-            difficultyStatistics = headerButtons[0][1]
-        elif in_rectangle(x, y, -72, -158, 32, -192): # 'Sort by' button
+        elif name == 'tab':
+            tabStatistics = (tabStatistics + 1) % 3
+            difficultyStatistics = [widget for widget
+                                    in layouts[current_layout()]
+                                    if widget[0] == 'header'][0][4][3]
+        elif name == 'sort':
             sortBy = 1 - sortBy
-        for button in headerButtons:
-            if in_circle(x, y, button[0], 169, 20):
-                difficultyStatistics = button[1]
-                pageStatistics = 0
+        elif name == 'view':
+            viewStatistics = 1 - viewStatistics
+        elif name == 'header':
+            difficultyStatistics = widget[4][3]
+            pageStatistics = 0
     elif mode == 'error': # Error screen; 'Click anywhere to quit.'
         quit_game()
 
 
 def quit_game():
     '''Closes the Math Quizzer game.'''
-    highscoresFile.close()
-    otherFile.close()
+    global mode
+    if gameJournal is not None: # Keep the time used on the question
+        if mode == 'play 2': # After a correct answer
+            mode = 'play 3'
+            question_handler() # Journals the next question
+        else:
+            journal_question()
+    use_profile(loadedProfiles[profileName]) # Saves its variables
+    for profile in loadedProfiles.values():
+        profiles.close_profile(profile)
+    if latencyLog is not None:
+        print(latency.latency_summary(latencyLog))
+    if memoryMonitor is not None:
+        print(memory.memory_report(memoryMonitor))
+    if gameMetrics is not None and metricsFileEnabled:
+        metrics.write_metrics(gameMetrics)
     window.bye()
 
 
-def find_scores():
-    '''Turns the scores from the MATHQUIZZER-highscores.txt file into a
-    nested list, then returns it.
+def reload_difficulties():
+    '''Loads the custom difficulties again if their file has changed,
+    checking at most once per second. If the new file has a problem, the
+    old difficulties are kept. A game that's already being played keeps
+    its difficulty until it ends.
+    '''
+    global difficultySpecs, difficultyFile, difficultyStamp, \
+           difficultyCheckTime
+    if time.time() - difficultyCheckTime < 1:
+        return None
+    difficultyCheckTime = time.time()
+    newFile = difficulties.find_difficulty_file()
+    newStamp = None if newFile is None else difficulties.file_stamp(newFile)
+    if (newFile, newStamp) == (difficultyFile, difficultyStamp):
+        return None
+    (difficultyFile, difficultyStamp) = (newFile, newStamp)
+    if newFile is None:
+        difficultySpecs = questions.compiledDifficultyData
+        return None
+    try:
+        difficultySpecs = difficulties.load_difficulties(newFile)
+    except (OSError, ValueError) as error:
+        print('Kept the old difficulties. ' + str(error))
+
+
+def use_profile(profile):
+    '''Switches to profile (from profiles.get_profile()). The profile
+    being switched from keeps its variables, so that switching back
+    doesn't load anything again.
     '''
-    return [[int(i) for i in line.split(' ')] for line in highscoresList[1:]
-            if line != '']
+    global profileName, scoreSketches, scoreRollups, \
+           gameSettings, telemetryLog, practiceDeck, highscoresVersion
+    if profileName is not None and profileName in loadedProfiles:
+        loadedProfiles[profileName].update(practiceDeck = practiceDeck)
+    profileName = profile['name']
+    scoreSketches = profile['scoreSketches']
+    scoreRollups = profile['scoreRollups']
+    gameSettings = profile['settings']
+    telemetryLog = profile['telemetryLog']
+    practiceDeck = profile['practiceDeck']
+    highscoresVersion += 1 # So that statistics are drawn again
+
+    # Keep the variables for settings the same as the settings
+    for (name, callback) in (('AAAAAAAUnlocked', set_AAAAAAA_unlocked),
+                             ('FrameRate', set_frame_rate)):
+        settings.on_change(gameSettings, name, callback)
+        callback(settings.get_setting(gameSettings, name))
+
+
+def set_AAAAAAA_unlocked(unlocked):
+    '''Called when the AAAAAAAUnlocked setting changes.'''
+    global AAAAAAAUnlocked
+    AAAAAAAUnlocked = unlocked
+
+
+def set_frame_rate(frameRate):
+    '''Called when the FrameRate setting changes.'''
+    global frameTime
+    frameTime = 1 / frameRate if frameRate else 0
+
+
+def read_new_scores():
+    '''Reads the scores saved since the last time this was called, by
+    this game or by another game using the same profile.
+    '''
+    global highscoresVersion, scoresCheckTime
+    scoresCheckTime = time.time()
+    if profiles.read_new_scores(loadedProfiles[profileName]):
+        highscoresVersion += 1
 
 
 def save_score(timeFinished, difficulty, points):
     '''Saves score to MATHQUIZZER-highscores.txt, according to
     timeFinished, difficulty, and points.
     '''
-    global highscoresFile, highscoresText, highscoresList, highScores
-    highscoresFile.write(str(timeFinished) + ' ' + str(difficulty)
-                         + ' ' + str(points) + '\n')
-    highscoresFile.flush()
-    highscoresText += (str(timeFinished) + ' ' + str(difficulty) + ' '
-                       + str(points) + '\n')
-    highscoresList = highscoresText.split('\n')
-    highScores = find_scores()
-
-
-# Open files MATHQUIZZER-highscores.txt and MATHQUIZZER-other.txt,
-# throwing an error if they exist and the first line isn't the standard
-# header
-try:
-    highscoresFile = open('MATHQUIZZER-highscores.txt', 'r+')
-except OSError:
-    highscoresFile = open('MATHQUIZZER-highscores.txt', 'w+')
-    highscoresFile.write('# Belongs to the game Math Quizzer.\n')
-highscoresFile.seek(0)
-highscoresText = highscoresFile.read()
-highscoresList = highscoresText.split('\n')
-if not highscoresText.startswith('# Belongs to the game Math Quizzer.'):
-    raise Exception('File MATHQUIZZER-highscores.txt is not formed properly. '
-                    + 'Please rename the file, then try again.')
-else:
-    highScores = find_scores()
-
+    global scoreSummary, highscoresVersion, gameJournal
+    profile = loadedProfiles[profileName]
+    saveStarted = time.perf_counter()
+
+    # Compare the score with the earlier attempts (including ones other
+    # games just saved), then add it
+    scoreSummary = profiles.save_score(profile, timeFinished, difficulty,
+                                       points)
+    highscoresVersion += 1
+    if telemetryLog is not None:
+        telemetry.flush_log(telemetryLog)
+    if difficulty == 10:
+        practice.save_deck(practiceDeck)
+    if difficulty == 11:
+        settings.set_setting(gameSettings, 'AdaptiveSkill',
+                             round(adaptiveSkill['rating'], 3))
+        settings.save_settings(gameSettings)
+    if gameRecording is not None:
+        recordings.save_recording(
+            gameRecording, points,
+            profiles.profile_path(profileName, recordings.DIRECTORY))
+    if gameJournal is not None: # The game is over, so there's nothing
+        journal.finish_journal(gameJournal) # to resume
+        gameJournal = None
+    if gameMetrics is not None:
+        metrics.observe(gameMetrics['saveScoreSeconds'],
+                        time.perf_counter() - saveStarted)
+
+
+def record_frame(frameStarted, inputQueueDepth):
+    '''Adds a frame that started at frameStarted (from
+    time.perf_counter()) and had inputQueueDepth clicks waiting to the
+    metrics, writing them to MATHQUIZZER-metrics.prom if it's time to.
+    '''
+    global metricsWriteTime
+    metrics.observe(gameMetrics['frameSeconds'],
+                    time.perf_counter() - frameStarted)
+    gameMetrics['inputQueueDepth'][0] = inputQueueDepth
+    if time.time() - metricsWriteTime >= metrics.WRITE_INTERVAL:
+        metricsWriteTime = time.time()
+        gameMetrics['scoreFileBytes'][0] = \
+            loadedProfiles[profileName]['highscoresOffset']
+        if metricsFileEnabled:
+            metrics.write_metrics(gameMetrics)
+
+
+# With --soak-test, play the game by itself in a hidden window, in a new
+# folder so that its scores don't mix with real ones (see memory.py)
+soakCycles = memory.soak_cycles(sys.argv)
+if soakCycles:
+    print('Soak test in ' + memory.make_soak_folder())
+    canvas.winfo_toplevel().withdraw()
+
+# Open the shared profile, whose files MATHQUIZZER-highscores.txt and
+# MATHQUIZZER-other.txt are in this folder, throwing an error if they
+# exist and the first line isn't the standard header
+loadedProfiles = profiles.new_profile_cache()
+use_profile(profiles.get_profile(loadedProfiles, ''))
+sharedSettings = gameSettings
+
+# Switch to the profile that was used last, if it wasn't the shared one
+if settings.get_setting(sharedSettings, 'Profile'):
+    use_profile(profiles.get_profile(loadedProfiles, profiles.clean_name(
+        settings.get_setting(sharedSettings, 'Profile'))))
+
+# Offer to resume the last game if the window was closed during it
+check_journal()
+
+# Closing the window quits like the Quit button, so the journal keeps the
+# time used on the question being asked
+canvas.winfo_toplevel().protocol('WM_DELETE_WINDOW', quit_game)
+
+# Use the custom difficulties in MATHQUIZZER-difficulties.toml (or .json)
+# if there are any. If the file has a problem, the usual difficulties are
+# used until it's fixed (see reload_difficulties()).
+difficultyFile = difficulties.find_difficulty_file()
+if difficultyFile is not None:
+    difficultyStamp = difficulties.file_stamp(difficultyFile)
+    try:
+        difficultySpecs = difficulties.load_difficulties(difficultyFile)
+    except (OSError, ValueError) as error:
+        print('Using the usual difficulties. ' + str(error))
+
+# Use the custom scoring rules in MATHQUIZZER-scoring.toml (or .json) if
+# there are any, or the usual ones if the file has a problem
 try:
-    otherFile = open('MATHQUIZZER-other.txt', 'r+')
-except OSError:
-    otherFile = open('MATHQUIZZER-other.txt', 'w+')
-    otherFile.write('# Belongs to the game Math Quizzer.\n')
-otherFile.seek(0)
-otherText = otherFile.read()
-if not otherText.startswith('# Belongs to the game Math Quizzer.'):
-    raise Exception('File MATHQUIZZER-other.txt is not formed properly. '
-                    + 'Please rename the file, then try again.')
-else:
-    AAAAAAAUnlocked = 'AAAAAAAUnlocked\n' in otherText
+    scoring.use_rules(scoring.load_custom_rules())
+except ValueError as error:
+    print('Using the usual scoring rules. ' + str(error))
+
+# With --measure-latency, print how long each answer took to show
+# whether it was right
+if latency.FLAG in sys.argv:
+    latencyLog = latency.new_latency_log()
+
+# With --monitor-memory (or --soak-test), sample how much memory the game
+# uses in each mode
+if memory.FLAG in sys.argv or soakCycles:
+    memoryMonitor = memory.start_monitor(
+        memory.SOAK_SAMPLE_INTERVAL if soakCycles
+        else memory.SAMPLE_INTERVAL)
+
+# Turn on metrics if the shared MATHQUIZZER-other.txt says to
+(metricsFileEnabled, metricsPort) = metrics.find_settings(sharedSettings)
+if metricsFileEnabled or metricsPort is not None:
+    gameMetrics = metrics.new_metrics()
+    if metricsPort is not None:
+        metrics.serve_metrics(gameMetrics, metricsPort)
 
 
 while True:
+    frameStarted = time.perf_counter()
+    if soakCycles:
+        queue_soak_click()
+    inputQueueDepth = len(inputEvents)
+    reload_difficulties()
+    if time.time() - scoresCheckTime >= 1:
+        read_new_scores()
+    while inputEvents: # Clicks received while the last frame was drawn
+        (clickTime, x, y) = inputEvents.popleft()
+        click_handler(x, y, clickTime)
     question_handler()
     draw_screen()
-    window.onclick(click_handler)
-    if AAAAAAAUnlocked and 'AAAAAAAUnlocked\n' not in otherText:
-        otherFile.write('AAAAAAAUnlocked\n')
-        otherFile.flush()
-        otherText += 'AAAAAAAUnlocked\n'
+    if feedbackEventTime is not None:
+        if latencyLog is not None:
+            print('Answer shown after ' + latency.format_milliseconds(
+                latency.add_latency(latencyLog, feedbackEventTime,
+                                    time.perf_counter())))
+        feedbackEventTime = None
+    if memoryMonitor is not None:
+        sample = memory.check_memory(memoryMonitor, mode)
+        if sample is not None:
+            print(sample)
+    window.onclick(queue_click)
+    if gameMetrics is not None:
+        record_frame(frameStarted, inputQueueDepth)
+    if frameTime: # Wait for the rest of the frame
+        time.sleep(max(frameStarted + frameTime - time.perf_counter(), 0))
 
 window.listen()
 window.mainloop()
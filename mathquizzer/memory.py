@@ -0,0 +1,220 @@
+# Math Quizzer memory
+# Part of Math Quizzer. Watches how much memory the game uses, for
+# kiosks that leave it open for days, when it's run with
+# --monitor-memory.
+#
+# Each mode the game is in (like 'menu' or 'statistics') is sampled at
+# most once every SAMPLE_INTERVAL seconds: the memory Python has
+# allocated (traced with tracemalloc) and the resident set size (RSS,
+# all the memory the system has given the game, including Tk's). Only
+# the first and last sample of each mode are kept, so the monitor
+# doesn't grow either. Each sample also finds the lines of code whose
+# allocations grew the most since monitoring started. When the game
+# quits, the report shows how fast each mode's memory grew and those
+# lines.
+#
+# --soak-test [CYCLES] plays the game by itself in a hidden window (so
+# it still needs a display; use xvfb-run on a server) and in a new empty
+# folder, so that the scores it saves don't mix with real ones. It goes
+# from the menu to a game (SOAK_ANSWERS correct answers, then a wrong
+# one), to the statistics and back CYCLES times (2000 by default), then
+# prints the report and compares the memory after the first SOAK_WARMUP
+# of the cycles with the memory at the end. Every game keeps its score
+# (see profiles.py), so memory can't stay perfectly flat, but if it
+# grows more than SOAK_LIMIT bytes of Python's memory or SOAK_RSS_LIMIT
+# bytes of RSS per cycle, something is leaking, and the game exits with
+# an error.
+
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+
+FLAG = '--monitor-memory'
+SOAK_FLAG = '--soak-test'
+SAMPLE_INTERVAL = 60 # Seconds
+SOAK_SAMPLE_INTERVAL = 5
+SOAK_CYCLES = 2000
+SOAK_ANSWERS = 5 # Correct answers in each game
+SOAK_WARMUP = 0.1 # Fraction of the cycles
+SOAK_LIMIT = 512 # Bytes per cycle
+SOAK_RSS_LIMIT = 2048
+TOP_SITES = 10
+
+
+def format_bytes(size, sign = False):
+    '''format_bytes(size, sign = False) -> str
+    Returns size (in bytes) like '12.3 MB', starting with + or - if sign
+    is True.
+    '''
+    for unit in ('B', 'KB', 'MB'):
+        if abs(size) < 1024:
+            break
+        size /= 1024
+    else:
+        unit = 'GB'
+    return format(size, '+.1f' if sign else '.1f') + ' ' + unit
+
+
+def current_rss():
+    '''current_rss() -> int OR None
+    Returns the resident set size of the game in bytes, or None if the
+    system doesn't say (only Linux does).
+    '''
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def site_sizes():
+    '''site_sizes() -> dict
+    Returns the memory allocated by each line of code (but the
+    monitor's) that's still in use, as {(FILENAME, LINE): (BYTES,
+    BLOCKS)}.
+    '''
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        (tracemalloc.Filter(False, tracemalloc.__file__),
+         tracemalloc.Filter(False, __file__), # The monitor itself
+         tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+         tracemalloc.Filter(False, '<unknown>')))
+    return {(statistic.traceback[0].filename, statistic.traceback[0].lineno):
+            (statistic.size, statistic.count)
+            for statistic in snapshot.statistics('lineno')}
+
+
+def start_monitor(interval = SAMPLE_INTERVAL):
+    '''start_monitor(interval = SAMPLE_INTERVAL) -> dict
+    Starts tracing memory and returns the monitor, which samples each
+    mode at most once every interval seconds.
+    '''
+    tracemalloc.start()
+    return {'interval': interval,
+            'baseline': site_sizes(),
+            'modes': {}, # {MODE: [FIRST SAMPLE, LAST SAMPLE, SAMPLES]}
+            'sites': []} # Lines that grew the most, as (BYTES, BLOCKS,
+                         # 'FILENAME:LINE')
+
+
+def measure():
+    '''measure() -> (float, int, int OR None)
+    Returns (TIME, PYTHON MEMORY, RSS) right now, after collecting
+    garbage so that it doesn't count.
+    '''
+    gc.collect()
+    return (time.time(), tracemalloc.get_traced_memory()[0], current_rss())
+
+
+def take_sample(monitor, mode):
+    '''take_sample(monitor, mode) -> str
+    Samples the memory now, while the game is in mode, and returns it
+    as a line for the log.
+    '''
+    sample = measure()
+    if mode in monitor['modes']:
+        monitor['modes'][mode][1:] = [sample, monitor['modes'][mode][2] + 1]
+    else:
+        monitor['modes'][mode] = [sample, sample, 1]
+    growth = []
+    for (site, (size, count)) in site_sizes().items():
+        (oldSize, oldCount) = monitor['baseline'].get(site, (0, 0))
+        if size > oldSize:
+            growth.append((size - oldSize, count - oldCount,
+                           os.path.basename(site[0]) + ':' + str(site[1])))
+    monitor['sites'] = sorted(growth, reverse = True)[:TOP_SITES]
+    return ('Memory (' + mode + '): ' + format_bytes(sample[1])
+            + ' in Python, '
+            + ('RSS unknown' if sample[2] is None
+               else format_bytes(sample[2]) + ' RSS'))
+
+
+def check_memory(monitor, mode):
+    '''check_memory(monitor, mode) -> str OR None
+    Samples the memory if mode hasn't been sampled for the monitor's
+    interval, returning the line for the log, or None if it hasn't.
+    '''
+    if (mode in monitor['modes'] and time.time()
+        - monitor['modes'][mode][1][0] < monitor['interval']):
+        return None
+    return take_sample(monitor, mode)
+
+
+def growth_rate(first, last):
+    '''growth_rate(first, last) -> str
+    Returns how fast Python's memory grew from sample first to sample
+    last, like '+1.2 KB/hour'.
+    '''
+    if last[0] <= first[0]:
+        return 'one sample'
+    return (format_bytes((last[1] - first[1]) * 3600 / (last[0] - first[0]),
+                         True) + '/hour')
+
+
+def memory_report(monitor):
+    '''memory_report(monitor) -> str
+    Returns how much memory each mode used when it was first and last
+    sampled, how fast it grew, and the lines of code whose memory grew
+    the most.
+    '''
+    if not monitor['modes']:
+        return 'No memory was sampled.'
+    lines = ["Memory by mode (Python's, then RSS, first -> last):"]
+    for (mode, (first, last, samples)) in sorted(monitor['modes'].items()):
+        rss = ('RSS unknown' if first[2] is None or last[2] is None
+               else format_bytes(first[2]) + ' -> ' + format_bytes(last[2]))
+        lines.append('  ' + mode.ljust(12) + format_bytes(first[1]) + ' -> '
+                     + format_bytes(last[1]) + ', ' + rss + ', '
+                     + growth_rate(first, last) + ' (' + str(samples)
+                     + ' samples)')
+    lines.append('Lines whose memory grew the most since monitoring '
+                 + 'started:')
+    for (size, count, site) in monitor['sites']:
+        lines.append(format_bytes(size, True).rjust(12)
+                     + (format(count, '+') + ' blocks').rjust(16) + '  '
+                     + site)
+    return '\n'.join(lines)
+
+
+def soak_cycles(arguments):
+    '''soak_cycles(arguments) -> int
+    Returns how many cycles the soak test in arguments (like sys.argv)
+    should run, or 0 if there isn't one.
+    '''
+    if SOAK_FLAG not in arguments:
+        return 0
+    index = arguments.index(SOAK_FLAG)
+    if index + 1 < len(arguments) and arguments[index + 1].isdigit():
+        return max(int(arguments[index + 1]), 1)
+    return SOAK_CYCLES
+
+
+def make_soak_folder():
+    '''make_soak_folder() -> str
+    Makes a new empty folder for the soak test, switches to it, and
+    returns its path.
+    '''
+    path = tempfile.mkdtemp(prefix = 'MATHQUIZZER-soak-')
+    os.chdir(path)
+    return path
+
+
+def soak_result(before, after, cycles):
+    '''soak_result(before, after, cycles) -> (str, bool)
+    Returns (SUMMARY, PASSED) for a soak test whose memory was before
+    (from measure()) and then after cycles more cycles.
+    '''
+    growth = (after[1] - before[1]) / cycles
+    passed = growth <= SOAK_LIMIT
+    summary = (str(cycles) + ' cycles: ' + format_bytes(growth, True)
+               + ' per cycle in Python (limit ' + format_bytes(SOAK_LIMIT)
+               + ')')
+    if before[2] is not None and after[2] is not None:
+        rssGrowth = (after[2] - before[2]) / cycles
+        passed = passed and rssGrowth <= SOAK_RSS_LIMIT
+        summary += (', ' + format_bytes(rssGrowth, True) + ' RSS (limit '
+                    + format_bytes(SOAK_RSS_LIMIT) + ')')
+    return (summary + ('. Memory stayed flat.' if passed
+                       else '. Memory is growing.'), passed)
@@ -0,0 +1,172 @@
+# Math Quizzer metrics
+# Part of Math Quizzer. Keeps counters and histograms of how the game is
+# running (when turned on), so that slow computers can be found without
+# sitting at each of them.
+#
+# Metrics are turned on by settings in the shared MATHQUIZZER-other.txt
+# (see settings.py):
+#
+# MetricsEnabled true   Write the metrics to MATHQUIZZER-metrics.prom
+#                       every WRITE_INTERVAL seconds (for example, for
+#                       the node_exporter textfile collector)
+# MetricsPort 9464      Serve the metrics at
+#                       http://127.0.0.1:9464/metrics
+#
+# Both are in the Prometheus text format. Recording something only adds
+# to a number in a list that's made when the game starts (histograms
+# have fixed buckets), so nothing is locked or allocated while playing.
+# The server's thread only reads the numbers.
+
+import bisect
+import http.server
+import os
+import threading
+
+import settings
+
+PATH = 'MATHQUIZZER-metrics.prom'
+WRITE_INTERVAL = 15
+NUM_DIFFICULTIES = 11
+
+# Upper bounds of the buckets of each histogram, in seconds
+FRAME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+QUESTION_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+                    0.001, 0.0025, 0.01)
+SAVE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+# Key in the metrics, name, type, and description of every metric
+METRICS = (('frameSeconds', 'mathquizzer_frame_seconds', 'histogram',
+            'Time taken by each frame of the game.'),
+           ('questionsMade', 'mathquizzer_questions_made_total', 'counter',
+            'Questions made.'),
+           ('makeQuestionSeconds', 'mathquizzer_make_question_seconds',
+            'histogram', 'Time taken to make each question.'),
+           ('saveScoreSeconds', 'mathquizzer_save_score_seconds',
+            'histogram', 'Time taken to save each score.'),
+           ('inputQueueDepth', 'mathquizzer_input_queue_depth', 'gauge',
+            'Clicks that were waiting to be handled in the last frame.'),
+           ('scoreFileBytes', 'mathquizzer_score_file_bytes', 'gauge',
+            'Size of MATHQUIZZER-highscores.txt.'),
+           ('gamesStarted', 'mathquizzer_games_started_total', 'counter',
+            'Games started on each difficulty.'),
+           ('wrongAnswers', 'mathquizzer_games_finished_total', 'counter',
+            'Games finished on each difficulty, by how they ended.'),
+           ('timeouts', 'mathquizzer_games_finished_total', 'counter',
+            None))
+
+
+def new_histogram(buckets):
+    '''new_histogram(buckets) -> list
+    Returns an empty histogram with buckets (their upper bounds, from
+    smallest to biggest). The histogram is [buckets, counts, sum], where
+    counts has one more count than buckets, for values above them all.
+    '''
+    return [buckets, [0] * (len(buckets) + 1), 0]
+
+
+def observe(histogram, value):
+    '''Adds value to histogram.'''
+    histogram[1][bisect.bisect_left(histogram[0], value)] += 1
+    histogram[2] += value
+
+
+def new_metrics():
+    '''new_metrics() -> dict
+    Returns metrics with every count at 0. The keys are the same as the
+    ones in METRICS, and counts for each difficulty are lists indexed by
+    difficulty.
+    '''
+    return {'frameSeconds': new_histogram(FRAME_BUCKETS),
+            'questionsMade': [0],
+            'makeQuestionSeconds': new_histogram(QUESTION_BUCKETS),
+            'saveScoreSeconds': new_histogram(SAVE_BUCKETS),
+            'inputQueueDepth': [0],
+            'scoreFileBytes': [0],
+            'gamesStarted': [0] * (NUM_DIFFICULTIES + 1),
+            'wrongAnswers': [0] * (NUM_DIFFICULTIES + 1),
+            'timeouts': [0] * (NUM_DIFFICULTIES + 1)}
+
+
+def find_settings(store):
+    '''find_settings(store) -> (bool, int OR None)
+    Returns whether metrics should be written to PATH and the port they
+    should be served on (or None), from store (from settings.py).
+    '''
+    return (settings.get_setting(store, 'MetricsEnabled'),
+            settings.get_setting(store, 'MetricsPort'))
+
+
+def format_histogram(name, histogram):
+    '''format_histogram(name, histogram) -> list
+    Returns the lines of histogram in the Prometheus text format.
+    '''
+    (buckets, counts, total) = histogram
+    lines = []
+    count = 0
+    for (bound, bucketCount) in zip(buckets + ('+Inf',), counts):
+        count += bucketCount
+        lines.append(name + '_bucket{le="' + str(bound) + '"} ' + str(count))
+    lines.append(name + '_sum ' + repr(total))
+    lines.append(name + '_count ' + str(count))
+    return lines
+
+
+def format_metrics(metrics):
+    '''format_metrics(metrics) -> str
+    Returns metrics in the Prometheus text format.
+    '''
+    lines = []
+    for (key, name, kind, description) in METRICS:
+        if description is not None:
+            lines.append('# HELP ' + name + ' ' + description)
+            lines.append('# TYPE ' + name + ' ' + kind)
+        value = metrics[key]
+        if kind == 'histogram':
+            lines += format_histogram(name, value)
+        elif len(value) == 1:
+            lines.append(name + ' ' + str(value[0]))
+        else: # One for each difficulty
+            label = ''
+            if key in ('wrongAnswers', 'timeouts'):
+                label = (',reason="' + ('wrong' if key == 'wrongAnswers'
+                                        else 'timeout') + '"')
+            for difficulty in range(1, len(value)):
+                lines.append(name + '{difficulty="' + str(difficulty) + '"'
+                             + label + '} ' + str(value[difficulty]))
+    return '\n'.join(lines) + '\n'
+
+
+def write_metrics(metrics, path = PATH):
+    '''Writes metrics to path, replacing it all at once so that nothing
+    reading it sees half a file.
+    '''
+    with open(path + '.tmp', 'w') as metricsFile:
+        metricsFile.write(format_metrics(metrics))
+    os.replace(path + '.tmp', path)
+
+
+def serve_metrics(metrics, port):
+    '''serve_metrics(metrics, port) -> http.server.ThreadingHTTPServer
+    Serves metrics at http://127.0.0.1:port/metrics from another thread,
+    and returns the server.
+    '''
+    class MetricsHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_error(404)
+                return None
+            body = format_metrics(metrics).encode()
+            self.send_response(200)
+            self.send_header('Content-Type',
+                             'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass # Don't print every request
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', port),
+                                             MetricsHandler)
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+    return server
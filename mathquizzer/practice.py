@@ -0,0 +1,112 @@
+# Math Quizzer practice
+# Part of Math Quizzer. Keeps a spaced-repetition deck of the facts
+# (like 7 × 8) a player has seen in practice mode, so that facts come
+# back sooner the more often they're missed or the slower they're
+# answered.
+#
+# The deck is a heap ordered by when each fact should be asked again,
+# moved earlier for weak facts, but by less than their interval, so a
+# fact that was just answered is never due again straight away. A fact is popped off the heap when it's
+# asked and pushed back on with a new due time when it's answered, so
+# each answer costs O(log n). Facts that haven't been seen yet are never
+# listed ahead of time; when nothing is due, a new one is picked from
+# the difficulty's ranges instead.
+#
+# The deck is saved as fixed-width records (see RECORD), one per fact.
+
+import heapq
+import os
+import struct
+
+# Operation, first number, second number, due time, interval (seconds
+# until the next review), average response time, attempts, wrong answers
+RECORD = struct.Struct('<Biiddfii')
+
+FIRST_INTERVAL = 60
+WRONG_INTERVAL = 30
+FAST_ANSWER = 5 # Answers at least this fast double the interval
+WEAKNESS_SHARE = 0.5 # Part of its interval the weakest fact is due early
+NEW_FACT_TRIES = 10
+
+
+def load_deck(path):
+    '''load_deck(path) -> dict
+    Reads the deck saved in path, or returns an empty deck if path
+    doesn't exist. The deck's 'facts' map each (operation, first,
+    second) to [due, interval, averageTime, attempts, wrongAnswers].
+    '''
+    facts = {}
+    try:
+        with open(path, 'rb') as deckFile:
+            data = deckFile.read()
+    except FileNotFoundError:
+        data = b''
+    for offset in range(0, len(data) - RECORD.size + 1, RECORD.size):
+        (operation, first, second, *fact) = RECORD.unpack_from(data, offset)
+        facts[(operation, first, second)] = fact
+    heap = [(fact_priority(fact), key) for (key, fact) in facts.items()]
+    heapq.heapify(heap)
+    return {'path': path, 'facts': facts, 'heap': heap}
+
+
+def save_deck(deck):
+    '''Writes deck back to the file it came from, replacing it all at
+    once so that a crash can't leave half a file behind.
+    '''
+    with open(deck['path'] + '.tmp', 'wb') as deckFile:
+        deckFile.write(b''.join(RECORD.pack(*key, *fact)
+                                for (key, fact) in deck['facts'].items()))
+    os.replace(deck['path'] + '.tmp', deck['path'])
+
+
+def fact_priority(fact):
+    '''fact_priority(fact) -> float
+    Returns when fact should come up, moved earlier by up to
+    WEAKNESS_SHARE of its interval depending on how often it's been
+    missed and how slowly it's been answered.
+    '''
+    (due, interval, averageTime, attempts, wrongAnswers) = fact
+    weakness = (wrongAnswers / max(attempts, 1)
+                + min(averageTime / FAST_ANSWER, 2)) / 3
+    return due - interval * WEAKNESS_SHARE * weakness
+
+
+def next_fact(deck, currentTime, sample_fact):
+    '''next_fact(deck, currentTime, sample_fact) -> (int, int, int)
+    Returns the next fact to ask, removing it from the heap. If no fact
+    is due, a new one is made with sample_fact() instead; if that keeps
+    finding facts that are already in the deck, the earliest fact is
+    asked.
+    '''
+    heap = deck['heap']
+    if heap and heap[0][0] <= currentTime:
+        return heapq.heappop(heap)[1]
+    for i in range(NEW_FACT_TRIES):
+        key = sample_fact()
+        if key not in deck['facts']:
+            return key
+    if heap:
+        return heapq.heappop(heap)[1]
+    return key
+
+
+def answer_fact(deck, key, correct, responseTime, currentTime):
+    '''Updates the fact key after it was answered and puts it back in
+    the heap. key must have come from next_fact(), so it isn't in the
+    heap already.
+    '''
+    fact = deck['facts'].get(key)
+    if fact is None:
+        fact = [currentTime, 0, responseTime, 0, 0]
+        deck['facts'][key] = fact
+    fact[3] += 1
+    fact[2] += (responseTime - fact[2]) / min(fact[3], 4)
+    if not correct:
+        fact[4] += 1
+        fact[1] = WRONG_INTERVAL
+    elif responseTime <= FAST_ANSWER:
+        fact[1] = max(fact[1] * 2, FIRST_INTERVAL)
+    else:
+        fact[1] = max(fact[1], FIRST_INTERVAL)
+    fact[0] = currentTime + fact[1]
+    heapq.heappush(deck['heap'], (fact_priority(fact), key))
@@ -0,0 +1,278 @@
+# Math Quizzer profiles
+# Part of Math Quizzer. Lets several players share one computer, each
+# with their own scores and settings.
+#
+# The shared profile (named '') uses the files in the current folder,
+# just like before there were profiles. Every other profile keeps the
+# same files in its own folder, MATHQUIZZER-profiles/NAME.
+#
+# A profile's files are only read when it's picked. The last
+# MAX_LOADED_PROFILES profiles that were picked stay loaded, including
+# their score distributions and rollups, so switching back to one of
+# them doesn't read anything again. Older ones are saved and closed.
+# Picking a profile doesn't read its whole MATHQUIZZER-highscores.txt
+# either: the distributions and rollups are enough for everything but
+# the list of attempts in the statistics, so the scores themselves are
+# only read the first time they're needed (see load_scores()).
+#
+# Several games can use the same profile at once (like on a shared
+# network folder in a computer lab). Scores are added to
+# MATHQUIZZER-highscores.txt with a single write in append mode, under
+# an advisory lock where there is one, so lines from different games
+# can't be mixed together. Each game remembers how much of the file it
+# has read and only reads what was added after that, so it sees the
+# other games' scores without reading the whole file again.
+
+import collections
+import os
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+
+import practice
+import rollups
+import scoresketch
+import settings
+import telemetry
+
+HEADER = '# Belongs to the game Math Quizzer.'
+DIRECTORY = 'MATHQUIZZER-profiles'
+MAX_LOADED_PROFILES = 8
+MAX_NAME_LENGTH = 20
+
+
+def clean_name(name):
+    '''clean_name(name) -> str
+    Returns name with everything but letters, digits, spaces, - and _
+    taken out, so it can be used as a folder name.
+    '''
+    name = ''.join([i for i in name if i.isalnum() or i in ' -_'])
+    return name.strip()[:MAX_NAME_LENGTH]
+
+
+def profile_path(name, filename):
+    '''profile_path(name, filename) -> str
+    Returns the path of filename in profile name.
+    '''
+    if name == '':
+        return filename
+    return os.path.join(DIRECTORY, name, filename)
+
+
+def append_line(path, line):
+    '''Adds line to the end of path in one write, so that it can't be
+    mixed up with lines other games are adding at the same time.
+    '''
+    fileDescriptor = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+    try:
+        if fcntl is not None: # For network folders where appends can mix
+            fcntl.lockf(fileDescriptor, fcntl.LOCK_EX)
+        os.write(fileDescriptor, (line + '\n').encode())
+    finally:
+        os.close(fileDescriptor) # Also lets go of the lock
+
+
+def read_new_lines(path, offset):
+    '''read_new_lines(path, offset) -> (list, int)
+    Returns the lines added to path after the first offset bytes, and
+    the offset after them. A line that's still being written is left
+    for next time.
+    '''
+    if os.path.getsize(path) <= offset:
+        return ([], offset)
+    with open(path, 'rb') as storeFile:
+        storeFile.seek(offset)
+        data = storeFile.read()
+    end = data.rfind(b'\n') + 1
+    return (data[:end].decode().split('\n')[:-1], offset + end)
+
+
+def open_store_file(path):
+    '''open_store_file(path) -> int
+    Returns the offset after the last whole line of path (see
+    read_new_lines()), reading only the start and end of it, and making
+    it with the standard header if it doesn't exist. Raises an error if
+    the first line isn't the standard header.
+    '''
+    try:
+        fileDescriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+    except FileExistsError:
+        pass
+    else:
+        os.write(fileDescriptor, (HEADER + '\n').encode())
+        os.close(fileDescriptor)
+    with open(path, 'rb') as storeFile:
+        firstLine = storeFile.readline()
+        offset = storeFile.seek(0, os.SEEK_END)
+        # Go back to the end of the last whole line
+        while offset > 0:
+            start = max(offset - 4096, 0)
+            storeFile.seek(start)
+            chunk = storeFile.read(offset - start)
+            if b'\n' in chunk:
+                offset = start + chunk.rfind(b'\n') + 1
+                break
+            offset = start
+    # The header may not be all there if another game just made the file
+    if not (HEADER + '\n').encode().startswith(firstLine):
+        raise Exception('File ' + path + ' is not formed properly. '
+                        + 'Please rename the file, then try again.')
+    return offset
+
+
+def find_scores(lines):
+    '''find_scores(lines) -> list
+    Turns lines of a MATHQUIZZER-highscores.txt file into a nested list
+    of [timeFinished, difficulty, points].
+    '''
+    return [[int(i) for i in line.split(' ')] for line in lines
+            if line != '' and line != HEADER]
+
+
+def read_scores(path, end):
+    '''read_scores(path, end) -> list
+    Returns the scores in the first end bytes of path (a
+    MATHQUIZZER-highscores.txt file), like find_scores().
+    '''
+    with open(path, 'rb') as storeFile:
+        data = storeFile.read(end)
+    return find_scores(data.decode().split('\n'))
+
+
+def load_profile(name):
+    '''load_profile(name) -> dict
+    Opens every file of profile name and returns the profile, with the
+    same keys as the game's variables for them.
+    '''
+    if name != '':
+        os.makedirs(os.path.join(DIRECTORY, name), exist_ok = True)
+    highscoresPath = profile_path(name, 'MATHQUIZZER-highscores.txt')
+    highscoresOffset = open_store_file(highscoresPath)
+    highScores = None # Read when they're needed (see load_scores())
+
+    # Load the score distributions and the daily and weekly rollups,
+    # making them from the scores if they don't exist yet
+    sketchPath = profile_path(name, 'MATHQUIZZER-sketches.txt')
+    scoreSketches = scoresketch.load_sketches(sketchPath)
+    rollupPath = profile_path(name, 'MATHQUIZZER-rollups.txt')
+    scoreRollups = rollups.load_rollups(rollupPath)
+    if scoreSketches is None or scoreRollups is None:
+        highScores = read_scores(highscoresPath, highscoresOffset)
+    if scoreSketches is None:
+        scoreSketches = scoresketch.build_sketches(highScores)
+        scoresketch.save_sketches(sketchPath, scoreSketches)
+    if scoreRollups is None:
+        scoreRollups = rollups.build_rollups(highScores)
+        rollups.save_rollups(rollupPath, scoreRollups)
+
+    profileSettings = settings.load_settings(
+        profile_path(name, 'MATHQUIZZER-other.txt'))
+
+    # Telemetry is only recorded if it's turned on in
+    # MATHQUIZZER-other.txt
+    if settings.get_setting(profileSettings, 'TelemetryEnabled'):
+        telemetryLog = telemetry.open_log(
+            profile_path(name, 'MATHQUIZZER-telemetry'))
+    else:
+        telemetryLog = None
+
+    return {'name': name,
+            'highscoresPath': highscoresPath,
+            'highscoresOffset': highscoresOffset,
+            'highScores': highScores, # None until load_scores()
+            'scoreSketches': scoreSketches,
+            'scoreRollups': scoreRollups,
+            'settings': profileSettings,
+            'telemetryLog': telemetryLog,
+            'practiceDeck': None} # Loaded the first time practice mode
+                                  # is played
+
+
+def read_new_scores(profile):
+    '''read_new_scores(profile) -> list
+    Adds the scores that were saved to profile since it was last read
+    (by this game or another one) to its scores, score distributions and
+    rollups, and returns them.
+    '''
+    (lines, profile['highscoresOffset']) = read_new_lines(
+        profile['highscoresPath'], profile['highscoresOffset'])
+    newScores = find_scores(lines)
+    for (timeFinished, difficulty, points) in newScores:
+        if profile['highScores'] is not None:
+            profile['highScores'].append([timeFinished, difficulty, points])
+        scoresketch.add_score(
+            profile['scoreSketches'].setdefault(difficulty, {}), points)
+        rollups.add_to_rollups(profile['scoreRollups'], timeFinished,
+                               difficulty, points)
+    return newScores
+
+
+def load_scores(profile):
+    '''load_scores(profile) -> list
+    Returns every score of profile as [timeFinished, difficulty,
+    points], reading them the first time.
+    '''
+    if profile['highScores'] is None:
+        profile['highScores'] = read_scores(profile['highscoresPath'],
+                                            profile['highscoresOffset'])
+    return profile['highScores']
+
+
+def save_score(profile, timeFinished, difficulty, points):
+    '''save_score(profile, timeFinished, difficulty, points)
+        -> (int, int, float)
+    Adds a score to profile and returns (MEDIAN, 90TH PERCENTILE,
+    FRACTION BEATEN) of the scores on difficulty from before it,
+    including ones other games just saved. They're all None if there
+    weren't any.
+    '''
+    read_new_scores(profile)
+    sketch = profile['scoreSketches'].setdefault(difficulty, {})
+    scoreSummary = (scoresketch.sketch_quantile(sketch, 0.5),
+                    scoresketch.sketch_quantile(sketch, 0.9),
+                    scoresketch.sketch_rank(sketch, points))
+    append_line(profile['highscoresPath'],
+                str(timeFinished) + ' ' + str(difficulty) + ' ' + str(points))
+    read_new_scores(profile)
+    scoresketch.save_sketches(
+        profile_path(profile['name'], 'MATHQUIZZER-sketches.txt'),
+        profile['scoreSketches'])
+    rollups.save_rollups(
+        profile_path(profile['name'], 'MATHQUIZZER-rollups.txt'),
+        profile['scoreRollups'])
+    return scoreSummary
+
+
+def close_profile(profile):
+    '''Saves everything in profile that hasn't been saved yet.'''
+    settings.save_settings(profile['settings'])
+    if profile['telemetryLog'] is not None:
+        telemetry.flush_log(profile['telemetryLog'])
+    if profile['practiceDeck'] is not None:
+        practice.save_deck(profile['practiceDeck'])
+
+
+def new_profile_cache():
+    '''new_profile_cache() -> collections.OrderedDict
+    Returns an empty cache of loaded profiles for get_profile(), with
+    the most recently picked profile last.
+    '''
+    return collections.OrderedDict()
+
+
+def get_profile(cache, name):
+    '''get_profile(cache, name) -> dict
+    Returns profile name, loading it if it isn't in cache. If that
+    makes cache too big, the profile picked longest ago is saved and
+    dropped.
+    '''
+    profile = cache.get(name)
+    if profile is not None:
+        cache.move_to_end(name)
+        return profile
+    profile = load_profile(name)
+    cache[name] = profile
+    while len(cache) > MAX_LOADED_PROFILES:
+        close_profile(cache.popitem(last = False)[1])
+    return profile
@@ -0,0 +1,476 @@
+# Math Quizzer questions
+# Part of Math Quizzer. Makes the questions for every difficulty. This
+# doesn't use turtle, so it can also be used by tools that don't open a
+# window.
+
+import math
+import random
+
+# DATA:
+#
+# 3;3-7;3-10;r
+# 3;            Weight (how often this operator is picked)
+#   3-7;        First number range
+#       3-10;   Second number range
+#            r  Random order
+#
+# 2;6-15;3-10;g1
+# 2;              Weight
+#   6-15;         First number range
+#        3-10;    Second number range
+#             g1  First number is always greater than second number
+#
+# 2;10-25;3-6;w1
+# 2;              Weight
+#   10-25;        First number range
+#         3-6;    Second number range
+#             w1  Change w1 to nearest integer to make sure result is an
+#                   integer
+#
+# The four operations are +, −, × and ÷, in that order. g2 (second
+# number is always greater than first number) also exists.
+#
+# Every pair of numbers an operation allows is equally likely. For g1,
+# g2 and w1, an alias table (see make_alias_table()) picks one of the
+# numbers, weighted by how many numbers it can be paired with, and the
+# other number is picked evenly from those, so nothing is ever retried.
+
+difficultyData = (None,
+                  ['3;3-7;3-10;r', '2;6-15;3-10;g1', # Easy
+                   '0;0-0;0-0;', '0;0-0;0-0;'],
+                  ['2;5-11;5-13;r', '3;10-20;5-15;g1', # Medium
+                   '3;2-8;4-10;r', '0;0-0;0-0;'],
+                  ['3;7-18;10-25;r', '3;20-35;8-28;g1', # Hard
+                   '6;3-10;7-12;r', '2;10-25;3-6;w1'],
+                  ['2;10-25;15-40;r', '2;25-55;12-40;g1', # Harder
+                   '5;4-12;8-16;r', '2;18-50;5-9;w1'],
+                  ['2;17-40;25-75;r', '2;30-85;15-60;g1', # Insane
+                   '7;5-15;10-20;r', '3;30-90;7-12;w1'],
+                  ['2;30-100;50-150;r', '2;100-200;50-125;g1', # AAAAAAA
+                   '7;8-20;15-25;r', '4;60-175;9-16;w1'],
+                  ['4;7-18;10-25;r', '4;20-35;8-28;g1', # Timed
+                   '7;3-10;7-12;r', '3;15-45;3-9;w1'])
+
+PARAMETERS = ('', 'r', 'g1', 'g2', 'w1')
+
+# EXPRESSIONS:
+#
+# Harder difficulties sometimes ask for a longer expression, like
+# (a + b) × c or a × b − c ÷ d. The expression starts as one operation
+# picked as usual, then some of its numbers are replaced by smaller
+# expressions with the same value, so the answer stays in the usual
+# range and always comes out whole without anything being retried.
+# Every part of the expression keeps its value, so wrong answers like
+# grouping the numbers the wrong way don't need the expression to be
+# worked out again.
+#
+# For each difficulty in difficultyData: (CHANCE, STEPS), where CHANCE
+# is how often a question is an expression and STEPS is how many
+# numbers are replaced.
+
+EXPRESSION_LEVELS = (None, (0, 0), (0, 0), (0, 0), (0.2, 1), (0.3, 1),
+                     (0.4, 2), (0.25, 1))
+PRECEDENCE = (1, 1, 2, 2)
+
+
+def make_alias_table(weights):
+    '''make_alias_table(weights) -> (int, list, list)
+    Returns an alias table for picking index i with a probability of
+    weights[i] / sum(weights), where the weights are whole numbers. The
+    table is (TOTAL WEIGHT, PROBABILITIES, ALIASES): each index gets a
+    column TOTAL WEIGHT high, where the bottom PROBABILITIES[i] of it
+    picks i and the rest picks ALIASES[i].
+    '''
+    numWeights = len(weights)
+    totalWeight = sum(weights)
+    heights = [weight * numWeights for weight in weights]
+    probabilities = [totalWeight] * numWeights
+    aliases = list(range(numWeights))
+    small = [i for i in range(numWeights) if heights[i] < totalWeight]
+    large = [i for i in range(numWeights) if heights[i] >= totalWeight]
+    while small and large:
+        smallIndex = small.pop()
+        largeIndex = large[-1]
+        probabilities[smallIndex] = heights[smallIndex]
+        aliases[smallIndex] = largeIndex
+        heights[largeIndex] -= totalWeight - heights[smallIndex]
+        if heights[largeIndex] < totalWeight:
+            small.append(large.pop())
+    return (totalWeight, probabilities, aliases)
+
+
+def sample_alias(table):
+    '''sample_alias(table) -> int
+    Picks an index from table (from make_alias_table()).
+    '''
+    (totalWeight, probabilities, aliases) = table
+    index = random.randrange(len(probabilities))
+    if random.randrange(totalWeight) < probabilities[index]:
+        return index
+    return aliases[index]
+
+
+def pair_counts(firstLow, firstHigh, secondLow, secondHigh, parameter):
+    '''pair_counts(firstLow, firstHigh, secondLow, secondHigh,
+                   parameter) -> list
+    Returns how many numbers can be paired with each number picked by
+    the alias table for parameter: the first number for g1, or the
+    second number for g2 and w1.
+    '''
+    if parameter == 'g1':
+        return [max(min(secondHigh, first - 1) - secondLow + 1, 0)
+                for first in range(firstLow, firstHigh + 1)]
+    elif parameter == 'g2':
+        return [max(min(firstHigh, second - 1) - firstLow + 1, 0)
+                for second in range(secondLow, secondHigh + 1)]
+    elif parameter == 'w1':
+        return [firstHigh // second - (firstLow - 1) // second
+                for second in range(secondLow, secondHigh + 1)]
+    return None
+
+
+def parse_operation(text):
+    '''parse_operation(text) -> (int, int, int, int, int, str)
+    Turns one operation written like '3;3-7;3-10;r' into (WEIGHT, FIRST
+    LOW, FIRST HIGH, SECOND LOW, SECOND HIGH, PARAMETER).
+    '''
+    parts = text.split(';')
+    if len(parts) != 4:
+        raise ValueError(repr(text) + ' should have 4 parts separated by '
+                         + 'semicolons.')
+    try:
+        weight = int(parts[0])
+        (firstLow, firstHigh) = [int(i) for i in parts[1].split('-')]
+        (secondLow, secondHigh) = [int(i) for i in parts[2].split('-')]
+    except ValueError:
+        raise ValueError(repr(text) + ' should look like '
+                         + "'WEIGHT;LOW-HIGH;LOW-HIGH;PARAMETER'.") from None
+    return (weight, firstLow, firstHigh, secondLow, secondHigh, parts[3])
+
+
+def compile_difficulty(data):
+    '''compile_difficulty(data) -> (list, list)
+    Checks the four operations in data (each either a string like
+    '3;3-7;3-10;r' or a tuple from parse_operation()) and returns them
+    in the form make_question() uses: (OPERATION ALIAS TABLE,
+    OPERATIONS), where each operation is the tuple from
+    parse_operation() plus the alias table for its numbers (or None).
+    Raises ValueError if data can't make questions.
+    '''
+    if len(data) != 4:
+        raise ValueError('There should be 4 operations (+, −, × and ÷), '
+                         + 'not ' + str(len(data)) + '.')
+    operations = []
+    for (operation, text) in enumerate(data):
+        if isinstance(text, str):
+            parsed = parse_operation(text)
+        else:
+            parsed = tuple(text)
+        (weight, firstLow, firstHigh, secondLow, secondHigh,
+         parameter) = parsed
+        name = '+−×÷'[operation]
+        if weight < 0:
+            raise ValueError('The weight of ' + name + " can't be negative.")
+        if parameter not in PARAMETERS:
+            raise ValueError("I don't know the parameter " + parameter
+                             + ' yet, sorry.')
+        if weight > 0:
+            if firstLow > firstHigh or secondLow > secondHigh:
+                raise ValueError('A range of ' + name + ' goes backwards.')
+            if operation == 3 and parameter != 'w1':
+                raise ValueError('÷ needs the w1 parameter, so that the '
+                                 + 'answers are whole numbers.')
+            if parameter == 'w1' and (firstLow < 1 or secondLow < 1):
+                raise ValueError('With w1, both ranges of ' + name
+                                 + ' need to be above 0.')
+            counts = pair_counts(firstLow, firstHigh, secondLow, secondHigh,
+                                 parameter)
+            if counts is not None and sum(counts) == 0:
+                raise ValueError('No pair of numbers in the ranges of '
+                                 + name + ' works with ' + parameter + '.')
+        if weight > 0 and counts is not None:
+            operations.append(parsed + (make_alias_table(counts),))
+        else:
+            operations.append(parsed + (None,))
+    if sum(operation[0] for operation in operations) == 0:
+        raise ValueError('At least one operation needs a weight above 0.')
+    return (make_alias_table([operation[0] for operation in operations]),
+            operations)
+
+
+def calculate(first, operation, second):
+    '''calculate(first, operation, second) -> float OR int
+    Calculates first operation second, according to the following table:
+    0: +      1: -      2: *      3: /'''
+    if operation == 0:
+        return first + second
+    elif operation == 1:
+        return first - second
+    elif operation == 2:
+        return first * second
+    return first / second
+
+
+def pick_operands(data):
+    '''pick_operands(data) -> (int, int, int)
+    Picks an operation and two numbers based off of data (from
+    compile_difficulty()), in the format (OPERATION, FIRST NUMBER,
+    SECOND NUMBER), where OPERATION is the same as in calculate().
+    '''
+    # Get the operation
+    (operationTable, operations) = data
+    pickedOperation = sample_alias(operationTable)
+
+    # Generate the numbers according to the parameters
+    (weight, firstLow, firstHigh, secondLow, secondHigh, parameter,
+     numberTable) = operations[pickedOperation]
+    if parameter == 'g1':
+        firstNumber = firstLow + sample_alias(numberTable)
+        secondNumber = random.randrange(secondLow,
+                                        min(secondHigh, firstNumber - 1) + 1)
+    elif parameter == 'g2':
+        secondNumber = secondLow + sample_alias(numberTable)
+        firstNumber = random.randrange(firstLow,
+                                       min(firstHigh, secondNumber - 1) + 1)
+    elif parameter == 'w1':
+        secondNumber = secondLow + sample_alias(numberTable)
+        firstNumber = secondNumber * random.randrange(
+            (firstLow - 1) // secondNumber + 1, firstHigh // secondNumber + 1)
+    else:
+        firstNumber = random.randrange(firstLow, firstHigh + 1)
+        secondNumber = random.randrange(secondLow, secondHigh + 1)
+        if parameter == 'r':
+            (firstNumber, secondNumber) = (secondNumber, firstNumber)
+    return (pickedOperation, firstNumber, secondNumber)
+
+
+def make_question(data, typed = False):
+    '''make_question(data, typed = False) -> (str, int, int, int, int,
+                                              str, int, int, int, int)
+    Makes a Math Quizzer question based off of data (from
+    compile_difficulty()). The tuple is in the format (PROMPT, POSSIBLE
+    ANSWERS, CORRECT LETTER, CORRECT NUMBER, FIRST NUMBER, OPERATION,
+    SECOND NUMBER), where POSSIBLE ANSWERS takes up four elements and
+    OPERATION is the same as in calculate(). If typed is True (for
+    AAAAAAA), the answer is typed in, so there's only one possible
+    answer.
+    '''
+    return build_question(*pick_operands(data), typed)
+
+
+def build_question(pickedOperation, firstNumber, secondNumber,
+                   typed = False):
+    '''build_question(pickedOperation, firstNumber, secondNumber,
+                      typed = False)
+        -> (str, int, int, int, int, str, int, int, int, int)
+    Makes a Math Quizzer question asking for firstNumber pickedOperation
+    secondNumber, in the same format as make_question().
+    '''
+    operation = pickedOperation
+    pickedOperationStr = '+−×÷'[operation]
+    if typed:
+        prompt = ('What is ' + str(firstNumber) + ' ' + pickedOperationStr
+                  + ' ' + str(secondNumber) + '?')
+        trueAnswer = calculate(firstNumber, pickedOperation, secondNumber)
+        potentialAnswers = [trueAnswer, None, None, None]
+        answerLetter = 'A'
+
+    else: # Generate the question and possible answers (and true answer)
+        prompt = ('What is ' + str(firstNumber) + ' ' + pickedOperationStr + ' '
+                  + str(secondNumber) + '?')
+        trueAnswer = calculate(firstNumber, pickedOperation, secondNumber)
+        wrongAnswers = ([trueAnswer + i for i in (-10, -5, -3, -2, -1,
+                                                  1, 2, 3, 5, 10)
+                         if abs(i) <= 1.5 * (trueAnswer + 0.5) ** (1 / 3) + 1]
+                        + [round(trueAnswer * random.uniform(0.75, 1.25))])
+        if operation == 0:
+            wrongAnswers.extend([abs(firstNumber - secondNumber)])
+        elif operation == 1:
+            wrongAnswers.extend([firstNumber + secondNumber])
+        elif operation == 2:
+            wrongAnswers.extend([trueAnswer - firstNumber,
+                                 trueAnswer + firstNumber,
+                                 trueAnswer - secondNumber,
+                                 trueAnswer + secondNumber])
+        elif operation == 3:
+            wrongAnswers.extend([int(firstNumber / i)
+                                 for i in [secondNumber + 1, secondNumber - 1]
+                                 if i != 0 and firstNumber % i == 0])
+        wrongAnswers = list(set([int(i) for i in wrongAnswers
+                                 if i != trueAnswer]))
+        random.shuffle(wrongAnswers)
+        potentialAnswers = wrongAnswers[:3] + [int(trueAnswer)]
+        random.shuffle(potentialAnswers)
+        answerLetter = 'ABCD'[potentialAnswers.index(trueAnswer)]
+
+    return (prompt, *potentialAnswers, answerLetter, int(trueAnswer),
+            firstNumber, pickedOperation, secondNumber)
+
+
+def expand_number(data, value):
+    '''expand_number(data, value) -> tuple
+    Returns an expression equal to value, using an operation picked from
+    data (from compile_difficulty()) if value allows it, or − if not.
+    Expressions are (VALUE,) for numbers and (VALUE, OPERATION, LEFT,
+    RIGHT) for operations, where OPERATION is the same as in
+    calculate().
+    '''
+    (operationTable, operations) = data
+    operation = sample_alias(operationTable)
+    if operation == 0 and value >= 2:
+        first = random.randrange(1, value)
+        return (value, 0, (first,), (value - first,))
+    elif operation == 2:
+        divisors = [i for i in range(2, math.isqrt(abs(value)) + 1)
+                    if value % i == 0]
+        if divisors:
+            factors = [random.choice(divisors)]
+            factors.insert(random.randrange(2), value // factors[0])
+            return (value, 2, (factors[0],), (factors[1],))
+    elif operation == 3:
+        (weight, firstLow, firstHigh, secondLow, secondHigh, parameter,
+         numberTable) = operations[3]
+        second = random.randrange(max(secondLow, 2), max(secondHigh, 2) + 1)
+        return (value, 3, (value * second,), (second,))
+    second = random.randrange(1, max(value, 4) + 1)
+    return (value, 1, (value + second,), (second,))
+
+
+def expand_random_number(data, expression):
+    '''expand_random_number(data, expression) -> tuple
+    Returns expression with one of its numbers replaced by an expression
+    from expand_number().
+    '''
+    if len(expression) == 1:
+        return expand_number(data, expression[0])
+    (value, operation, left, right) = expression
+    if random.randrange(2):
+        return (value, operation, expand_random_number(data, left), right)
+    return (value, operation, left, expand_random_number(data, right))
+
+
+def format_expression(expression):
+    '''format_expression(expression) -> str
+    Writes expression out with −, × and ÷, only using parentheses where
+    the order of operations needs them.
+    '''
+    if len(expression) == 1:
+        return str(expression[0])
+    (value, operation, left, right) = expression
+    leftText = format_expression(left)
+    if len(left) > 1 and PRECEDENCE[left[1]] < PRECEDENCE[operation]:
+        leftText = '(' + leftText + ')'
+    rightText = format_expression(right)
+    if len(right) > 1 and (PRECEDENCE[right[1]] < PRECEDENCE[operation]
+                           or (PRECEDENCE[right[1]] == PRECEDENCE[operation]
+                               and operation in (1, 3))):
+        rightText = '(' + rightText + ')'
+    return leftText + ' ' + '+−×÷'[operation] + ' ' + rightText
+
+
+def misread_calculate(first, operation, second):
+    '''misread_calculate(first, operation, second) -> float OR int
+                                                       OR None
+    Same as calculate(), but returns None instead of dividing by 0.
+    '''
+    if operation == 3 and second == 0:
+        return None
+    return calculate(first, operation, second)
+
+
+def misread_values(expression):
+    '''misread_values(expression) -> list
+    Returns the values expression has if one of its operations is
+    grouped with the wrong numbers, like a × b + c for a × (b + c).
+    '''
+    if len(expression) == 1:
+        return []
+    (value, operation, left, right) = expression
+    values = ([misread_calculate(i, operation, right[0])
+               for i in misread_values(left)]
+              + [misread_calculate(left[0], operation, i)
+                 for i in misread_values(right)])
+    if len(left) > 1: # (a ∘ b) op c read as a ∘ (b op c)
+        regrouped = misread_calculate(left[3][0], operation, right[0])
+        if regrouped is not None:
+            values.append(misread_calculate(left[2][0], left[1], regrouped))
+    if len(right) > 1: # a op (b ∘ c) read as (a op b) ∘ c
+        regrouped = misread_calculate(left[0], operation, right[2][0])
+        if regrouped is not None:
+            values.append(misread_calculate(regrouped, right[1], right[3][0]))
+    return [i for i in values if i is not None]
+
+
+def make_expression_question(data, steps, typed = False):
+    '''make_expression_question(data, steps, typed = False)
+        -> (str, int, int, int, int, str, int, int, int, int)
+    Makes a Math Quizzer question asking for an expression with steps
+    more operations than usual, in the same format as make_question().
+    FIRST NUMBER, OPERATION and SECOND NUMBER are for the last operation
+    worked out, so FIRST NUMBER and SECOND NUMBER are the values of the
+    two sides.
+    '''
+    (operation, firstNumber, secondNumber) = pick_operands(data)
+    trueAnswer = int(calculate(firstNumber, operation, secondNumber))
+    expression = (trueAnswer, operation, (firstNumber,), (secondNumber,))
+    for step in range(steps):
+        expression = expand_random_number(data, expression)
+    prompt = 'What is ' + format_expression(expression) + '?'
+    if typed:
+        potentialAnswers = [trueAnswer, None, None, None]
+        answerLetter = 'A'
+
+    else: # Wrong answers from misreading the expression come first
+        misreadAnswers = misread_values(expression) + [
+            misread_calculate(firstNumber, i, secondNumber) for i in range(4)
+            if i != operation]
+        misreadAnswers = list(set([int(i) for i in misreadAnswers
+                                   if i is not None and i % 1 == 0
+                                   and i != trueAnswer]))
+        random.shuffle(misreadAnswers)
+        misreadAnswers = misreadAnswers[:2]
+        nearAnswers = [trueAnswer + i for i in (-10, -5, -3, -2, -1,
+                                                1, 2, 3, 5, 10)
+                       if abs(i) <= 1.5 * (abs(trueAnswer) + 0.5) ** (1 / 3)
+                                    + 1
+                       and trueAnswer + i not in misreadAnswers]
+        random.shuffle(nearAnswers)
+        potentialAnswers = misreadAnswers + nearAnswers
+        offset = 1
+        while len(potentialAnswers) < 3: # Too few, so pad with any others
+            potentialAnswers += [trueAnswer + i for i in (offset, -offset)
+                                 if trueAnswer + i not in potentialAnswers]
+            offset += 1
+        potentialAnswers = potentialAnswers[:3] + [trueAnswer]
+        random.shuffle(potentialAnswers)
+        answerLetter = 'ABCD'[potentialAnswers.index(trueAnswer)]
+
+    return (prompt, *potentialAnswers, answerLetter, trueAnswer,
+            expression[2][0], operation, expression[3][0])
+
+
+def type_key(answerInProgress, key):
+    '''type_key(answerInProgress, key) -> (str, str)
+    Returns (ANSWER IN PROGRESS, MESSAGE) after key (a digit, 'Delete',
+    'Clear', or 'Go') is pressed on the keypad for typed answers. After
+    'Go', the answer should be checked if it isn't blank.
+    '''
+    if len(key) == 1: # Digit
+        if len(answerInProgress) == 20:
+            return (answerInProgress,
+                    "The answer's obviously smaller than that.")
+        elif answerInProgress == '0':
+            return (key, '')
+        return (answerInProgress + key, '')
+    elif key == 'Delete':
+        return (answerInProgress[:-1], '')
+    elif key == 'Clear':
+        return ('0', '')
+    elif answerInProgress == '': # Tried to enter a blank answer
+        return (answerInProgress, 'Please enter a number.')
+    return (answerInProgress, '')
+
+
+compiledDifficultyData = tuple(None if data is None
+                               else compile_difficulty(data)
+                               for data in difficultyData)
@@ -0,0 +1,204 @@
+# Math Quizzer recordings
+# Part of Math Quizzer. Records every game (except practice, whose
+# questions depend on the practice deck) so that its score can be
+# checked later by playing it again (see verify.py).
+#
+# Each game starts by seeding random with the game's seed, so the same
+# seed always makes the same questions. A recording is saved in the
+# player's MATHQUIZZER-games folder (see profiles.py) when the game ends:
+#
+# # Belongs to the game Math Quizzer.
+# seed 1792422660666612000      Seed the questions were made with
+# difficulty 3                  Difficulty played
+# bank 0                        1 if the questions came from a bank
+# spec 0f1e2d3c4b5a6978         Fingerprint of the difficulty's numbers
+#                                 (see banks.spec_fingerprint())
+# rule 1 0 0.5 ceil             Scoring rule the game was played with
+#                                 (see scoring.py)
+# points 12                     Points the game ended with
+# answer 2.5 1.75 B             Seconds since the game started, seconds
+#                                 spent on the question, and the answer
+#                                 (a letter, a typed number, or - if
+#                                 time ran out)
+#
+# Recordings from before the scoring rules could be changed have no
+# rule line, and are scored with the usual rules.
+
+import os
+import random
+
+import banks
+import questions
+import scoring
+
+HEADER = '# Belongs to the game Math Quizzer.'
+DIRECTORY = 'MATHQUIZZER-games'
+TIME_TOLERANCE = 0.5 # Seconds an answer may come after time runs out
+                     # (the game checks once per frame)
+
+# The same as the difficulty buttons in mathquizzer.py: the time limit
+# of each difficulty, and which numbers in questions.difficultyData it
+# uses
+TIME_LIMITS = (None, 10, 10, 10, 8, 8, 8, 30, 60, 120)
+LEVELS = (None, 1, 2, 3, 4, 5, 6, 7, 7, 7)
+
+
+def make_game_question(spec, expressionLevel, typed, bankCursor):
+    '''make_game_question(spec, expressionLevel, typed, bankCursor)
+        -> (str, int, int, int, int, str, int, int, int, int)
+    Makes the next question of a game, in the same format as
+    questions.make_question(). The game and verify.py both use this, so
+    that the same seed makes the same questions.
+    '''
+    if random.random() < expressionLevel[0]:
+        return questions.make_expression_question(spec, expressionLevel[1],
+                                                  typed)
+    elif bankCursor is not None:
+        return banks.next_question(bankCursor, typed)
+    return questions.make_question(spec, typed)
+
+
+def new_recording(seed, difficulty, spec, usesBank, timeStarted):
+    '''new_recording(seed, difficulty, spec, usesBank, timeStarted)
+        -> dict
+    Returns an empty recording of a game started at timeStarted, with
+    questions made from spec (a compiled difficulty) and scored with the
+    rules in use.
+    '''
+    return {'seed': seed, 'difficulty': difficulty,
+            'spec': banks.spec_fingerprint(spec).hex(), 'bank': usesBank,
+            'rule': scoring.rules[difficulty],
+            'timeStarted': timeStarted, 'answers': []}
+
+
+def record_answer(recording, currentTime, timeOnQuestion, answer):
+    '''Adds an answer (a letter, a typed number, or None if time ran
+    out) to recording.
+    '''
+    recording['answers'].append((currentTime - recording['timeStarted'],
+                                 timeOnQuestion,
+                                 '-' if answer is None else str(answer)))
+
+
+def save_recording(recording, points, directory = DIRECTORY):
+    '''save_recording(recording, points, directory = DIRECTORY) -> str
+    Saves recording, which ended with points, in directory and returns
+    its path.
+    '''
+    os.makedirs(directory, exist_ok = True)
+    path = os.path.join(directory, str(recording['seed']) + '.txt')
+    lines = [HEADER,
+             'seed ' + str(recording['seed']),
+             'difficulty ' + str(recording['difficulty']),
+             'bank ' + str(int(recording['bank'])),
+             'spec ' + recording['spec'],
+             'rule ' + scoring.format_rule(recording['rule']),
+             'points ' + str(points)]
+    lines += ['answer ' + repr(elapsed) + ' ' + repr(timeOnQuestion) + ' '
+              + answer for (elapsed, timeOnQuestion, answer)
+              in recording['answers']]
+    with open(path + '.tmp', 'w') as recordingFile:
+        recordingFile.write('\n'.join(lines) + '\n')
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def read_recording(text):
+    '''read_recording(text) -> dict
+    Reads a recording saved by save_recording(). Raises ValueError if
+    it isn't formed properly.
+    '''
+    lines = text.split('\n')
+    if lines[0] != HEADER:
+        raise ValueError('not a Math Quizzer recording')
+    recording = {'answers': []}
+    try:
+        for line in lines[1:]:
+            if line == '':
+                continue
+            (key, value) = line.split(' ', 1)
+            if key == 'answer':
+                (elapsed, timeOnQuestion, answer) = value.split(' ')
+                recording['answers'].append((float(elapsed),
+                                             float(timeOnQuestion), answer))
+            elif key == 'spec':
+                recording['spec'] = value
+            elif key == 'rule':
+                recording['rule'] = scoring.read_rule_text(value)
+            elif key in ('seed', 'difficulty', 'bank', 'points'):
+                recording[key] = int(value)
+    except ValueError as error:
+        raise ValueError('recording is not formed properly (' + str(error)
+                         + ')') from None
+    for key in ('seed', 'difficulty', 'bank', 'spec', 'points'):
+        if key not in recording:
+            raise ValueError('recording has no ' + key)
+    if 'rule' not in recording and 1 <= recording['difficulty'] < len(
+        scoring.RULES):
+        recording['rule'] = scoring.RULES[recording['difficulty']]
+    return recording
+
+
+def replay_recording(recording, specs):
+    '''replay_recording(recording, specs) -> (int, str OR None)
+    Plays recording again with specs (every compiled difficulty, like
+    questions.compiledDifficultyData), scoring it with the rule it was
+    played with, and returns (POINTS, PROBLEM),
+    where PROBLEM says what's wrong with the recording, or is None if
+    nothing is.
+    '''
+    difficulty = recording['difficulty']
+    if not 1 <= difficulty < len(LEVELS):
+        return (0, 'difficulty ' + str(difficulty) + " can't be replayed")
+    level = LEVELS[difficulty]
+    totalTime = TIME_LIMITS[difficulty]
+    timed = difficulty >= 7
+    spec = specs[level]
+    if recording['spec'] != banks.spec_fingerprint(spec).hex():
+        return (0, 'was played with different numbers')
+    bankCursor = None
+    if recording['bank']:
+        bankCursor = banks.open_level_cursor(level, spec, recording['seed'])
+        if bankCursor is None:
+            return (0, 'needs ' + banks.bank_path(level)
+                       + ' with the same numbers')
+
+    random.seed(recording['seed'])
+    expressionLevel = questions.EXPRESSION_LEVELS[level]
+    points = 0
+    streak = 0
+    lastElapsed = 0
+    for (number, (elapsed, timeOnQuestion, answer)) in enumerate(
+        recording['answers']):
+        question = make_game_question(spec, expressionLevel,
+                                      difficulty == 6, bankCursor)
+        if (timeOnQuestion < 0 or elapsed < lastElapsed
+            or timeOnQuestion > elapsed - lastElapsed + 0.01):
+            return (points, 'answer ' + str(number + 1)
+                            + ' has impossible times')
+        lastElapsed = elapsed
+        timeUsed = elapsed if timed else timeOnQuestion
+        if answer == '-':
+            if timeUsed < totalTime:
+                return (points, 'answer ' + str(number + 1)
+                                + ' ran out of time too early')
+            ended = True
+        elif timeUsed > totalTime + TIME_TOLERANCE:
+            return (points, 'answer ' + str(number + 1)
+                            + ' came after time ran out')
+        elif (answer == str(question[6]) if difficulty == 6
+              else answer == question[5]):
+            (pointsGained, streak) = scoring.score_answer(
+                difficulty, streak, timeOnQuestion, recording['rule'])
+            points += pointsGained
+            ended = False
+        else:
+            ended = True
+        if ended and number != len(recording['answers']) - 1:
+            return (points, 'answers continue after the game ended')
+    if not recording['answers'] or not ended:
+        return (points, "the game doesn't end")
+    if points != recording['points']:
+        return (points, 'claims ' + str(recording['points'])
+                        + ' points, but scores ' + str(points))
+    return (points, None)
@@ -0,0 +1,213 @@
+# Math Quizzer rescore
+# Part of Math Quizzer. Scores every recorded game (see recordings.py)
+# again with a new set of scoring rules (see scoring.py) and compares
+# the leaderboards, the best games on each difficulty, with the ones the
+# rules in use give, so that new rules can be checked before switching.
+#
+# Needs NumPy. A game ends at its first wrong answer (or when time runs
+# out), so every answer before the last one was correct, and the points
+# only depend on how long each of them took. The streak after every
+# answer of every game is worked out once, all at once, and then
+# scoring them with a set of rules is one lookup per answer in its table
+# (see scoring.compile_rules()). Games aren't checked, so run verify.py
+# first.
+#
+# Usage:
+#   python rescore.py RULES_FILE [DIRECTORY ...] [--top N]
+# The rules in RULES_FILE (a scoring file, like MATHQUIZZER-scoring.toml)
+# are compared with the rules in the current folder (or the usual ones
+# if there aren't any). With no directories, the MATHQUIZZER-games
+# folders of every profile are used. The top N games (10 by default) of
+# each leaderboard are shown.
+
+import os
+import sys
+import time
+
+import numpy
+
+import profiles
+import recordings
+import scoring
+import verify
+
+DIFFICULTY_NAMES = (None, 'Easy', 'Normal', 'Hard', 'Harder', 'Insane',
+                    'AAAAAAA', '30 seconds', '1 minute', '2 minutes')
+
+
+def find_game_directories():
+    '''find_game_directories() -> list
+    Returns the MATHQUIZZER-games folder of every profile that has one.
+    '''
+    directories = [recordings.DIRECTORY]
+    if os.path.isdir(profiles.DIRECTORY):
+        directories += [os.path.join(profiles.DIRECTORY, name,
+                                     recordings.DIRECTORY)
+                        for name in sorted(os.listdir(profiles.DIRECTORY))]
+    return [directory for directory in directories
+            if os.path.isdir(directory)]
+
+
+def player_name(directory):
+    '''player_name(directory) -> str
+    Returns the name of the profile whose games are in directory.
+    '''
+    profileFolder = os.path.dirname(os.path.abspath(directory))
+    if os.path.basename(os.path.dirname(profileFolder)) == profiles.DIRECTORY:
+        return os.path.basename(profileFolder)
+    return 'Shared'
+
+
+def load_games(directories):
+    '''load_games(directories) -> dict
+    Reads every recording in directories and returns their games:
+    'players', 'seeds', 'difficulties', 'rules' (the scoring rule it was
+    played with) and 'claimed' (the points it was saved with) for each
+    game, and 'times' (seconds taken) and 'games' (which game it's from)
+    for each correct answer.
+    '''
+    games = {'players': [], 'seeds': [], 'difficulties': [], 'rules': [],
+             'claimed': []}
+    times = []
+    gameNumbers = []
+    for directory in directories:
+        player = player_name(directory)
+        for path in verify.find_recordings([directory]):
+            try:
+                with open(path) as recordingFile:
+                    recording = recordings.read_recording(recordingFile.read())
+            except (OSError, UnicodeDecodeError, ValueError):
+                continue
+            if not 1 <= recording['difficulty'] < len(DIFFICULTY_NAMES):
+                continue
+            gameNumber = len(games['seeds'])
+            for (elapsed, timeOnQuestion, answer) in \
+                recording['answers'][:-1]: # The last one ended the game
+                times.append(timeOnQuestion)
+                gameNumbers.append(gameNumber)
+            games['players'].append(player)
+            games['seeds'].append(recording['seed'])
+            games['difficulties'].append(recording['difficulty'])
+            games['rules'].append(recording['rule'])
+            games['claimed'].append(recording['points'])
+    games['difficulties'] = numpy.array(games['difficulties'], numpy.int64)
+    games['claimed'] = numpy.array(games['claimed'], numpy.int64)
+    games['times'] = numpy.array(times, numpy.float64)
+    games['games'] = numpy.array(gameNumbers, numpy.int64)
+    return games
+
+
+def find_streaks(games):
+    '''find_streaks(games) -> (numpy.ndarray, numpy.ndarray)
+    Returns (FAST, STREAKS) for every correct answer in games (from
+    load_games()): whether it grew the streak, and the streak after it
+    (0 if it didn't).
+    '''
+    fast = games['times'] <= scoring.STREAK_TIME
+    index = numpy.arange(len(fast))
+    firstAnswers = numpy.ones(len(fast), bool)
+    firstAnswers[1:] = games['games'][1:] != games['games'][:-1]
+    # The streak counts the answers since the last slow answer, or since
+    # just before the game's first answer, whichever is later
+    resets = numpy.where(~fast, index,
+                         numpy.where(firstAnswers, index - 1, -1))
+    lastReset = numpy.maximum.accumulate(resets) if len(resets) else resets
+    return (fast, numpy.where(fast, index - lastReset, 0))
+
+
+def score_games(games, fast, streaks, rules):
+    '''score_games(games, fast, streaks, rules) -> numpy.ndarray
+    Returns the points of every game in games (from load_games()) with
+    rules, given the streaks from find_streaks().
+    '''
+    size = int(streaks.max()) + 1 if len(streaks) else 1
+    tables = numpy.array([[0] * size]
+                         + list(scoring.compile_rules(rules, size)[1:]))
+    points = numpy.where(
+        fast, tables[games['difficulties'][games['games']], streaks], 1)
+    return numpy.bincount(games['games'], weights = points,
+                          minlength = len(games['seeds'])).astype(numpy.int64)
+
+
+def ranks(points):
+    '''ranks(points) -> numpy.ndarray
+    Returns the place of each of points on their leaderboard, where tied
+    points share a place.
+    '''
+    ordered = numpy.sort(points)[::-1]
+    return numpy.searchsorted(-ordered, -points, side = 'left') + 1
+
+
+def print_report(games, oldPoints, newPoints, top):
+    '''Prints each difficulty's leaderboard with oldPoints and
+    newPoints (one for each game in games), showing its top games.
+    '''
+    for difficulty in range(1, len(DIFFICULTY_NAMES)):
+        chosen = numpy.flatnonzero(games['difficulties'] == difficulty)
+        if len(chosen) == 0:
+            continue
+        (old, new) = (oldPoints[chosen], newPoints[chosen])
+        (oldRanks, newRanks) = (ranks(old), ranks(new))
+        change = (new.mean() - old.mean()) / max(old.mean(), 1)
+        print(DIFFICULTY_NAMES[difficulty] + ': ' + str(len(chosen))
+              + ' games, mean ' + format(old.mean(), '.1f') + ' -> '
+              + format(new.mean(), '.1f') + ' points ('
+              + format(change, '+.1%') + '), '
+              + str(int(numpy.count_nonzero(oldRanks != newRanks)))
+              + ' changed places')
+        print('Place'.rjust(7) + '  ' + 'Player'.ljust(22) + 'Old'.rjust(7)
+              + 'New'.rjust(7) + 'Was'.rjust(7))
+        for i in numpy.lexsort((-old, -new))[:top]:
+            print(str(newRanks[i]).rjust(7) + '  '
+                  + games['players'][chosen[i]][:20].ljust(22)
+                  + str(old[i]).rjust(7) + str(new[i]).rjust(7)
+                  + str(oldRanks[i]).rjust(7))
+        print()
+
+
+if __name__ == '__main__':
+    arguments = sys.argv[1:]
+    top = 10
+    if '--top' in arguments:
+        index = arguments.index('--top')
+        top = int(arguments[index + 1])
+        del arguments[index:index + 2]
+    if not arguments:
+        sys.exit('Usage: python rescore.py RULES_FILE [DIRECTORY ...] '
+                 + '[--top N]')
+    try:
+        oldRules = scoring.load_custom_rules()
+        newRules = scoring.load_rules(arguments[0])
+    except ValueError as error:
+        sys.exit(str(error))
+
+    timeStarted = time.perf_counter()
+    games = load_games(arguments[1:] or find_game_directories())
+    if not games['seeds']:
+        sys.exit('No recorded games found.')
+    loadTime = time.perf_counter() - timeStarted
+    timeStarted = time.perf_counter()
+    (fast, streaks) = find_streaks(games)
+    oldPoints = score_games(games, fast, streaks, oldRules)
+    newPoints = score_games(games, fast, streaks, newRules)
+    scoreTime = time.perf_counter() - timeStarted
+
+    print_report(games, oldPoints, newPoints, top)
+    # Only games played with the rules in use should score what they
+    # were saved with
+    playedWithOldRules = numpy.array(
+        [rule == oldRules[difficulty] for (rule, difficulty)
+         in zip(games['rules'], games['difficulties'])], bool)
+    mismatched = int(numpy.count_nonzero(
+        playedWithOldRules & (oldPoints != games['claimed'])))
+    if not playedWithOldRules.all():
+        print(str(int(numpy.count_nonzero(~playedWithOldRules)))
+              + ' games were played with other rules, so their old points '
+              + 'are what the rules in use would give them.')
+    if mismatched:
+        print('Warning: ' + str(mismatched) + " games don't have the points "
+              + 'they were saved with under the rules in use. (Check them '
+              + 'with verify.py.)')
+    print('Read ' + str(len(games['seeds'])) + ' games in '
+          + format(loadTime, '.2f') + 's and scored them twice in '
+          + format(scoreTime, '.3f') + 's.')
@@ -0,0 +1,124 @@
+# Math Quizzer rollups
+# Part of Math Quizzer. Keeps the number of attempts, the total points
+# and the best score for each difficulty on each day and in each week,
+# so that trends can be shown without going through every attempt in
+# MATHQUIZZER-highscores.txt.
+#
+# The rollups are stored in MATHQUIZZER-rollups.txt, one bucket per line:
+#
+# d 3 19750 4 37 15
+# d                  Period (d = day, w = week)
+#   3                Difficulty
+#     19750          Day (or week) number, counting from 1/1/1970
+#           4        Attempts
+#             37     Total points
+#                15  Best score
+#
+# Days and weeks are in local time, and weeks start on Monday.
+
+import os
+import time
+
+HEADER = '# Belongs to the game Math Quizzer.'
+
+
+def day_number(timeFinished):
+    '''day_number(timeFinished) -> int
+    Returns the number of the local day that timeFinished (a Unix
+    timestamp) is in.
+    '''
+    timeFinished = int(timeFinished)
+    return ((timeFinished + time.localtime(timeFinished).tm_gmtoff)
+            // 86400)
+
+
+def week_number(day):
+    '''week_number(day) -> int
+    Returns the number of the week (starting on Monday) that day is in.
+    1/1/1970 was a Thursday, so day 4 is the first Monday.
+    '''
+    return (day + 3) // 7
+
+
+def first_day_of_week(week):
+    '''first_day_of_week(week) -> int
+    Returns the number of the Monday that starts week.
+    '''
+    return week * 7 - 3
+
+
+def day_label(day):
+    '''day_label(day) -> str
+    Returns day as a short date, like "2/14".
+    '''
+    date = time.gmtime(day * 86400)
+    return str(date.tm_mon) + '/' + str(date.tm_mday)
+
+
+def add_to_rollups(rollups, timeFinished, difficulty, points):
+    '''Adds one attempt to the day and week it was finished in.'''
+    day = day_number(timeFinished)
+    for key in [('d', difficulty, day),
+                ('w', difficulty, week_number(day))]:
+        bucket = rollups.get(key)
+        if bucket is None:
+            rollups[key] = [1, points, points]
+        else:
+            bucket[0] += 1
+            bucket[1] += points
+            bucket[2] = max(bucket[2], points)
+
+
+def build_rollups(scores):
+    '''build_rollups(scores) -> dict
+    Returns the rollups of scores, where scores is a list of
+    [timeFinished, difficulty, points].
+    '''
+    rollups = {}
+    for score in scores:
+        add_to_rollups(rollups, *score)
+    return rollups
+
+
+def rollup_series(rollups, period, difficulty):
+    '''rollup_series(rollups, period, difficulty) -> list
+    Returns (number, attempts, average, best) for every day or week
+    (depending on period) that difficulty was played, oldest first.
+    '''
+    return [(key[2], bucket[0], bucket[1] / bucket[0], bucket[2])
+            for (key, bucket) in sorted(rollups.items())
+            if key[0] == period and key[1] == difficulty]
+
+
+def load_rollups(path):
+    '''load_rollups(path) -> dict OR None
+    Reads the rollups saved in path, or returns None if path doesn't
+    exist.
+    '''
+    try:
+        with open(path) as rollupFile:
+            text = rollupFile.read()
+    except FileNotFoundError:
+        return None
+    if not text.startswith(HEADER):
+        raise ValueError('File ' + path + ' is not formed properly. '
+                         + 'Please rename the file, then try again.')
+    rollups = {}
+    for line in text.split('\n')[1:]:
+        if line == '':
+            continue
+        (period, difficulty, number, attempts, total, best) = line.split(' ')
+        rollups[(period, int(difficulty), int(number))] = \
+            [int(attempts), int(total), int(best)]
+    return rollups
+
+
+def save_rollups(path, rollups):
+    '''Writes rollups to path, replacing it all at once so that a crash
+    can't leave half a file behind.
+    '''
+    lines = [HEADER] + [' '.join([str(i) for i in key + tuple(bucket)])
+                        for (key, bucket) in sorted(rollups.items())]
+    with open(path + '.tmp', 'w') as rollupFile:
+        rollupFile.write('\n'.join(lines) + '\n')
+    os.replace(path + '.tmp', path)
@@ -0,0 +1,563 @@
+# Math Quizzer rooms
+# Part of Math Quizzer. Lets a class play a timed round together. A host
+# opens a room, players join it, and when the host starts a round every
+# player gets the same questions, made from a seed the server picks
+# (with the same numbers as the timed difficulties). The server checks
+# every answer with its own copy of the questions and its own clock, and
+# sends a leaderboard to everyone in the room every TICK_TIME seconds.
+#
+# Every message is one line of JSON:
+#
+# Client to server:
+#   {"type": "host", "room": ROOM}          Open ROOM and be its host
+#   {"type": "join", "room": ROOM, "name": NAME}
+#   {"type": "start", "difficulty": 7}      (Host) Start a round on
+#                                             difficulty 7, 8, or 9
+#   {"type": "answer", "number": N, "answer": "B"}
+#                                           Answer question N (from 0)
+# Server to client:
+#   {"type": "joined", "room": ROOM, "players": COUNT}
+#   {"type": "round", "seed": SEED, "difficulty": D, "spec": FINGERPRINT,
+#    "time": SECONDS, "startsIn": SECONDS}
+#   {"type": "result", "number": N, "correct": true, "points": POINTS}
+#   {"type": "leaderboard", "timeLeft": SECONDS, "players": COUNT,
+#    "top": [[NAME, POINTS, OUT], ...]}
+#   {"type": "end", "top": [[NAME, POINTS, OUT], ...]}
+#   {"type": "error", "message": TEXT}
+#
+# Like in the game, a wrong answer ends a player's round. The points for
+# each answer come from scoring.py, timed by when the server got the
+# answer before it. A room closes when its host leaves, or if a round is
+# being played, when the round ends.
+#
+# Each leaderboard is turned into bytes once and the same bytes are
+# written to every player without waiting for any of them. The system
+# only holds SEND_BUFFER bytes for each player, so if a player isn't
+# reading fast enough, what's sent to them piles up in the server. Once
+# more than MAX_BUFFERED bytes are waiting, they miss leaderboards (the
+# next one replaces them anyway), and after MAX_SKIPPED_TICKS missed in
+# a row they're disconnected. So a slow player can't hold up the round
+# for everyone else.
+#
+# Usage:
+#   python rooms.py serve [PORT]
+#   python rooms.py host HOST PORT ROOM [DIFFICULTY]
+#   python rooms.py join HOST PORT ROOM NAME
+#   python rooms.py swarm [PLAYERS] [--slow N] [--difficulty D]
+# swarm runs a server and PLAYERS (200 by default) computer players on
+# this computer, N of which never read what they're sent, plays one
+# round (1 minute by default, which is long enough for the slow players
+# to be dropped), and prints how it went.
+
+import asyncio
+import json
+import random
+import socket
+import sys
+import time
+
+import banks
+import questions
+import recordings
+import scoring
+import verify
+
+PORT = 8713
+TICK_TIME = 0.5
+COUNTDOWN = 3 # Seconds between starting a round and the first question
+SEND_BUFFER = 16384 # Bytes the system may hold for each player
+MAX_BUFFERED = 16384
+MAX_SKIPPED_TICKS = 10
+LEADERBOARD_SIZE = 20
+QUESTION_BATCH = 64
+MAX_NAME_LENGTH = 20
+
+
+def new_question_list(seed, spec):
+    '''new_question_list(seed, spec) -> dict
+    Returns the list of questions of a round with seed and spec (a
+    compiled difficulty), which are made as they're needed (see
+    get_question()).
+    '''
+    savedState = random.getstate()
+    random.seed(seed)
+    questionList = {'spec': spec, 'questions': [],
+                    'randomState': random.getstate()}
+    random.setstate(savedState)
+    return questionList
+
+
+def get_question(questionList, number):
+    '''get_question(questionList, number)
+        -> (str, int, int, int, int, str, int, int, int, int)
+    Returns question number number (from 0) of questionList, making more
+    questions if it needs to. The questions don't depend on anything
+    else that uses random, so any number of rounds can be played at once.
+    '''
+    while number >= len(questionList['questions']):
+        savedState = random.getstate()
+        random.setstate(questionList['randomState'])
+        questionList['questions'] += [recordings.make_game_question(
+            questionList['spec'], questions.EXPRESSION_LEVELS[7], False, None)
+            for i in range(QUESTION_BATCH)]
+        questionList['randomState'] = random.getstate()
+        random.setstate(savedState)
+    return questionList['questions'][number]
+
+
+def encode_message(message):
+    '''encode_message(message) -> bytes
+    Returns message as a line of JSON.
+    '''
+    return (json.dumps(message, separators = (',', ':')) + '\n').encode()
+
+
+def send(player, message):
+    '''Sends message to player, without waiting for it to be sent.'''
+    if not player['writer'].is_closing():
+        player['writer'].write(encode_message(message))
+
+
+def broadcast(room, data, droppable):
+    '''Writes data (from encode_message()) to every player in room and
+    its host. If droppable is True, players who have too much waiting to
+    be sent miss it, and are disconnected if they've missed too many.
+    '''
+    everyone = room['players']
+    if room['host'] is not None: # It's None if the host left
+        everyone = [room['host']] + everyone
+    for player in everyone:
+        writer = player['writer']
+        if writer.is_closing():
+            continue
+        if droppable and (writer.transport.get_write_buffer_size()
+                          > MAX_BUFFERED):
+            player['skippedTicks'] += 1
+            room['stats']['skipped'] += 1
+            if player['skippedTicks'] > MAX_SKIPPED_TICKS:
+                room['stats']['dropped'] += 1
+                writer.transport.abort() # Don't wait for what's buffered
+            continue
+        player['skippedTicks'] = 0
+        writer.write(data)
+
+
+def leaderboard(room):
+    '''leaderboard(room) -> list
+    Returns the best LEADERBOARD_SIZE players in room as
+    [NAME, POINTS, OUT].
+    '''
+    players = sorted(room['players'], key = lambda player: -player['points'])
+    return [[player['name'], player['points'], player['out']]
+            for player in players[:LEADERBOARD_SIZE]]
+
+
+def new_room(name, host):
+    '''new_room(name, host) -> dict
+    Returns an empty room called name, hosted by host (a player).
+    '''
+    return {'name': name, 'host': host, 'players': [], 'round': None,
+            'stats': {'ticks': 0, 'fanOutTime': 0, 'skipped': 0,
+                      'dropped': 0}}
+
+
+def new_player(name, writer):
+    '''new_player(name, writer) -> dict
+    Returns a player called name, who's sent messages with writer (an
+    asyncio.StreamWriter).
+    '''
+    return {'name': name, 'writer': writer, 'points': 0, 'streak': 0,
+            'number': 0, 'questionStart': 0, 'out': False,
+            'skippedTicks': 0}
+
+
+async def play_round(room, difficulty, specs):
+    '''Plays a round of difficulty in room, sending everyone the seed,
+    then a leaderboard every TICK_TIME seconds until it ends.
+    '''
+    spec = specs[recordings.LEVELS[difficulty]]
+    seed = random.getrandbits(63)
+    totalTime = recordings.TIME_LIMITS[difficulty]
+    startTime = time.perf_counter() + COUNTDOWN
+    room['round'] = {'difficulty': difficulty,
+                     'questionList': new_question_list(seed, spec),
+                     'startTime': startTime,
+                     'endTime': startTime + totalTime}
+    room['stats'] = {'ticks': 0, 'fanOutTime': 0, 'skipped': 0,
+                     'dropped': 0}
+    for player in room['players']:
+        player.update(points = 0, streak = 0, number = 0,
+                      questionStart = startTime, out = False)
+    broadcast(room, encode_message(
+        {'type': 'round', 'seed': seed, 'difficulty': difficulty,
+         'spec': banks.spec_fingerprint(spec).hex(), 'time': totalTime,
+         'startsIn': COUNTDOWN}), False)
+
+    while time.perf_counter() < room['round']['endTime']:
+        await asyncio.sleep(TICK_TIME)
+        timeStarted = time.perf_counter()
+        timeLeft = max(room['round']['endTime'] - timeStarted, 0)
+        broadcast(room, encode_message(
+            {'type': 'leaderboard', 'timeLeft': round(timeLeft, 1),
+             'players': len(room['players']), 'top': leaderboard(room)}),
+            True)
+        room['stats']['ticks'] += 1
+        room['stats']['fanOutTime'] += time.perf_counter() - timeStarted
+
+    await asyncio.sleep(recordings.TIME_TOLERANCE) # For answers on the way
+    room['round'] = None
+    broadcast(room, encode_message({'type': 'end', 'top': leaderboard(room)}),
+              False)
+    stats = room['stats']
+    print('Round in room ' + room['name'] + ' ended: '
+          + str(len(room['players'])) + ' players, ' + str(stats['ticks'])
+          + ' leaderboards, '
+          + format(stats['fanOutTime'] / max(stats['ticks'], 1) * 1e6, '.0f')
+          + ' µs each to send, ' + str(stats['skipped']) + ' skipped, '
+          + str(stats['dropped']) + ' slow players dropped.')
+
+
+def answer(room, player, message):
+    '''Checks player's answer (an "answer" message) in room's round.'''
+    roundData = room['round']
+    currentTime = time.perf_counter()
+    if (roundData is None or player is room['host'] or player['out']
+        or message.get('number') != player['number']
+        or currentTime < roundData['startTime']
+        or currentTime > roundData['endTime'] + recordings.TIME_TOLERANCE):
+        return None
+    question = get_question(roundData['questionList'], player['number'])
+    timeOnQuestion = currentTime - player['questionStart']
+    correct = message.get('answer') == question[5]
+    if correct:
+        (pointsGained, player['streak']) = scoring.score_answer(
+            roundData['difficulty'], player['streak'], timeOnQuestion)
+        player['points'] += pointsGained
+        player['number'] += 1
+        player['questionStart'] = currentTime
+    else:
+        player['out'] = True
+    send(player, {'type': 'result', 'number': message['number'],
+                  'correct': correct, 'points': player['points']})
+
+
+def make_server(specs):
+    '''make_server(specs) -> function
+    Returns the function that handles each connection to the server
+    (for asyncio.start_server()), with specs (every compiled
+    difficulty).
+    '''
+    rooms = {}
+    rounds = set() # So the rounds' tasks aren't garbage collected
+    try:
+        scoring.use_rules(scoring.load_custom_rules())
+    except ValueError as error:
+        print('Using the usual scoring rules. ' + str(error))
+
+    def close_orphaned_room(room):
+        '''Closes room if its host has left, once its round is over.'''
+        if room['host'] is None and rooms.get(room['name']) is room:
+            del rooms[room['name']]
+
+    async def handle_client(reader, writer):
+        player = None
+        room = None
+        writer.get_extra_info('socket').setsockopt(
+            socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                    kind = message['type']
+                except (ValueError, KeyError, TypeError):
+                    writer.write(encode_message(
+                        {'type': 'error', 'message': 'Bad message.'}))
+                    continue
+                if kind in ('host', 'join') and player is None:
+                    name = str(message.get('room', ''))
+                    if kind == 'host' and name not in rooms:
+                        player = new_player('(host)', writer)
+                        room = rooms[name] = new_room(name, player)
+                    elif kind == 'join' and name in rooms:
+                        room = rooms[name]
+                        player = new_player(
+                            str(message.get('name', ''))[:MAX_NAME_LENGTH],
+                            writer)
+                        room['players'].append(player)
+                    else:
+                        writer.write(encode_message(
+                            {'type': 'error', 'message': "Can't " + kind
+                                                          + ' that room.'}))
+                        continue
+                    send(player, {'type': 'joined', 'room': name,
+                                  'players': len(room['players'])})
+                elif (kind == 'start' and room is not None
+                      and player is room['host'] and room['round'] is None
+                      and message.get('difficulty') in (7, 8, 9)):
+                    task = asyncio.create_task(play_round(
+                        room, message['difficulty'], specs))
+                    rounds.add(task)
+                    task.add_done_callback(rounds.discard)
+                    task.add_done_callback(
+                        lambda task, room = room: close_orphaned_room(room))
+                elif kind == 'answer' and room is not None:
+                    answer(room, player, message)
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            if room is not None:
+                if player in room['players']:
+                    room['players'].remove(player)
+                if player is room['host']:
+                    room['host'] = None
+                    if room['round'] is None:
+                        close_orphaned_room(room)
+            writer.close()
+
+    return handle_client
+
+
+async def serve(port):
+    '''Runs a server on port until it's stopped.'''
+    server = await asyncio.start_server(make_server(verify.load_specs()),
+                                        None, port)
+    print('Serving rooms on port ' + str(port) + '.')
+    async with server:
+        await server.serve_forever()
+
+
+async def read_message(reader):
+    '''read_message(reader) -> dict OR None
+    Returns the next message from reader, or None if the connection
+    closed.
+    '''
+    line = await reader.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+def format_leaderboard(top):
+    '''format_leaderboard(top) -> str
+    Returns the lines of a leaderboard (from leaderboard()).
+    '''
+    return '\n'.join([str(rank) + '. ' + name + ': ' + str(points)
+                      + (' (out)' if out else '')
+                      for (rank, (name, points, out)) in enumerate(top, 1)])
+
+
+async def host_room(host, port, roomName, difficulty):
+    '''Opens roomName on the server at host:port, starts a round of
+    difficulty when Enter is pressed, and prints the leaderboard.
+    '''
+    (reader, writer) = await asyncio.open_connection(host, port)
+    writer.write(encode_message({'type': 'host', 'room': roomName}))
+    message = await read_message(reader)
+    if message['type'] == 'error':
+        sys.exit(message['message'])
+    await asyncio.get_running_loop().run_in_executor(
+        None, input, 'Room ' + roomName + ' is open. Press Enter to start.')
+    writer.write(encode_message({'type': 'start',
+                                 'difficulty': difficulty}))
+    lastTop = None
+    while True:
+        message = await read_message(reader)
+        if message is None or message['type'] == 'end':
+            break
+        if message['type'] == 'leaderboard' and message['top'] != lastTop:
+            lastTop = message['top']
+            print(str(message['timeLeft']) + 's left, '
+                  + str(message['players']) + ' players')
+            print(format_leaderboard(lastTop))
+            print()
+    if message is not None:
+        print('Final leaderboard:')
+        print(format_leaderboard(message['top']))
+    writer.close()
+
+
+async def join_room(host, port, roomName, name):
+    '''Joins roomName on the server at host:port as name, and plays the
+    next round by typing the letters of the answers.
+    '''
+    (reader, writer) = await asyncio.open_connection(host, port)
+    writer.write(encode_message({'type': 'join', 'room': roomName,
+                                 'name': name}))
+    message = await read_message(reader)
+    if message['type'] == 'error':
+        sys.exit(message['message'])
+    print('Joined room ' + roomName + '. Waiting for the round to start...')
+    while message is not None and message['type'] != 'round':
+        message = await read_message(reader)
+    spec = verify.load_specs()[recordings.LEVELS[message['difficulty']]]
+    if banks.spec_fingerprint(spec).hex() != message['spec']:
+        sys.exit("This computer's difficulties are different from the "
+                 + "server's.")
+    questionList = new_question_list(message['seed'], spec)
+    await asyncio.sleep(message['startsIn'])
+
+    loop = asyncio.get_running_loop()
+    number = 0
+    while True:
+        question = get_question(questionList, number)
+        print(question[0] + '   A) ' + str(question[1]) + '   B) '
+              + str(question[2]) + '   C) ' + str(question[3]) + '   D) '
+              + str(question[4]))
+        letter = (await loop.run_in_executor(None, sys.stdin.readline))
+        letter = letter.strip().upper()
+        writer.write(encode_message({'type': 'answer', 'number': number,
+                                     'answer': letter}))
+        while True:
+            message = await read_message(reader)
+            if message is None or message['type'] in ('result', 'end'):
+                break
+        if message is None or message['type'] == 'end':
+            break
+        if not message['correct']:
+            print('Oops! The correct answer was ' + question[5] + ').')
+            break
+        print('Correct! You have ' + str(message['points']) + ' points.')
+        number += 1
+    while message is not None and message['type'] != 'end':
+        message = await read_message(reader)
+    if message is not None:
+        print('Final leaderboard:')
+        print(format_leaderboard(message['top']))
+    writer.close()
+
+
+async def swarm_player(port, roomName, name, slow, joined, stats):
+    '''Joins roomName on the local server at port as name and plays the
+    round, answering right most of the time. If slow is True, nothing
+    sent to the player is ever read after joining.
+    '''
+    sock = socket.socket()
+    if slow: # Fill up quickly
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    sock.setblocking(False)
+    await asyncio.get_running_loop().sock_connect(sock, ('127.0.0.1', port))
+    (reader, writer) = await asyncio.open_connection(sock = sock)
+    writer.write(encode_message({'type': 'join', 'room': roomName,
+                                 'name': name}))
+    await read_message(reader)
+    joined.release()
+    try:
+        if slow:
+            writer.transport.pause_reading()
+            await asyncio.sleep(3600) # Cancelled when the round ends
+        await play_swarm_round(reader, writer, stats)
+    finally:
+        writer.close()
+
+
+async def play_swarm_round(reader, writer, stats):
+    '''Plays the next round as a computer player, with reader and
+    writer (from asyncio.open_connection()).
+    '''
+    message = await read_message(reader)
+    while message is not None and message['type'] != 'round':
+        message = await read_message(reader)
+    spec = verify.load_specs()[recordings.LEVELS[message['difficulty']]]
+    questionList = new_question_list(message['seed'], spec)
+    await asyncio.sleep(message['startsIn'])
+
+    number = 0
+    answering = True
+    while message is not None and message['type'] != 'end':
+        if answering:
+            await asyncio.sleep(random.uniform(0.3, 3))
+            question = get_question(questionList, number)
+            letter = question[5]
+            if random.random() < 0.05: # Wrong answer
+                letter = 'ABCD'[('ABCD'.index(letter) + 1) % 4]
+            writer.write(encode_message({'type': 'answer', 'number': number,
+                                         'answer': letter}))
+            number += 1
+            answering = letter == question[5]
+        try: # Read everything that's been sent, waiting only if it's out
+            while True:
+                message = await asyncio.wait_for(
+                    read_message(reader), None if not answering else 0.01)
+                if message is None or message['type'] == 'end':
+                    break
+                stats['messages'] += 1
+        except asyncio.TimeoutError:
+            pass
+    stats['finished'] += 1
+
+
+async def run_swarm(numPlayers, numSlow, difficulty):
+    '''Runs a server and numPlayers computer players (numSlow of them
+    slow) on this computer, plays one round, and prints how it went.
+    '''
+    server = await asyncio.start_server(make_server(verify.load_specs()),
+                                        '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    (reader, writer) = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(encode_message({'type': 'host', 'room': 'swarm'}))
+    await read_message(reader)
+
+    joined = asyncio.Semaphore(0)
+    stats = {'messages': 0, 'finished': 0}
+    tasks = [asyncio.create_task(swarm_player(
+                 port, 'swarm', 'Player ' + str(number), number < numSlow,
+                 joined, stats))
+             for number in range(numPlayers)]
+    for i in range(numPlayers):
+        await joined.acquire()
+    print(str(numPlayers) + ' players joined (' + str(numSlow)
+          + ' slow). Starting the round.')
+    writer.write(encode_message({'type': 'start', 'difficulty': difficulty}))
+    message = await read_message(reader)
+    while message is not None and message['type'] != 'end':
+        message = await read_message(reader)
+
+    await asyncio.wait(tasks, timeout = 5)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions = True)
+    print(str(stats['finished']) + ' of ' + str(numPlayers - numSlow)
+          + ' players finished, reading ' + str(stats['messages'])
+          + ' messages.')
+    print('Final leaderboard:')
+    print(format_leaderboard(message['top'][:5]))
+    writer.close()
+    await asyncio.sleep(0.1) # Let the server see everyone leave
+    server.close()
+    await server.wait_closed()
+
+
+if __name__ == '__main__':
+    arguments = sys.argv[1:]
+    command = arguments[0] if arguments else None
+    if command == 'serve':
+        asyncio.run(serve(int(arguments[1]) if len(arguments) > 1
+                          else PORT))
+    elif command == 'host' and len(arguments) >= 4:
+        asyncio.run(host_room(arguments[1], int(arguments[2]), arguments[3],
+                              int(arguments[4]) if len(arguments) > 4 else 7))
+    elif command == 'join' and len(arguments) == 5:
+        asyncio.run(join_room(arguments[1], int(arguments[2]), arguments[3],
+                              arguments[4]))
+    elif command == 'swarm':
+        numSlow = 0
+        difficulty = 8
+        for option in ('--slow', '--difficulty'):
+            if option in arguments:
+                index = arguments.index(option)
+                if option == '--slow':
+                    numSlow = int(arguments[index + 1])
+                else:
+                    difficulty = int(arguments[index + 1])
+                del arguments[index:index + 2]
+        asyncio.run(run_swarm(int(arguments[1]) if len(arguments) > 1
+                              else 200, numSlow, difficulty))
+    else:
+        sys.exit('Usage: python rooms.py serve [PORT]\n'
+                 + '       python rooms.py host HOST PORT ROOM [DIFFICULTY]\n'
+                 + '       python rooms.py join HOST PORT ROOM NAME\n'
+                 + '       python rooms.py swarm [PLAYERS] [--slow N] '
+                 + '[--difficulty D]')
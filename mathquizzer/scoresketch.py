@@ -0,0 +1,132 @@
+# Math Quizzer score sketches
+# Part of Math Quizzer. Keeps track of the distribution of scores for
+# each difficulty, so that things like the median, the 90th percentile
+# and how many attempts a score beats can be found without going through
+# every attempt in MATHQUIZZER-highscores.txt.
+#
+# Scores are whole numbers and there aren't many different ones, so a
+# sketch just counts how many times each score happened. That makes
+# adding a score O(1), merging two sketches (for example, from two
+# different computers) a matter of adding up the counts, and every
+# answer exact instead of approximate, no matter how many attempts
+# there are.
+#
+# Usage (to merge sketch files from several computers):
+#   python scoresketch.py OUTPUT INPUT [INPUT ...]
+
+import os
+import sys
+
+HEADER = '# Belongs to the game Math Quizzer.'
+
+
+def add_score(sketch, points, count = 1):
+    '''Adds count attempts with points points to sketch.'''
+    sketch[points] = sketch.get(points, 0) + count
+
+
+def merge_sketches(sketch, other):
+    '''Adds every attempt in other to sketch.'''
+    for (points, count) in other.items():
+        add_score(sketch, points, count)
+
+
+def sketch_size(sketch):
+    '''sketch_size(sketch) -> int
+    Returns the number of attempts in sketch.
+    '''
+    return sum(sketch.values())
+
+
+def sketch_quantile(sketch, fraction):
+    '''sketch_quantile(sketch, fraction) -> int OR None
+    Returns the smallest score that at least fraction of the attempts in
+    sketch are less than or equal to, or None if sketch is empty. For
+    example, sketch_quantile(sketch, 0.5) is the median.
+    '''
+    size = sketch_size(sketch)
+    if size == 0:
+        return None
+    target = max(fraction * size, 1)
+    seen = 0
+    for points in sorted(sketch):
+        seen += sketch[points]
+        if seen >= target:
+            return points
+    return max(sketch)
+
+
+def sketch_rank(sketch, points):
+    '''sketch_rank(sketch, points) -> float OR None
+    Returns the fraction of the attempts in sketch that got fewer than
+    points points, or None if sketch is empty.
+    '''
+    size = sketch_size(sketch)
+    if size == 0:
+        return None
+    return sum(count for (score, count) in sketch.items()
+               if score < points) / size
+
+
+def build_sketches(scores):
+    '''build_sketches(scores) -> dict
+    Returns a dict mapping each difficulty to a sketch of scores, where
+    scores is a list of [timeFinished, difficulty, points].
+    '''
+    sketches = {}
+    for score in scores:
+        add_score(sketches.setdefault(score[1], {}), score[2])
+    return sketches
+
+
+def load_sketches(path):
+    '''load_sketches(path) -> dict OR None
+    Reads the sketches saved in path, or returns None if path doesn't
+    exist.
+    '''
+    try:
+        with open(path) as sketchFile:
+            text = sketchFile.read()
+    except FileNotFoundError:
+        return None
+    if not text.startswith(HEADER):
+        raise ValueError('File ' + path + ' is not formed properly. '
+                         + 'Please rename the file, then try again.')
+    sketches = {}
+    for line in text.split('\n')[1:]:
+        if line == '':
+            continue
+        (difficulty, *counts) = line.split(' ')
+        sketch = sketches.setdefault(int(difficulty), {})
+        for pair in counts:
+            (points, count) = pair.split(':')
+            add_score(sketch, int(points), int(count))
+    return sketches
+
+
+def save_sketches(path, sketches):
+    '''Writes sketches to path, replacing it all at once so that a crash
+    can't leave half a file behind.
+    '''
+    lines = [HEADER]
+    for difficulty in sorted(sketches):
+        sketch = sketches[difficulty]
+        lines.append(' '.join([str(difficulty)]
+                              + [str(points) + ':' + str(sketch[points])
+                                 for points in sorted(sketch)]))
+    with open(path + '.tmp', 'w') as sketchFile:
+        sketchFile.write('\n'.join(lines) + '\n')
+    os.replace(path + '.tmp', path)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        sys.exit('Usage: python scoresketch.py OUTPUT INPUT [INPUT ...]')
+    merged = {}
+    for path in sys.argv[2:]:
+        sketches = load_sketches(path)
+        if sketches is None:
+            sys.exit("Couldn't find " + path + '.')
+        for (difficulty, sketch) in sketches.items():
+            merge_sketches(merged.setdefault(difficulty, {}), sketch)
+    save_sketches(sys.argv[1], merged)
@@ -0,0 +1,228 @@
+# Math Quizzer scoring
+# Part of Math Quizzer. Works out how many points a correct answer is
+# worth. Used by the game and by verify.py, so that recorded games are
+# checked with exactly the same rules they were played with.
+#
+# Each difficulty has a rule, (THRESHOLD, OFFSET, EXPONENT, ROUNDING): a
+# correct answer that brings the streak up to streak is worth
+#
+#     ROUNDING(max(streak - OFFSET, THRESHOLD) ** EXPONENT)
+#
+# points, where ROUNDING is 'ceil', 'floor' or 'round'. The rules are
+# turned into a table of the points for every streak below TABLE_SIZE
+# when they're loaded, so scoring an answer is just looking it up.
+#
+# The rules can be changed without editing the game in
+# MATHQUIZZER-scoring.toml (or MATHQUIZZER-scoring.json), in the current
+# folder. Difficulties that aren't in the file keep their usual rules:
+#
+# [rules]
+# 3 = {threshold = 1, offset = 0, exponent = 0.55, rounding = 'ceil'}
+#
+# JSON files use the same layout: {"rules": {"3": {...}}}. To see how a
+# new set of rules would change the leaderboards before switching to it,
+# use rescore.py.
+#
+# Usage:
+#   python scoring.py [FILE]
+# Checks FILE (MATHQUIZZER-scoring.toml or .json by default) and prints
+# the points for the first few streaks on each difficulty.
+
+import json
+import math
+import os
+import sys
+import tomllib
+
+STREAK_TIME = 5 # Answers at least this fast grow the streak
+PATHS = ('MATHQUIZZER-scoring.toml', 'MATHQUIZZER-scoring.json')
+TABLE_SIZE = 1024
+ROUNDINGS = {'ceil': math.ceil, 'floor': math.floor, 'round': round}
+
+# The usual rule of each difficulty (see the v1.3 changelog)
+RULES = (None,
+         (1, 2, 0.35, 'ceil'), # Easy
+         (1, 1, 0.43, 'ceil'), # Medium
+         (1, 0, 0.5, 'ceil'), # Hard
+         (1, 0, 0.6, 'ceil'), # Harder
+         (1, 0, 0.7, 'ceil'), # Insane
+         (1, 0, 0.8, 'ceil'), # AAAAAAA
+         (1, 0, 0.6, 'ceil'), # 30 seconds
+         (1, 0, 0.53, 'ceil'), # 1 minute
+         (1, 0, 0.45, 'ceil'), # 2 minutes
+         (1, 0, 0.5, 'ceil'), # Practice
+         (1, 0, 0.6, 'ceil')) # Adaptive
+
+
+def rule_points(rule, streak):
+    '''rule_points(rule, streak) -> int
+    Returns the points rule gives a correct answer that brings the
+    streak up to streak.
+    '''
+    (threshold, offset, exponent, rounding) = rule
+    return ROUNDINGS[rounding](max(streak - offset, threshold) ** exponent)
+
+
+def compile_rules(rules, size = TABLE_SIZE):
+    '''compile_rules(rules, size = TABLE_SIZE) -> tuple
+    Returns the points of every streak below size for each difficulty's
+    rule in rules, as a list for each difficulty.
+    '''
+    return (None,) + tuple([rule_points(rule, streak)
+                            for streak in range(size)]
+                           for rule in rules[1:])
+
+
+rules = RULES # The rules in use, and their tables
+pointTables = compile_rules(RULES)
+
+
+def use_rules(newRules):
+    '''Scores every answer from now on with newRules.'''
+    global rules, pointTables
+    pointTables = compile_rules(newRules)
+    rules = newRules
+
+
+def streak_points(difficulty, streak):
+    '''streak_points(difficulty, streak) -> int
+    Returns the points for a correct answer on difficulty that brings
+    the streak up to streak.
+    '''
+    table = pointTables[difficulty]
+    if streak < len(table):
+        return table[streak]
+    return rule_points(rules[difficulty], streak)
+
+
+def score_answer(difficulty, streak, timeOnQuestion, rule = None):
+    '''score_answer(difficulty, streak, timeOnQuestion, rule = None)
+        -> (int, int)
+    Returns (POINTS GAINED, NEW STREAK) for a correct answer that took
+    timeOnQuestion seconds, when the streak was streak. If rule is
+    given, it's used instead of difficulty's rule in use.
+    '''
+    if timeOnQuestion > STREAK_TIME:
+        return (1, 0)
+    elif rule is not None:
+        return (rule_points(rule, streak + 1), streak + 1)
+    return (streak_points(difficulty, streak + 1), streak + 1)
+
+
+def format_rule(rule):
+    '''format_rule(rule) -> str
+    Returns rule as text, like '1 0 0.5 ceil', for read_rule_text().
+    '''
+    return ' '.join(repr(i) if isinstance(i, float) else str(i)
+                    for i in rule)
+
+
+def read_rule_text(text):
+    '''read_rule_text(text) -> tuple
+    Returns the rule in text (from format_rule()). Raises ValueError if
+    it isn't a proper rule.
+    '''
+    parts = text.split(' ')
+    if len(parts) != 4:
+        raise ValueError('a rule should have 4 parts, not ' + repr(text))
+    return read_rule({'threshold': int(parts[0]), 'offset': int(parts[1]),
+                      'exponent': float(parts[2]), 'rounding': parts[3]})
+
+
+def find_rules_file():
+    '''find_rules_file() -> str OR None
+    Returns the path of the custom scoring file, or None if there isn't
+    one.
+    '''
+    for path in PATHS:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def read_rule(rule):
+    '''read_rule(rule) -> tuple
+    Returns rule (a table from a scoring file) as (THRESHOLD, OFFSET,
+    EXPONENT, ROUNDING). Raises ValueError if it isn't a proper rule.
+    '''
+    if not isinstance(rule, dict):
+        raise ValueError('Each rule should be a table, not ' + repr(rule)
+                         + '.')
+    unknownKeys = set(rule) - {'threshold', 'offset', 'exponent', 'rounding'}
+    if unknownKeys:
+        raise ValueError('Unknown key ' + repr(sorted(unknownKeys)[0])
+                         + ' in a rule.')
+    parsed = (rule.get('threshold', 1), rule.get('offset', 0),
+              rule.get('exponent', 0.5), rule.get('rounding', 'ceil'))
+    if not all(isinstance(i, int) and not isinstance(i, bool)
+               for i in parsed[:2]):
+        raise ValueError('threshold and offset should be whole numbers.')
+    if parsed[0] < 0 or parsed[1] < 0:
+        raise ValueError("threshold and offset can't be negative.")
+    if (not isinstance(parsed[2], (int, float)) or isinstance(parsed[2], bool)
+        or not 0 <= parsed[2] <= 2):
+        raise ValueError('exponent should be a number from 0 to 2.')
+    if parsed[3] not in ROUNDINGS:
+        raise ValueError('rounding should be ' + ', '.join(ROUNDINGS) + '.')
+    if rule_points(parsed, 1) < 1:
+        raise ValueError('A correct answer should be worth at least 1 point.')
+    return parsed
+
+
+def load_rules(path):
+    '''load_rules(path) -> tuple
+    Returns every difficulty's rule, with the ones in path replacing the
+    usual ones. Raises ValueError if path has a problem.
+    '''
+    try:
+        with open(path, 'rb') as rulesFile:
+            source = rulesFile.read()
+        if path.endswith('.json'):
+            contents = json.loads(source)
+        else:
+            contents = tomllib.loads(source.decode())
+    except (OSError, UnicodeDecodeError, json.JSONDecodeError,
+            tomllib.TOMLDecodeError) as error:
+        raise ValueError(path + ' could not be read: ' + str(error)) from None
+    if not isinstance(contents, dict) or not isinstance(
+        contents.get('rules'), dict):
+        raise ValueError(path + ' needs a rules table.')
+    newRules = list(RULES)
+    for (difficulty, rule) in contents['rules'].items():
+        if not difficulty.isdigit() or not 1 <= int(difficulty) < len(RULES):
+            raise ValueError(path + ': there is no difficulty number '
+                             + difficulty + '.')
+        try:
+            newRules[int(difficulty)] = read_rule(rule)
+        except ValueError as error:
+            raise ValueError(path + ': difficulty ' + difficulty + ': '
+                             + str(error)) from None
+    return tuple(newRules)
+
+
+def load_custom_rules():
+    '''load_custom_rules() -> tuple
+    Returns the rules in the custom scoring file, or the usual ones if
+    there isn't one. Raises ValueError if the file has a problem.
+    '''
+    path = find_rules_file()
+    if path is None:
+        return RULES
+    return load_rules(path)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else find_rules_file()
+    if path is None:
+        sys.exit('No scoring file found.')
+    try:
+        newRules = load_rules(path)
+    except ValueError as error:
+        sys.exit(str(error))
+    print(path + ' is OK. Points for streaks 1-10:')
+    for difficulty in range(1, len(newRules)):
+        print(str(difficulty).rjust(3) + ': '
+              + ' '.join([str(rule_points(newRules[difficulty], streak))
+                          for streak in range(1, 11)])
+              + ('' if newRules[difficulty] == RULES[difficulty]
+                 else '    (changed)'))
@@ -0,0 +1,164 @@
+# Math Quizzer settings
+# Part of Math Quizzer. Keeps each profile's settings, saved in its
+# MATHQUIZZER-other.txt:
+#
+# # Belongs to the game Math Quizzer.
+# version 2
+# AAAAAAAUnlocked true
+# MetricsPort 9464
+#
+# Only settings that aren't their default are saved. Older games saved
+# a setting that was turned on as a line with just its name, so a name
+# on its own still means true, and files without a version line are
+# version 1. A value that isn't the setting's type (like FrameRate abc,
+# from editing the file by hand) is skipped, so the setting keeps its
+# default.
+#
+# The settings are read once, when the profile is loaded, into a store
+# (a dict) that the game reads without touching the file. Changing a
+# setting marks it as changed and calls the functions waiting for it to
+# change; save_settings() then writes the file all at once, and only if
+# something changed. Settings changed by another game using the same
+# profile in the meantime are kept, since only the changed settings are
+# written over the file as it is when it's saved.
+
+import os
+
+HEADER = '# Belongs to the game Math Quizzer.'
+VERSION = 2
+
+# Name, type, and default of each setting
+SETTINGS = (('AAAAAAAUnlocked', bool, False), # Whether AAAAAAA was found
+            ('TelemetryEnabled', bool, False), # See telemetry.py
+            ('MetricsEnabled', bool, False), # See metrics.py
+            ('MetricsPort', int, None),
+            ('FrameRate', int, 0), # Most frames a second (0 for no limit)
+            ('AdaptiveSkill', float, 0.0), # See adaptive.py
+            ('Profile', str, None)) # Profile the game opens with; only
+                                    # used in the shared profile
+TYPES = {name: kind for (name, kind, default) in SETTINGS}
+DEFAULTS = {name: default for (name, kind, default) in SETTINGS}
+TYPE_NAMES = {bool: 'true or false', int: 'a whole number',
+              float: 'a number', str: 'text'}
+
+
+def parse_value(name, text):
+    '''parse_value(name, text) -> bool OR int OR str OR None
+    Turns text, the saved value of setting name, into its type. Settings
+    this game doesn't know are kept as text. Raises ValueError if text
+    isn't the right type.
+    '''
+    kind = TYPES.get(name, str)
+    if text == 'none':
+        return None
+    elif kind == bool:
+        if text not in ('true', 'false'):
+            raise ValueError(name + ' should be ' + TYPE_NAMES[kind]
+                             + ', not ' + repr(text) + '.')
+        return text == 'true'
+    return kind(text)
+
+
+def format_value(value):
+    '''format_value(value) -> str
+    Turns value into text that parse_value() turns back into it.
+    '''
+    if value is None:
+        return 'none'
+    elif value is True or value is False:
+        return str(value).lower()
+    return str(value)
+
+
+def read_settings(path):
+    '''read_settings(path) -> dict
+    Returns the settings saved in path that aren't their default (none
+    if path doesn't exist), skipping any that aren't their type. Raises
+    an error if the first line isn't the standard header.
+    '''
+    try:
+        with open(path) as settingsFile:
+            lines = settingsFile.read().split('\n')
+    except FileNotFoundError:
+        return {}
+    if lines[0] not in ('', HEADER):
+        raise Exception('File ' + path + ' is not formed properly. '
+                        + 'Please rename the file, then try again.')
+    values = {}
+    for line in lines[1:]:
+        if line == '' or line.startswith('version '):
+            continue
+        (name, space, text) = line.partition(' ')
+        if not space: # Saved by an older game
+            text = 'true'
+        try:
+            values[name] = parse_value(name, text)
+        except ValueError:
+            continue
+    return values
+
+
+def load_settings(path):
+    '''load_settings(path) -> dict
+    Returns the settings store for path. Its 'values' have every setting
+    (including defaults), 'changed' is the set of settings changed since
+    it was last saved, and 'callbacks' has the functions to call when
+    each setting changes.
+    '''
+    values = dict(DEFAULTS)
+    values.update(read_settings(path))
+    return {'path': path, 'values': values, 'changed': set(),
+            'callbacks': {}}
+
+
+def get_setting(store, name):
+    '''get_setting(store, name) -> bool OR int OR str OR None
+    Returns the value of setting name.
+    '''
+    return store['values'][name]
+
+
+def set_setting(store, name, value):
+    '''Changes setting name to value, if it's different, and calls the
+    functions waiting for it to change with the new value. Raises
+    TypeError if value isn't the setting's type.
+    '''
+    kind = TYPES.get(name, str)
+    if value is not None and type(value) != kind:
+        raise TypeError(name + ' should be ' + TYPE_NAMES[kind] + ', not '
+                        + repr(value) + '.')
+    if store['values'].get(name) == value:
+        return None
+    store['values'][name] = value
+    store['changed'].add(name)
+    for callback in store['callbacks'].get(name, []):
+        callback(value)
+
+
+def on_change(store, name, callback):
+    '''Calls callback with the new value whenever setting name changes.
+    '''
+    callbacks = store['callbacks'].setdefault(name, [])
+    if callback not in callbacks:
+        callbacks.append(callback)
+
+
+def save_settings(store):
+    '''Saves the changed settings in store, if there are any, replacing
+    the file all at once so that nothing reading it sees half a file.
+    '''
+    if not store['changed']:
+        return None
+    values = read_settings(store['path'])
+    for name in store['changed']:
+        values[name] = store['values'][name]
+    lines = [HEADER, 'version ' + str(VERSION)]
+    names = ([name for (name, kind, default) in SETTINGS]
+             + sorted(name for name in values if name not in TYPES))
+    for name in names:
+        if name in values and values[name] != DEFAULTS.get(name, ''):
+            lines.append(name + ' ' + format_value(values[name]))
+    with open(store['path'] + '.tmp', 'w') as settingsFile:
+        settingsFile.write('\n'.join(lines) + '\n')
+    os.replace(store['path'] + '.tmp', store['path'])
+    store['changed'] = set()
@@ -0,0 +1,225 @@
+# Math Quizzer stress
+# Part of Math Quizzer. Makes millions of questions on every difficulty
+# with a pool of processes, one per CPU by default, and checks that each
+# one makes sense:
+#   - it has the usual 10 parts, and its prompt matches its numbers
+#   - the correct number is exactly the answer (so ÷ comes out whole)
+#   - the four possible answers are different, and the correct letter
+#     points at the correct number
+#   - AAAAAAA's questions have the typed-answer shape (see
+#     questions.make_question())
+#   - the numbers are in their ranges, the first number is bigger for
+#     g1 (and smaller for g2), and w1 divides evenly
+#   - nothing raises an error (like randrange() on an empty range)
+#
+# Each chunk of questions is made from its own seed. When a problem is
+# found, it's minimized: the smallest seed (below MINIMIZE_TRIES) whose
+# first question has the same problem is looked for, so it can be made
+# again with "replay". If there isn't one, the chunk's seed and the
+# question's number in it are given instead.
+#
+# The speed of each process is printed too, so that changes to the
+# question generator can be checked for speed and correctness at once.
+#
+# Usage:
+#   python stress.py [COUNT] [--workers N] [--seed SEED]
+#   python stress.py replay DIFFICULTY SEED [NUMBER]
+# COUNT is how many questions to make on each difficulty (1000000 by
+# default). Difficulties 7-9 all use the same numbers, so only 7 is
+# checked. Custom difficulties in the current folder are used.
+
+import concurrent.futures
+import os
+import random
+import sys
+import time
+
+import questions
+import recordings
+import verify
+
+DIFFICULTIES = (1, 2, 3, 4, 5, 6, 7)
+CHUNK_SIZE = 50000
+MINIMIZE_TRIES = 100000
+
+loadedSpecs = None # Loaded once in each process
+
+
+def get_specs():
+    '''get_specs() -> tuple
+    Returns every compiled difficulty, loading them the first time.
+    '''
+    global loadedSpecs
+    if loadedSpecs is None:
+        loadedSpecs = verify.load_specs()
+    return loadedSpecs
+
+
+def check_question(spec, question, typed):
+    '''check_question(spec, question, typed) -> str OR None
+    Returns what's wrong with question, made from spec (a compiled
+    difficulty), or None if nothing is.
+    '''
+    if len(question) != 10:
+        return 'has the wrong number of parts'
+    (prompt, *potentialAnswers, answerLetter, trueAnswer, firstNumber,
+     operation, secondNumber) = question
+    if not 0 <= operation < len(spec[1]):
+        return 'has an operation that does not exist'
+    (weight, firstLow, firstHigh, secondLow, secondHigh, parameter,
+     numberTable) = spec[1][operation]
+    if weight == 0:
+        return 'uses an operation with no weight'
+    if prompt != ('What is ' + str(firstNumber) + ' ' + '+−×÷'[operation]
+                  + ' ' + str(secondNumber) + '?'):
+        return 'has a prompt that does not match its numbers'
+    if trueAnswer != questions.calculate(firstNumber, operation,
+                                         secondNumber):
+        return 'has a correct number that is not the answer'
+
+    if typed:
+        if potentialAnswers != [trueAnswer, None, None, None] \
+           or answerLetter != 'A':
+            return 'does not have the typed-answer shape'
+    elif None in potentialAnswers:
+        return 'has fewer than four possible answers'
+    elif len(set(potentialAnswers)) != 4:
+        return 'has possible answers that are the same'
+    elif (answerLetter not in ('A', 'B', 'C', 'D')
+          or potentialAnswers['ABCD'.index(answerLetter)] != trueAnswer):
+        return 'has a correct letter that does not point at the answer'
+
+    if parameter == 'r': # The numbers were swapped
+        (firstLow, firstHigh, secondLow, secondHigh) = \
+            (secondLow, secondHigh, firstLow, firstHigh)
+    if not (firstLow <= firstNumber <= firstHigh
+            and secondLow <= secondNumber <= secondHigh):
+        return 'has numbers out of their ranges'
+    if parameter == 'g1' and not firstNumber > secondNumber:
+        return 'breaks g1 (the first number must be bigger)'
+    if parameter == 'g2' and not firstNumber < secondNumber:
+        return 'breaks g2 (the first number must be smaller)'
+    if parameter == 'w1' and firstNumber % secondNumber != 0:
+        return 'breaks w1 (the division must come out whole)'
+    return None
+
+
+def make_and_check(spec, typed):
+    '''make_and_check(spec, typed) -> str OR None
+    Makes a question from spec and returns what's wrong with it (see
+    check_question()).
+    '''
+    try:
+        return check_question(spec, questions.make_question(spec, typed),
+                              typed)
+    except Exception as error:
+        return 'raised ' + type(error).__name__
+
+
+def check_chunk(difficulty, seed, count):
+    '''check_chunk(difficulty, seed, count) -> (int, int, float, dict)
+    Makes count questions on difficulty from seed and returns (PROCESS
+    ID, COUNT, SECONDS, PROBLEMS), where PROBLEMS has the number of the
+    first question with each problem that was found.
+    '''
+    spec = get_specs()[recordings.LEVELS[difficulty]]
+    typed = difficulty == 6
+    problems = {}
+    random.seed(seed)
+    timeStarted = time.perf_counter()
+    for number in range(count):
+        problem = make_and_check(spec, typed)
+        if problem is not None and problem not in problems:
+            problems[problem] = number
+    return (os.getpid(), count, time.perf_counter() - timeStarted, problems)
+
+
+def minimize(difficulty, problem):
+    '''minimize(difficulty, problem) -> int OR None
+    Returns the smallest seed below MINIMIZE_TRIES whose first question
+    on difficulty has problem, or None if there isn't one.
+    '''
+    spec = get_specs()[recordings.LEVELS[difficulty]]
+    for seed in range(MINIMIZE_TRIES):
+        random.seed(seed)
+        if make_and_check(spec, difficulty == 6) == problem:
+            return seed
+    return None
+
+
+def replay(difficulty, seed, number = 0):
+    '''Prints question number number made on difficulty from seed, and
+    what's wrong with it.
+    '''
+    spec = get_specs()[recordings.LEVELS[difficulty]]
+    random.seed(seed)
+    for i in range(number):
+        questions.make_question(spec, difficulty == 6)
+    question = questions.make_question(spec, difficulty == 6)
+    print(question)
+    print(check_question(spec, question, difficulty == 6) or 'No problems.')
+
+
+if __name__ == '__main__':
+    arguments = sys.argv[1:]
+    if arguments[:1] == ['replay']:
+        if len(arguments) < 3:
+            sys.exit('Usage: python stress.py replay DIFFICULTY SEED [NUMBER]')
+        replay(*[int(i) for i in arguments[1:4]])
+        sys.exit()
+    workers = None
+    baseSeed = None
+    for option in ('--workers', '--seed'):
+        if option in arguments:
+            index = arguments.index(option)
+            if option == '--workers':
+                workers = int(arguments[index + 1])
+            else:
+                baseSeed = int(arguments[index + 1])
+            del arguments[index:index + 2]
+    count = int(arguments[0]) if arguments else 1000000
+
+    # Every chunk gets its own seed
+    seededRandom = random.Random(baseSeed)
+    chunks = []
+    for difficulty in DIFFICULTIES:
+        for start in range(0, count, CHUNK_SIZE):
+            chunks.append((difficulty, seededRandom.getrandbits(64),
+                           min(CHUNK_SIZE, count - start)))
+
+    timeStarted = time.perf_counter()
+    processTimes = {}
+    found = {} # (DIFFICULTY, PROBLEM): (SEED, NUMBER)
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        futures = {executor.submit(check_chunk, *chunk): chunk
+                   for chunk in chunks}
+        for future in concurrent.futures.as_completed(futures):
+            (difficulty, seed, chunkCount) = futures[future]
+            (processID, chunkCount, seconds, problems) = future.result()
+            (totalCount, totalSeconds) = processTimes.get(processID, (0, 0))
+            processTimes[processID] = (totalCount + chunkCount,
+                                       totalSeconds + seconds)
+            for (problem, number) in problems.items():
+                if (difficulty, problem) not in found:
+                    found[(difficulty, problem)] = (seed, number)
+                    print('Difficulty ' + str(difficulty) + ': a question '
+                          + problem + '.')
+    totalTime = time.perf_counter() - timeStarted
+
+    for ((difficulty, problem), (seed, number)) in sorted(found.items()):
+        smallestSeed = minimize(difficulty, problem)
+        if smallestSeed is not None:
+            command = str(difficulty) + ' ' + str(smallestSeed)
+        else:
+            command = str(difficulty) + ' ' + str(seed) + ' ' + str(number)
+        print('Difficulty ' + str(difficulty) + ', question ' + problem
+              + ': python stress.py replay ' + command)
+    print()
+    for (processID, (processCount, seconds)) in sorted(processTimes.items()):
+        print('Process ' + str(processID) + ': '
+              + format(processCount / seconds, ',.0f') + ' questions/s')
+    print('Made ' + format(count * len(DIFFICULTIES), ',') + ' questions in '
+          + format(totalTime, '.2f') + 's. ' + str(len(found))
+          + ' problems were found.')
+    if found:
+        sys.exit(1)
@@ -0,0 +1,103 @@
+# Math Quizzer telemetry
+# Part of Math Quizzer. Records every answered question (when turned on)
+# so that slow or often-missed facts can be found later.
+#
+# The log is a directory with one file per column. Every question adds
+# one fixed-width value to the end of each file, so the nth value of
+# every column belongs to the nth question:
+#
+# time          d  When the question was answered (Unix timestamp)
+# difficulty    B  Difficulty being played
+# operator      B  0 = +, 1 = −, 2 = ×, 3 = ÷
+# first         i  First number
+# second        i  Second number
+# result        b  1 = correct, 0 = wrong, -1 = ran out of time
+# responseTime  f  Seconds spent on the question
+#
+# The letters are array typecodes. Values are kept in memory and
+# written in blocks of BLOCK_SIZE questions, so recording a question is
+# just a few appends. A block is written one column at a time, so if the
+# game stops partway through, some columns are longer than others; when
+# the log is opened again, they're all cut back to the shortest one, so
+# that new questions line up.
+
+import array
+import os
+
+COLUMNS = (('time', 'd'),
+           ('difficulty', 'B'),
+           ('operator', 'B'),
+           ('first', 'i'),
+           ('second', 'i'),
+           ('result', 'b'),
+           ('responseTime', 'f'))
+BLOCK_SIZE = 256
+
+
+def open_log(directory):
+    '''open_log(directory) -> list
+    Returns a telemetry log that writes to directory, making it if it
+    doesn't exist, and cutting its columns back to the same number of
+    questions. The log is [directory, column, column, ...], where each
+    column is an array of values that haven't been written yet.
+    '''
+    os.makedirs(directory, exist_ok = True)
+    log = [directory] + [array.array(typecode) for (name, typecode)
+                         in COLUMNS]
+    paths = [os.path.join(directory, name) for (name, typecode) in COLUMNS]
+    sizes = [os.path.getsize(path) if os.path.exists(path) else 0
+             for path in paths]
+    length = min(size // column.itemsize
+                 for (size, column) in zip(sizes, log[1:]))
+    for (path, size, column) in zip(paths, sizes, log[1:]):
+        if size > length * column.itemsize: # Cut off by a crash
+            os.truncate(path, length * column.itemsize)
+    return log
+
+
+def record_answer(log, timeAnswered, difficulty, operator, first, second,
+                  result, responseTime):
+    '''Adds one answered question to log, writing the block to disk if
+    it's full.
+    '''
+    log[1].append(timeAnswered)
+    log[2].append(difficulty)
+    log[3].append(operator)
+    log[4].append(first)
+    log[5].append(second)
+    log[6].append(result)
+    log[7].append(responseTime)
+    if len(log[1]) >= BLOCK_SIZE:
+        flush_log(log)
+
+
+def flush_log(log):
+    '''Writes the questions in log that haven't been written yet.'''
+    if len(log[1]) == 0:
+        return None
+    for ((name, typecode), column) in zip(COLUMNS, log[1:]):
+        with open(os.path.join(log[0], name), 'ab') as columnFile:
+            column.tofile(columnFile)
+        del column[:]
+
+
+def read_log(directory):
+    '''read_log(directory) -> dict
+    Returns every column in the log in directory as an array. If the
+    game stopped partway through writing a block, the questions that
+    weren't written to every column are left out.
+    '''
+    columns = {}
+    for (name, typecode) in COLUMNS:
+        columns[name] = array.array(typecode)
+        try:
+            with open(os.path.join(directory, name), 'rb') as columnFile:
+                data = columnFile.read()
+        except FileNotFoundError:
+            continue
+        columns[name].frombytes(data[:len(data)
+                                     - len(data) % columns[name].itemsize])
+    length = min(len(column) for column in columns.values())
+    for column in columns.values():
+        del column[length:]
+    return columns
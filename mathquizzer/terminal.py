@@ -0,0 +1,371 @@
+# Math Quizzer terminal
+# Part of Math Quizzer. Plays Math Quizzer in a terminal with the
+# keyboard, for computers without a display (or for anyone who'd rather
+# not use the mouse).
+#
+# All nine difficulties can be played, with the same questions, time
+# limits and scoring as the game. Scores and recorded games are saved to
+# the shared profile, so they show up in the game's statistics and can
+# be checked with verify.py.
+#
+# The screen is made as a list of lines every frame, but only the lines
+# that changed since the last frame are written, and curses only sends
+# the characters that changed to the terminal. So the timer ticking
+# down doesn't redraw the whole screen.
+#
+# Key presses are read into a queue at the start of every frame, stamped
+# with time.perf_counter() as they're read, and answers are timed with
+# those stamps (see latency.py).
+#
+# Usage:
+#   python terminal.py [--measure-latency]
+# Keys: 1-9 pick a difficulty, A-D answer a question, and Q goes back to
+# the menu (or quits from the menu). In AAAAAAA, answers are typed with
+# the digits, Backspace (Delete), C (Clear) and Enter (Go).
+
+import collections
+import curses
+import random
+import sys
+import time
+
+import banks
+import difficulties
+import latency
+import profiles
+import questions
+import recordings
+import scoring
+import settings
+
+DIFFICULTY_NAMES = (None, 'Easy', 'Normal', 'Hard', 'Harder', 'Insane',
+                    'AAAAAAA', '30 seconds', '1 minute', '2 minutes')
+FRAME_TIME = 0.1 # Seconds to wait for a key before drawing again
+TIMER_WIDTH = 30 # Characters in the bar showing the time left
+
+
+def new_game(difficulty, specs):
+    '''new_game(difficulty, specs) -> dict
+    Starts a game of difficulty with specs (every compiled difficulty),
+    seeded and recorded the same way as in the game. Its times are from
+    time.perf_counter().
+    '''
+    level = recordings.LEVELS[difficulty]
+    spec = specs[level]
+    gameSeed = time.time_ns()
+    random.seed(gameSeed)
+    bankCursor = banks.open_level_cursor(level, spec, gameSeed)
+    game = {'difficulty': difficulty,
+            'spec': spec,
+            'expressionLevel': questions.EXPRESSION_LEVELS[level],
+            'totalTime': recordings.TIME_LIMITS[difficulty],
+            'timed': difficulty >= 7,
+            'typed': difficulty == 6,
+            'bankCursor': bankCursor,
+            'timeStarted': time.perf_counter(),
+            'points': 0,
+            'pointsGained': 0,
+            'streak': 0,
+            'result': '', # '', 'correct', 'wrong', or 'time'
+            'timeEnded': 0,
+            'scoreSummary': None}
+    game['recording'] = recordings.new_recording(
+        gameSeed, difficulty, spec, bankCursor is not None,
+        game['timeStarted'])
+    next_question(game)
+    return game
+
+
+def next_question(game):
+    '''Makes the next question of game.'''
+    game['question'] = recordings.make_game_question(
+        game['spec'], game['expressionLevel'], game['typed'],
+        game['bankCursor'])
+    game['questionMakeTime'] = time.perf_counter()
+    game['result'] = ''
+    game['answerInProgress'] = ''
+    game['typingMessage'] = ''
+
+
+def time_left(game, currentTime):
+    '''time_left(game, currentTime) -> float
+    Returns how many seconds are left on the current question (or, in
+    timed difficulties, in the game).
+    '''
+    if game['timed']:
+        return game['totalTime'] - (currentTime - game['timeStarted'])
+    return game['totalTime'] - (currentTime - game['questionMakeTime'])
+
+
+def answer_question(game, answer, currentTime):
+    '''Answers the current question of game with answer (a letter, a
+    typed number, or None if time ran out).
+    '''
+    if answer is not None and time_left(game, currentTime) <= 0:
+        answer = None # Pressed after time ran out
+    timeOnQuestion = currentTime - game['questionMakeTime']
+    recordings.record_answer(game['recording'], currentTime, timeOnQuestion,
+                             answer)
+    question = game['question']
+    if answer is None:
+        game['result'] = 'time'
+    elif answer == (question[6] if game['typed'] else question[5]):
+        (game['pointsGained'], game['streak']) = scoring.score_answer(
+            game['difficulty'], game['streak'], timeOnQuestion)
+        game['points'] += game['pointsGained']
+        game['result'] = 'correct'
+    else:
+        game['result'] = 'wrong'
+    if game['result'] != 'correct':
+        game['timeEnded'] = currentTime
+    elif game['timed']: # Timed difficulties go straight to the next one
+        next_question(game)
+
+
+def end_game(game, profile):
+    '''Saves the score and recording of game, which just ended, to
+    profile.
+    '''
+    game['scoreSummary'] = profiles.save_score(
+        profile, int(time.time()), game['difficulty'], game['points'])
+    recordings.save_recording(
+        game['recording'], game['points'],
+        profiles.profile_path(profile['name'], recordings.DIRECTORY))
+
+
+def press_key(game, key, keyTime):
+    '''Handles key (from curses), pressed at keyTime, during game. Only
+    keys that answer the question are handled here.
+    '''
+    if game['typed']:
+        if ord('0') <= key <= ord('9'):
+            typedKey = chr(key)
+        elif key in (curses.KEY_BACKSPACE, 8, 127):
+            typedKey = 'Delete'
+        elif key in (ord('c'), ord('C')):
+            typedKey = 'Clear'
+        elif key in (curses.KEY_ENTER, 10, 13):
+            typedKey = 'Go'
+        else:
+            return None
+        (game['answerInProgress'], game['typingMessage']) = \
+            questions.type_key(game['answerInProgress'], typedKey)
+        if typedKey == 'Go' and game['answerInProgress'] != '':
+            answer_question(game, int(game['answerInProgress']), keyTime)
+    elif 0 <= key < 256 and chr(key).upper() in ('A', 'B', 'C', 'D'):
+        answer_question(game, chr(key).upper(), keyTime)
+
+
+def summary_lines(scoreSummary):
+    '''summary_lines(scoreSummary) -> list
+    Returns the lines describing scoreSummary (from
+    profiles.save_score()).
+    '''
+    (median, percentile90, beaten) = scoreSummary
+    if median is None:
+        return ['This was your first attempt!']
+    return ['Median: ' + str(median) + '    90th percentile: '
+            + str(percentile90),
+            'You beat ' + str(round(beaten * 100)) + '% of your attempts.']
+
+
+def menu_lines(profile):
+    '''menu_lines(profile) -> list
+    Returns the lines of the menu, with profile's best score on each
+    difficulty.
+    '''
+    bestScores = {}
+    for (timeFinished, difficulty, points) in profiles.load_scores(
+        profile):
+        bestScores[difficulty] = max(points, bestScores.get(difficulty, 0))
+    lines = ['Math Quizzer', '']
+    for difficulty in range(1, 10):
+        name = DIFFICULTY_NAMES[difficulty]
+        if difficulty == 6 and not settings.get_setting(profile['settings'],
+                                                        'AAAAAAAUnlocked'):
+            name = '???'
+        if difficulty >= 7:
+            limit = 'timed'
+        else:
+            limit = str(recordings.TIME_LIMITS[difficulty]) + 's a question'
+        lines.append(' ' + str(difficulty) + '  ' + name.ljust(12)
+                     + limit.ljust(18) + 'Best: '
+                     + str(bestScores.get(difficulty, 0)))
+    lines += ['', 'Press 1-9 to play, or Q to quit.']
+    return lines
+
+
+def play_lines(game, currentTime):
+    '''play_lines(game, currentTime) -> list
+    Returns the lines of the screen while game is being played.
+    '''
+    question = game['question']
+    lines = [DIFFICULTY_NAMES[game['difficulty']] + '    Points: '
+             + str(game['points']) + '    Streak: ' + str(game['streak'])]
+    if game['result'] == '':
+        secondsLeft = max(time_left(game, currentTime), 0)
+        filled = round(TIMER_WIDTH * secondsLeft / game['totalTime'])
+        lines.append('[' + '#' * filled + ' ' * (TIMER_WIDTH - filled) + '] '
+                     + str(int(secondsLeft + 0.999)) + 's')
+    else:
+        lines.append('')
+    lines += ['', question[0], '']
+
+    if game['result'] == '':
+        if game['typed']:
+            lines += ['Answer: ' + game['answerInProgress'] + '_',
+                      game['typingMessage'], '',
+                      'Type the answer with the digits, then press Enter. '
+                      + 'Backspace deletes, C clears.']
+        else:
+            lines += [' ' + letter + ') ' + str(question[number])
+                      for (number, letter) in enumerate('ABCD', 1)]
+    elif game['result'] == 'correct':
+        lines += ['Correct!  +' + str(game['pointsGained']), '',
+                  '(Press any key to continue.)']
+    else:
+        if game['result'] == 'wrong':
+            lines.append('Oops!')
+        else:
+            lines.append('You ran out of time!')
+        if not game['timed'] or game['result'] == 'wrong':
+            if game['typed']:
+                lines.append('The correct answer was ' + str(question[6])
+                             + '.')
+            else:
+                lines.append('The correct answer was ' + question[5] + ') '
+                             + str(question[6]) + '.')
+        lines += ['You finished with ' + str(game['points']) + ' points.']
+        lines += summary_lines(game['scoreSummary'])
+        lines += ['', '(Press any key to return to the main menu.)']
+    return lines
+
+
+def read_keys(screen, inputEvents):
+    '''Waits up to FRAME_TIME for a key, then adds every key that was
+    pressed to inputEvents as (TIME, KEY), where TIME is from
+    time.perf_counter() when the key was read.
+    '''
+    key = screen.getch()
+    screen.timeout(0) # Don't wait for the keys after the first one
+    while key != -1:
+        inputEvents.append((time.perf_counter(), key))
+        key = screen.getch()
+    screen.timeout(int(FRAME_TIME * 1000))
+
+
+def draw_lines(screen, lines, drawnLines):
+    '''Draws lines on screen, only writing the ones that are different
+    from drawnLines (the lines drawn last time), which is then updated.
+    '''
+    (height, width) = screen.getmaxyx()
+    lines = lines[:height]
+    for (y, line) in enumerate(lines):
+        if y >= len(drawnLines) or drawnLines[y] != line:
+            screen.addstr(y, 0, line[:width - 1])
+            screen.clrtoeol()
+    for y in range(len(lines), min(len(drawnLines), height)):
+        screen.move(y, 0)
+        screen.clrtoeol()
+    drawnLines[:] = lines
+    screen.noutrefresh()
+    curses.doupdate()
+
+
+def load_custom_files():
+    '''load_custom_files() -> list
+    Uses the custom scoring rules in this folder and returns the compiled
+    difficulties, custom or usual. If either file has a problem, the
+    usual ones are used and the problem is printed.
+    '''
+    specs = questions.compiledDifficultyData
+    difficultyFile = difficulties.find_difficulty_file()
+    if difficultyFile is not None:
+        try:
+            specs = difficulties.load_difficulties(difficultyFile)
+        except (OSError, ValueError) as error:
+            print('Using the usual difficulties. ' + str(error))
+    try:
+        scoring.use_rules(scoring.load_custom_rules())
+    except ValueError as error:
+        print('Using the usual scoring rules. ' + str(error))
+    return specs
+
+
+def main(screen, specs, measureLatency = False):
+    '''main(screen, specs, measureLatency = False) -> list OR None
+    Runs Math Quizzer on screen (from curses.wrapper()) with specs
+    (every compiled difficulty). If measureLatency is true, returns the
+    latency of every answer (see latency.py).
+    '''
+    curses.curs_set(0)
+    screen.timeout(int(FRAME_TIME * 1000))
+    profile = profiles.get_profile(profiles.new_profile_cache(), '')
+
+    game = None
+    menu = menu_lines(profile)
+    drawnLines = []
+    inputEvents = collections.deque()
+    feedbackEventTime = None # When the answer that the next frame shows
+                             # whether it was right was pressed
+    latencyLog = latency.new_latency_log() if measureLatency else None
+    while True:
+        read_keys(screen, inputEvents)
+        while inputEvents and feedbackEventTime is None: # Stop after an
+                                                         # answer
+            (keyTime, key) = inputEvents.popleft()
+            if key == curses.KEY_RESIZE:
+                screen.clear()
+                drawnLines = []
+            elif game is None: # Menu
+                if key in (ord('q'), ord('Q')):
+                    profiles.close_profile(profile)
+                    return latencyLog
+                elif ord('1') <= key <= ord('9'):
+                    difficulty = key - ord('0')
+                    if difficulty == 6 and not settings.get_setting(
+                        profile['settings'], 'AAAAAAAUnlocked'):
+                        settings.set_setting(profile['settings'],
+                                             'AAAAAAAUnlocked', True)
+                        settings.save_settings(profile['settings'])
+                        menu = menu_lines(profile)
+                    else:
+                        game = new_game(difficulty, specs)
+            elif game['result'] == '':
+                if key in (ord('q'), ord('Q')): # Leave without saving
+                    game = None
+                    continue
+                questionMakeTime = game['questionMakeTime']
+                press_key(game, key, keyTime)
+                if (game['result'] != ''
+                    or game['questionMakeTime'] != questionMakeTime):
+                    feedbackEventTime = keyTime
+                if game['result'] in ('wrong', 'time'):
+                    end_game(game, profile)
+            elif game['result'] == 'correct':
+                next_question(game)
+            elif keyTime - game['timeEnded'] >= 0.5:
+                game = None
+                menu = menu_lines(profile)
+
+        currentTime = time.perf_counter()
+        if game is not None and game['result'] == '' and time_left(
+            game, currentTime) <= 0: # Ran out of time
+            answer_question(game, None, currentTime)
+            end_game(game, profile)
+        if game is None:
+            draw_lines(screen, menu, drawnLines)
+        else:
+            draw_lines(screen, play_lines(game, currentTime), drawnLines)
+        if feedbackEventTime is not None:
+            if latencyLog is not None:
+                latency.add_latency(latencyLog, feedbackEventTime,
+                                    time.perf_counter())
+            feedbackEventTime = None
+
+if __name__ == '__main__':
+    # Before curses takes over the screen, so any problems can be read
+    specs = load_custom_files()
+    latencyLog = curses.wrapper(main, specs, latency.FLAG in sys.argv)
+    if latencyLog is not None:
+        print(latency.latency_summary(latencyLog))
@@ -0,0 +1,97 @@
+# Math Quizzer verify
+# Part of Math Quizzer. Checks the scores of recorded games (see
+# recordings.py) by playing every game again with the same seed and
+# answers, and lists the games whose points don't match or whose
+# answers couldn't have happened.
+#
+# The recordings are split into chunks of CHUNK_SIZE and checked by a
+# pool of processes, one per CPU by default. Problems are printed as
+# each chunk finishes, so a big folder doesn't have to be finished
+# before anything shows up.
+#
+# Usage:
+#   python verify.py [DIRECTORY ...] [--workers N]
+# With no directories, MATHQUIZZER-games is used. Games are checked with
+# the difficulties in the current folder (including custom difficulties
+# and question banks), so run this where the games were played, or with
+# the same files. Each game is scored with the scoring rule saved in its
+# recording, so changing the rules doesn't make older games fail.
+
+import concurrent.futures
+import os
+import sys
+import time
+
+import difficulties
+import questions
+import recordings
+
+CHUNK_SIZE = 256
+
+
+def load_specs():
+    '''load_specs() -> tuple
+    Returns every compiled difficulty, including custom ones.
+    '''
+    difficultyFile = difficulties.find_difficulty_file()
+    if difficultyFile is None:
+        return questions.compiledDifficultyData
+    return difficulties.load_difficulties(difficultyFile)
+
+
+def verify_files(paths):
+    '''verify_files(paths) -> list
+    Checks every recording in paths and returns (PATH, POINTS, PROBLEM)
+    for each of them, where PROBLEM is None if nothing's wrong.
+    '''
+    specs = load_specs()
+    results = []
+    for path in paths:
+        try:
+            with open(path) as recordingFile:
+                recording = recordings.read_recording(recordingFile.read())
+        except (OSError, UnicodeDecodeError, ValueError) as error:
+            results.append((path, 0, str(error)))
+            continue
+        results.append((path, *recordings.replay_recording(recording, specs)))
+    return results
+
+
+def find_recordings(directories):
+    '''find_recordings(directories) -> list
+    Returns the path of every recording in directories.
+    '''
+    paths = []
+    for directory in directories:
+        paths.extend(sorted(os.path.join(directory, name)
+                            for name in os.listdir(directory)
+                            if name.endswith('.txt')))
+    return paths
+
+
+if __name__ == '__main__':
+    arguments = sys.argv[1:]
+    workers = None
+    if '--workers' in arguments:
+        index = arguments.index('--workers')
+        workers = int(arguments[index + 1])
+        del arguments[index:index + 2]
+    paths = find_recordings(arguments or [recordings.DIRECTORY])
+    chunks = [paths[i:i + CHUNK_SIZE] for i in range(0, len(paths),
+                                                    CHUNK_SIZE)]
+
+    timeStarted = time.perf_counter()
+    numFlagged = 0
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        futures = [executor.submit(verify_files, chunk) for chunk in chunks]
+        for future in concurrent.futures.as_completed(futures):
+            for (path, points, problem) in future.result():
+                if problem is not None:
+                    numFlagged += 1
+                    print(path + ': ' + problem)
+    print()
+    print('Checked ' + str(len(paths)) + ' games in '
+          + format(time.perf_counter() - timeStarted, '.2f') + 's. '
+          + str(numFlagged) + ' had problems.')
+    if numFlagged:
+        sys.exit(1)